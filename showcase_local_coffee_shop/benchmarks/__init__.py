@@ -0,0 +1,3 @@
+"""
+Offline benchmark suite for the data generator and storage pipeline.
+"""
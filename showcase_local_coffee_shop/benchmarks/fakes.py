@@ -0,0 +1,119 @@
+"""
+Local stand-ins for BigQuery and GCS used by the benchmark suite and the tests, so they run offline.
+Uploads go through coffee_shop_common.uploader.LocalBackend; FakeStorageClient reads and writes
+the small JSON objects (watermark, load spec, manifests) the Cloud Run jobs keep in the bucket.
+"""
+import fnmatch
+import gzip
+import os
+import time
+
+
+class FakeLoadJob:
+    """
+    Mimics a BigQuery load job: result() "parses" the source files (gzip-compressed when
+    named *.gz) by counting their data rows, optionally adding a fixed per-job latency.
+    Parquet files report the row count from their footer.
+    """
+
+    def __init__(self, paths, skip_leading_rows, latency):
+        self.paths = paths
+        self.skip_leading_rows = skip_leading_rows
+        self.latency = latency
+        self.output_rows = None
+
+    def result(self):
+        if self.latency:
+            time.sleep(self.latency)
+        rows = 0
+        for path in self.paths:
+            if path.endswith(".parquet"):
+                import pyarrow.parquet as pq
+
+                rows += pq.read_metadata(path).num_rows
+                continue
+            with (gzip.open if path.endswith(".gz") else open)(path, "rb") as f:
+                rows += sum(1 for _ in f) - self.skip_leading_rows
+        self.output_rows = rows
+        return self
+
+
+class FakeBigQueryClient:
+    """
+    Resolves gs://<bucket>/<path> URIs (including one * wildcard, e.g. part-*-of-00008.csv.gz, or a list of
+    URIs such as the Parquet parts listed in a manifest) to files under root/<bucket>/ (one LocalBackend directory per bucket) and returns FakeLoadJob objects.
+    latencies maps table ids to extra seconds per job, to model slow tables; submit_errors maps
+    table ids to an exception raised when their load is submitted. jobs records the
+    (uri, table_id, job_config) of every submitted load.
+    """
+
+    def __init__(self, root, latencies=None, submit_errors=None):
+        self.root = root
+        self.latencies = latencies or {}
+        self.submit_errors = submit_errors or {}
+        self.jobs = []
+
+    def _resolve(self, uri):
+        if not isinstance(uri, str):
+            return [path for item in uri for path in self._resolve(item)]
+        bucket, path = uri.split("://", 1)[1].split("/", 1)
+        local_path = os.path.join(self.root, bucket, *path.split("/"))
+        if "*" not in local_path:
+            return [local_path]
+        # As in GCS, the wildcard also matches "/" in the object name
+        folder = os.path.dirname(local_path.split("*", 1)[0] + "x")
+        return sorted(
+            os.path.join(root, file_name)
+            for root, _, file_names in os.walk(folder)
+            for file_name in file_names
+            if fnmatch.fnmatchcase(os.path.join(root, file_name), local_path)
+        )
+
+    def load_table_from_uri(self, uri, table_id, job_config=None):
+        if table_id in self.submit_errors:
+            raise self.submit_errors[table_id]
+        self.jobs.append((uri, table_id, job_config))
+        skip_leading_rows = getattr(job_config, "skip_leading_rows", None) or 0
+        return FakeLoadJob(self._resolve(uri), skip_leading_rows, self.latencies.get(table_id, 0))
+
+
+class FakeBlob:
+    """
+    The blob methods the Cloud Run jobs use, on a local file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def download_as_text(self):
+        with open(self.path, encoding="utf-8") as f:
+            return f.read()
+
+    def upload_from_string(self, data, content_type=None):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(data)
+
+
+class FakeStorageClient:
+    """
+    Stands in for google.cloud.storage.Client: bucket(name).blob(path) is the file
+    root/<bucket>/<path>, the same layout as LocalBackend and FakeBigQueryClient.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def bucket(self, bucket_name):
+        return FakeBucket(os.path.join(self.root, bucket_name))
+
+
+class FakeBucket:
+    def __init__(self, root):
+        self.root = root
+
+    def blob(self, remote_path, chunk_size=None):
+        return FakeBlob(os.path.join(self.root, *remote_path.split("/")))
@@ -0,0 +1,174 @@
+"""
+Memory report for the generated tables.
+
+Generates a sample of orders with the compact column types (int32 ids, nullable Int32
+CustomerId, categorical labels, datetime64 dates, float32 money), rebuilds the same rows
+the way the generator used to build them (string dates and labels, string CustomerId
+with None gaps, int64 ids, float64 money) and extrapolates the deep memory usage of
+both representations to a target order count. Customers are measured at full size,
+including the peak memory of building the table from per-row dicts versus arrays.
+
+Usage:
+    python memory_report.py
+    python memory_report.py --orders 10000000 --sample-orders 500000 --output memory_report.json
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import tracemalloc
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+SHOWCASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(SHOWCASE_DIR)
+
+from coffee_shop_common import generator  # noqa: E402
+
+MIB = 2 ** 20
+
+
+def legacy_customers(customers_df):
+    """
+    Rebuilds the customers table from a list of per-row dicts, as generate_customers used to.
+    """
+    customers = []
+    for customer_id, level, registration_date in zip(
+            customers_df["CustomerId"].tolist(),
+            customers_df["LevelOfDiscount"].astype(str).tolist(),
+            customers_df["RegistrationDate"].dt.strftime("%Y-%m-%d").tolist()):
+        customers.append({
+            "CustomerId": str(customer_id),
+            "LevelOfDiscount": level,
+            "RegistrationDate": registration_date
+        })
+    return pd.DataFrame(customers)
+
+
+def legacy_orders(orders_df, order_details_df):
+    """
+    Rebuilds the orders and order details tables from the same arrays the generator used to
+    pass to pd.DataFrame: string dates and order types, string CustomerId with None gaps,
+    int64 ids and float64 money.
+    """
+    customer_ids = orders_df["CustomerId"]
+    legacy_orders_df = pd.DataFrame({
+        "OrderId": orders_df["OrderId"].to_numpy(np.int64),
+        "OrderDate": pd.DatetimeIndex(orders_df["OrderDate"]).strftime("%Y-%m-%d").to_numpy(),
+        "OrderType": np.asarray(generator.ORDER_TYPES)[orders_df["OrderType"].cat.codes.to_numpy()],
+        "CustomerId": np.where(customer_ids.notna().to_numpy(),
+                               customer_ids.fillna(0).to_numpy(np.int64).astype(str), None),
+        "StoreId": orders_df["StoreId"].to_numpy(np.int64),
+        "SubTotal": generator.money_values(orders_df["SubTotal"]),
+        "TotalAmount": generator.money_values(orders_df["TotalAmount"]),
+        "DiscountApplied": orders_df["DiscountApplied"].to_numpy(),
+        "DiscountAmount": generator.money_values(orders_df["DiscountAmount"])
+    })
+    legacy_order_details_df = order_details_df.astype(np.int64)
+    return legacy_orders_df, legacy_order_details_df
+
+
+def column_bytes(df):
+    return {column: int(size) for column, size in df.memory_usage(deep=True, index=False).items()}
+
+
+def traced_peak(fn):
+    """
+    Returns (result, peak traced MiB) for one call of fn.
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak / MIB
+
+
+def table_report(legacy_df, compact_df, target_rows):
+    """
+    Per-row and extrapolated memory of one table in both representations.
+    """
+    legacy_columns, compact_columns = column_bytes(legacy_df), column_bytes(compact_df)
+    rows = len(compact_df)
+    legacy_per_row = sum(legacy_columns.values()) / rows
+    compact_per_row = sum(compact_columns.values()) / rows
+    return {
+        "sample_rows": rows,
+        "target_rows": int(target_rows),
+        "legacy_bytes_per_row": round(legacy_per_row, 2),
+        "compact_bytes_per_row": round(compact_per_row, 2),
+        "legacy_mib": round(legacy_per_row * target_rows / MIB, 1),
+        "compact_mib": round(compact_per_row * target_rows / MIB, 1),
+        "reduction": round(legacy_per_row / compact_per_row, 2),
+        "columns": {
+            column: {
+                "legacy_dtype": str(legacy_df[column].dtype),
+                "compact_dtype": str(compact_df[column].dtype),
+                "legacy_bytes_per_row": round(legacy_columns[column] / rows, 2),
+                "compact_bytes_per_row": round(compact_columns[column] / rows, 2),
+            }
+            for column in compact_df.columns
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare memory of the compact and legacy table representations.")
+    parser.add_argument("--orders", type=int, default=10_000_000,
+                        help="order count to extrapolate to (default: 10000000)")
+    parser.add_argument("--sample-orders", type=int, default=200_000,
+                        help="approximate number of orders to generate and measure (default: 200000)")
+    parser.add_argument("--span-days", type=int, default=365, help="date span of the sample (default: 365)")
+    parser.add_argument("--customers", type=int, default=100_000,
+                        help="customer count, measured at full size (default: 100000)")
+    parser.add_argument("--output", help="optional path for the JSON report")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    start = generator.GeneratorConfig().start
+    orders_per_day = max(1, round(args.sample_orders / args.span_days))
+    config = generator.GeneratorConfig(num_customers=args.customers, start=start,
+                                       end=start + timedelta(days=args.span_days - 1),
+                                       lambda_high=orders_per_day, lambda_low=orders_per_day)
+
+    customers_df, compact_build_mib = traced_peak(lambda: generator.generate_customers(config))
+    legacy_customers_df, legacy_build_mib = traced_peak(lambda: legacy_customers(customers_df))
+    orders_df, order_details_df = generator.generate_orders(config, customers_df, generator.generate_products(config))
+    legacy_orders_df, legacy_order_details_df = legacy_orders(orders_df, order_details_df)
+
+    details_per_order = len(order_details_df) / len(orders_df)
+    report = {
+        "pandas": pd.__version__,
+        "tables": {
+            "Customers": table_report(legacy_customers_df, customers_df, args.customers),
+            "Orders": table_report(legacy_orders_df, orders_df, args.orders),
+            "OrderDetails": table_report(legacy_order_details_df, order_details_df,
+                                         round(args.orders * details_per_order)),
+        },
+    }
+    report["tables"]["Customers"]["legacy_build_peak_mib"] = round(legacy_build_mib, 1)
+    report["tables"]["Customers"]["compact_build_peak_mib"] = round(compact_build_mib, 1)
+    legacy_total = sum(t["legacy_mib"] for t in report["tables"].values())
+    compact_total = sum(t["compact_mib"] for t in report["tables"].values())
+    report["total"] = {"legacy_mib": round(legacy_total, 1), "compact_mib": round(compact_total, 1),
+                       "reduction": round(legacy_total / compact_total, 2)}
+
+    print(f"{'table':<14}{'rows':>12}{'legacy MiB':>13}{'compact MiB':>13}{'reduction':>11}")
+    for name, table in report["tables"].items():
+        print(f"{name:<14}{table['target_rows']:>12,}{table['legacy_mib']:>13,.1f}"
+              f"{table['compact_mib']:>13,.1f}{table['reduction']:>10.2f}x")
+    print(f"{'total':<26}{legacy_total:>13,.1f}{compact_total:>13,.1f}{report['total']['reduction']:>10.2f}x")
+    print(f"Customers build peak: {legacy_build_mib:,.1f} MiB from dicts, {compact_build_mib:,.1f} MiB from arrays")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+Benchmark suite for the data generator and storage pipeline.
+
+Sweeps customer count, lambda_high and date-span length, and records wall time,
+peak traced memory and rows/sec for each stage (generate_customers, generate_orders,
+store_data, upload, load, store_data_parquet / load_parquet for the partitioned Parquet
+output, and store_data_sharded / load_sharded for the gzip CSV shards of Orders and
+OrderDetails) as JSON. GCS and BigQuery are replaced by local fakes
+(LocalBackend and FakeBigQueryClient), so the suite runs offline.
+
+Usage:
+    python run_benchmarks.py --output results.json
+    python run_benchmarks.py --output results.json --compare baseline.json --threshold 0.25
+
+With --compare, the run fails (exit code 1) when any stage is slower or uses more
+peak memory than the baseline by more than the threshold.
+"""
+import argparse
+import gc
+import importlib.util
+import itertools
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+SHOWCASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(SHOWCASE_DIR)
+
+from benchmarks.fakes import FakeBigQueryClient  # noqa: E402
+from coffee_shop_common import generator, storage  # noqa: E402
+from coffee_shop_common.sharded_csv import SHARD_MANIFEST  # noqa: E402
+from coffee_shop_common.uploader import LocalBackend, upload_folder  # noqa: E402
+
+LOADER_PATH = os.path.join(SHOWCASE_DIR, "google_cloud_run", "load_to_bq", "main.py")
+BUCKET = "benchmark-bucket"
+GCS_PREFIX = "csv_sources/"
+# Stages faster than this in both runs are too noisy to flag as time regressions
+MIN_COMPARABLE_SECONDS = 0.05
+
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_loader():
+    """
+    Returns load_to_bq.run_load_jobs, or None when google-cloud-bigquery is not installed.
+    """
+    try:
+        return load_module("load_to_bq_main", LOADER_PATH).run_load_jobs
+    except ImportError as e:
+        logging.warning("Skipping load stage: %s", e)
+        return None
+
+
+def measure(fn, count_rows, count_bytes=None, trace_memory=True):
+    """
+    Runs fn and returns (result, metrics) with wall time, peak traced memory and rows/sec.
+    tracemalloc slows allocation-heavy code (e.g. to_csv) by an order of magnitude, so time is
+    taken from an untraced run and peak memory from a second, traced run of the same stage.
+    """
+    gc.collect()
+    started = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started
+
+    peak = None
+    if trace_memory:
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    rows = count_rows(result)
+    metrics = {
+        "seconds": round(seconds, 4),
+        "peak_mib": round(peak / 2 ** 20, 2) if peak is not None else None,
+        "rows": rows,
+        "rows_per_sec": round(rows / seconds) if seconds > 0 else None,
+    }
+    if count_bytes is not None:
+        metrics["bytes"] = count_bytes(result)
+    return result, metrics
+
+
+def folder_size(folder):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(folder) for f in files)
+
+
+def run_case(run_load_jobs, customers, lambda_high, span_days, workdir, trace_memory=True, shards=None,
+             parquet=True):
+    """
+    Runs every pipeline stage for one parameter combination and returns the stage metrics.
+    """
+    def timed(fn, count_rows, count_bytes=None):
+        return measure(fn, count_rows, count_bytes, trace_memory)
+
+    start = generator.GeneratorConfig().start
+    config = generator.GeneratorConfig(num_customers=customers, lambda_high=lambda_high, start=start,
+                                       end=start + timedelta(days=span_days - 1))
+
+    data_folder = os.path.join(workdir, "data")
+    sharded_folder = os.path.join(workdir, "sharded")
+    bucket_root = os.path.join(workdir, "bucket")
+    stages = {}
+
+    customers_df, stages["generate_customers"] = timed(lambda: generator.generate_customers(config), len)
+    products_df = generator.generate_products(config)
+    stores_df = generator.generate_stores(config)
+    (orders_df, order_details_df), stages["generate_orders"] = timed(
+        lambda: generator.generate_orders(config, customers_df, products_df),
+        lambda result: len(result[0]) + len(result[1]),
+    )
+
+    dfs = {
+        "Orders.csv": orders_df,
+        "Customers.csv": customers_df,
+        "Products.csv": products_df,
+        "OrderDetails.csv": order_details_df,
+        "Stores.csv": stores_df,
+    }
+    total_rows = sum(len(df) for df in dfs.values())
+    _, stages["store_data"] = timed(
+        lambda: storage.store_data(dfs, data_folder, ["csv"]),
+        lambda _: total_rows,
+        lambda _: folder_size(data_folder),
+    )
+    def upload_to_empty_bucket():
+        # Start from an empty bucket each time, so the manifest never skips unchanged files
+        shutil.rmtree(bucket_root, ignore_errors=True)
+        return upload_folder(LocalBackend(os.path.join(bucket_root, BUCKET)), data_folder, GCS_PREFIX,
+                             suffixes=(".csv",))
+
+    _, stages["upload"] = timed(
+        upload_to_empty_bucket,
+        lambda _: total_rows,
+        lambda result: sum(os.path.getsize(os.path.join(data_folder, os.path.basename(p)))
+                           for p in result["uploaded"]),
+    )
+
+    if run_load_jobs is not None:
+        loads = [
+            {
+                "table": os.path.splitext(filename)[0],
+                "uri": f"gs://{BUCKET}/{GCS_PREFIX}{filename}",
+                "table_id": f"benchmark.coffee_shop.{os.path.splitext(filename)[0]}",
+                "job_config": SimpleNamespace(skip_leading_rows=1),
+            }
+            for filename in dfs
+        ]
+        _, stages["load"] = timed(
+            lambda: run_load_jobs(FakeBigQueryClient(bucket_root), loads),
+            lambda result: sum(r.get("rows") or 0 for r in result[0].values()),
+        )
+
+    if parquet:
+        stages.update(run_parquet_stages(run_load_jobs, dfs, workdir, timed))
+    if not shards:
+        return stages
+    sharded_dfs = {filename: dfs[filename] for filename in ("Orders.csv", "OrderDetails.csv")}
+    sharded_rows = sum(len(df) for df in sharded_dfs.values())
+    _, stages["store_data_sharded"] = timed(
+        lambda: storage.store_data(sharded_dfs, sharded_folder, ["csv"], shards=shards),
+        lambda _: sharded_rows,
+        lambda _: folder_size(os.path.join(sharded_folder, storage.SHARD_FOLDER)),
+    )
+    if run_load_jobs is not None:
+        upload_folder(LocalBackend(os.path.join(bucket_root, BUCKET)), sharded_folder, GCS_PREFIX,
+                      suffixes=(".csv.gz", SHARD_MANIFEST))
+        loads = []
+        for filename in sharded_dfs:
+            name = os.path.splitext(filename)[0]
+            with open(os.path.join(sharded_folder, storage.SHARD_FOLDER, name, SHARD_MANIFEST),
+                      encoding="utf-8") as f:
+                pattern = json.load(f)["pattern"]
+            loads.append({
+                "table": name,
+                "uri": f"gs://{BUCKET}/{GCS_PREFIX}{storage.SHARD_FOLDER}/{name}/{pattern}",
+                "table_id": f"benchmark.coffee_shop.{name}",
+                "job_config": SimpleNamespace(skip_leading_rows=1),
+            })
+        _, stages["load_sharded"] = timed(
+            lambda: run_load_jobs(FakeBigQueryClient(bucket_root), loads),
+            lambda result: sum(r.get("rows") or 0 for r in result[0].values()),
+        )
+    return stages
+
+
+def run_parquet_stages(run_load_jobs, dfs, workdir, timed):
+    """
+    Stores the tables as Parquet (Orders / OrderDetails in monthly partitions) and loads them
+    the way load_to_bq does with SOURCE_FORMAT=parquet: the partitioned tables from the part
+    lists in their manifests.
+    """
+    parquet_folder = os.path.join(workdir, "parquet")
+    bucket_root = os.path.join(workdir, "bucket")
+    total_rows = sum(len(df) for df in dfs.values())
+    stages = {}
+    _, stages["store_data_parquet"] = timed(
+        lambda: storage.store_data(dfs, parquet_folder, ["parquet"]),
+        lambda _: total_rows,
+        lambda _: folder_size(parquet_folder),
+    )
+    if run_load_jobs is None:
+        return stages
+
+    upload_folder(LocalBackend(os.path.join(bucket_root, BUCKET)), parquet_folder, GCS_PREFIX,
+                  suffixes=(".parquet", storage.PARQUET_MANIFEST))
+    loads = []
+    for filename in dfs:
+        name = os.path.splitext(filename)[0]
+        uri = f"gs://{BUCKET}/{GCS_PREFIX}{name}.parquet"
+        if name in storage.PARTITIONED_TABLES:
+            with open(os.path.join(parquet_folder, name, storage.PARQUET_MANIFEST), encoding="utf-8") as f:
+                uri = [f"gs://{BUCKET}/{GCS_PREFIX}{name}/{path}" for path in json.load(f)["files"]]
+        loads.append({
+            "table": name,
+            "uri": uri,
+            "table_id": f"benchmark.coffee_shop.{name}",
+            "job_config": SimpleNamespace(skip_leading_rows=0),
+        })
+    _, stages["load_parquet"] = timed(
+        lambda: run_load_jobs(FakeBigQueryClient(bucket_root), loads),
+        lambda result: sum(r.get("rows") or 0 for r in result[0].values()),
+    )
+    return stages
+
+
+def case_key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns a list of human-readable regressions of results against baseline.
+    """
+    baseline_cases = {case_key(case["params"]): case for case in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        base_case = baseline_cases.get(case_key(case["params"]))
+        if base_case is None:
+            continue
+        for stage, metrics in case["stages"].items():
+            base_metrics = base_case["stages"].get(stage)
+            if base_metrics is None:
+                continue
+            for metric in ("seconds", "peak_mib"):
+                current, previous = metrics[metric], base_metrics[metric]
+                if current is None or previous is None:
+                    continue
+                if metric == "seconds" and max(current, previous) < MIN_COMPARABLE_SECONDS:
+                    continue
+                if previous and current > previous * (1 + threshold):
+                    regressions.append(
+                        f"{stage} {metric} {previous} -> {current} "
+                        f"(+{(current / previous - 1) * 100:.0f}%) for {case['params']}"
+                    )
+    return regressions
+
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the coffee shop data pipeline.")
+    parser.add_argument("--customers", type=parse_int_list, default=[500, 50000],
+                        help="comma-separated customer counts (default: 500,50000)")
+    parser.add_argument("--lambdas", type=parse_int_list, default=[10, 100],
+                        help="comma-separated lambda_high values (default: 10,100)")
+    parser.add_argument("--spans", type=parse_int_list, default=[365, 1095],
+                        help="comma-separated date-span lengths in days (default: 365,1095)")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the JSON results")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the traced second run of each stage (no peak memory figures)")
+    parser.add_argument("--shards", type=int, default=os.cpu_count(),
+                        help="CSV shards per table for the sharded stages, 0 to skip them (default: CPU count)")
+    parser.add_argument("--no-parquet", action="store_true",
+                        help="skip the Parquet store and load stages")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed relative regression per stage (default: 0.25)")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    run_load_jobs = load_loader()
+
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "cases": [],
+    }
+    for customers, lambda_high, span_days in itertools.product(args.customers, args.lambdas, args.spans):
+        params = {"customers": customers, "lambda_high": lambda_high, "span_days": span_days}
+        workdir = tempfile.mkdtemp(prefix="coffee_bench_")
+        try:
+            stages = run_case(run_load_jobs, customers, lambda_high, span_days, workdir,
+                              trace_memory=not args.no_memory, shards=args.shards, parquet=not args.no_parquet)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        results["cases"].append({"params": params, "stages": stages})
+        print(params, {stage: f"{m['seconds']}s / {m['peak_mib']} MiB" for stage, m in stages.items()})
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
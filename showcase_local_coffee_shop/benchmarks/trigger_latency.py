@@ -0,0 +1,216 @@
+"""
+Latency benchmark for the trigger_job Cloud Function against a local stub server.
+
+The stub stands in for the Cloud Run Admin API: it counts job runs and adds a fixed
+latency per request and a fixed "handshake" delay per new connection (the TLS handshake
+a real call pays on a cold connection). Credentials are replaced by a fake whose refresh()
+takes a fixed time, like a token fetch from the metadata server.
+
+Compares the per-request path trigger_job used to take (fresh credentials, forced refresh
+and a one-off requests.post) with the warm path (cached token, pooled keep-alive session),
+sequentially and for a burst of concurrent triggers, where coalescing should start one
+run instead of one per request. Requires the function's dependencies
+(google_cloud_run/trigger_cloud_run_job/requirements.txt).
+
+Usage:
+    python trigger_latency.py
+    python trigger_latency.py --requests 200 --burst 32 --output trigger_latency.json
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import numpy as np
+
+SHOWCASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(SHOWCASE_DIR)
+
+from benchmarks.run_benchmarks import load_module  # noqa: E402
+
+TRIGGER_PATH = os.path.join(SHOWCASE_DIR, "google_cloud_run", "trigger_cloud_run_job", "main.py")
+PROJECT_ID = "benchmark-project"
+JOB_NAME = "coffee-data-job"
+
+
+class StubRunAPI(ThreadingHTTPServer):
+    """
+    Local stand-in for the Cloud Run Admin API jobs:run endpoint, with keep-alive.
+    """
+    daemon_threads = True
+
+    def __init__(self, handshake_seconds, api_seconds):
+        self.handshake_seconds = handshake_seconds
+        self.api_seconds = api_seconds
+        self.connections = 0
+        self.runs = 0
+        self.counter_lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), StubRunHandler)
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubRunHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; with Nagle on, keep-alive responses stall on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        # Once per connection, like a TLS handshake
+        with self.server.counter_lock:
+            self.server.connections += 1
+        time.sleep(self.server.handshake_seconds)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        time.sleep(self.server.api_seconds)
+        with self.server.counter_lock:
+            self.server.runs += 1
+        body = json.dumps({"kind": "Execution", "metadata": {"name": f"{JOB_NAME}-{self.server.runs}"}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeCredentials:
+    """
+    Mimics google.auth credentials: refresh() takes token_seconds and issues a one-hour token.
+    """
+    refreshes = 0
+
+    def __init__(self, token_seconds):
+        self.token_seconds = token_seconds
+        self.token = None
+        self.expiry = None
+
+    def refresh(self, request):
+        time.sleep(self.token_seconds)
+        FakeCredentials.refreshes += 1
+        self.token = f"token-{FakeCredentials.refreshes}"
+        self.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+
+
+def legacy_trigger(trigger, url):
+    """
+    The per-request path trigger_job used to take: new credentials, a forced token
+    refresh and a one-off requests.post on a new connection.
+    """
+    credentials, _ = trigger.google.auth.default()
+    credentials.refresh(trigger.Request())
+    response = trigger.requests.post(url, headers={"Authorization": f"Bearer {credentials.token}"})
+    return response.status_code
+
+
+def warm_trigger(trigger, url):
+    _, status = trigger.trigger_job(None)
+    return status
+
+
+def latency_summary(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {
+        "mean_ms": round(float(ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+
+
+def run_sequential(server, fn, count):
+    server.connections = server.runs = 0
+    FakeCredentials.refreshes = 0
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        status = fn()
+        latencies.append(time.perf_counter() - started)
+        assert status == 200, status
+    return {**latency_summary(latencies), "requests": count, "runs_started": server.runs,
+            "connections": server.connections, "token_refreshes": FakeCredentials.refreshes}
+
+
+def run_burst(server, fn, count):
+    """
+    Fires count triggers at once from count threads; returns their latencies and the runs they started.
+    """
+    server.connections = server.runs = 0
+    barrier = threading.Barrier(count)
+    latencies = [None] * count
+
+    def fire(index):
+        barrier.wait()
+        started = time.perf_counter()
+        fn()
+        latencies[index] = time.perf_counter() - started
+
+    threads = [threading.Thread(target=fire, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {**latency_summary(latencies), "requests": count, "runs_started": server.runs,
+            "connections": server.connections}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark trigger_job latency against a local stub server.")
+    parser.add_argument("--requests", type=int, default=100, help="sequential triggers per path (default: 100)")
+    parser.add_argument("--burst", type=int, default=16, help="concurrent triggers in the burst (default: 16)")
+    parser.add_argument("--token-ms", type=float, default=40, help="simulated token fetch time (default: 40)")
+    parser.add_argument("--handshake-ms", type=float, default=30,
+                        help="simulated handshake time per new connection (default: 30)")
+    parser.add_argument("--api-ms", type=float, default=50, help="simulated run API latency (default: 50)")
+    parser.add_argument("--output", help="optional path for the JSON results")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    server = StubRunAPI(args.handshake_ms / 1000, args.api_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    env = {"PROJECT_ID": PROJECT_ID, "JOB_NAME": JOB_NAME, "REGION": "us-central1",
+           "RUN_API_ENDPOINT": server.endpoint}
+    url = f"{server.endpoint}/apis/run.googleapis.com/v1/namespaces/{PROJECT_ID}/jobs/{JOB_NAME}:run"
+
+    fake_default = lambda *_, **__: (FakeCredentials(args.token_ms / 1000), PROJECT_ID)  # noqa: E731
+    with mock.patch.dict(os.environ, env), mock.patch("google.auth.default", fake_default):
+        trigger = load_module("trigger_job_main", TRIGGER_PATH)
+        results = {
+            "settings": {"token_ms": args.token_ms, "handshake_ms": args.handshake_ms, "api_ms": args.api_ms},
+            "sequential": {
+                "legacy": run_sequential(server, lambda: legacy_trigger(trigger, url), args.requests),
+                "warm": run_sequential(server, lambda: warm_trigger(trigger, url), args.requests),
+            },
+            "burst": {
+                "legacy": run_burst(server, lambda: legacy_trigger(trigger, url), args.burst),
+                "warm": run_burst(server, lambda: warm_trigger(trigger, url), args.burst),
+            },
+        }
+    server.shutdown()
+
+    print(f"{'':<22}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'runs':>7}{'conns':>7}")
+    for mode in ("sequential", "burst"):
+        for path, result in results[mode].items():
+            print(f"{mode + ' ' + path:<22}{result['mean_ms']:>10.1f}{result['p50_ms']:>10.1f}"
+                  f"{result['p95_ms']:>10.1f}{result['runs_started']:>7}{result['connections']:>7}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
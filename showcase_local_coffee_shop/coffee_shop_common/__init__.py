@@ -0,0 +1,3 @@
+"""
+Helpers shared by the local scripts and the Cloud Run job.
+"""
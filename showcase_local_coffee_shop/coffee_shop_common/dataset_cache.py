@@ -0,0 +1,205 @@
+"""
+Content-addressed cache for generated tables.
+
+An entry is a group of tables (e.g. Orders and OrderDetails) stored under a key that is
+the hash of the configuration they were generated from, so a configuration that has been
+generated before is served from disk instead of being generated again. Groups that depend
+on only part of the configuration (products, stores) are keyed on that part alone and are
+shared by every configuration that agrees on it.
+
+Tables are stored as uncompressed Arrow IPC files, which are read back through memory
+maps, and carry their pandas dtypes (categoricals, nullable integers, datetime64).
+Entries can also be written and read as a sequence of windows, one record batch per
+window, so streamed generation keeps its flat memory profile on a miss and on a hit.
+A split function re-chunks an entry on read, so an entry stored in one layout (e.g. as
+one window by a full run) is still served window by window to a streaming run.
+
+Entries are written to a temporary folder and renamed into place once complete, so a
+reader never sees a partial entry. Least recently used entries are evicted once the
+cache grows beyond max_bytes (pyarrow is required).
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+
+DEFAULT_MAX_BYTES = 5 * 2 ** 30
+TABLE_SUFFIX = ".arrow"
+TEMP_PREFIX = ".tmp-"
+# Temporary folders left behind by interrupted runs are removed after this long
+STALE_TEMP_SECONDS = 24 * 3600
+
+
+def config_key(config):
+    """
+    Returns the cache key of a configuration: the SHA-256 of its canonical JSON.
+    Values that are not JSON types (dates, numpy scalars) are hashed as their str().
+    """
+    canonical = json.dumps(config, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def folder_bytes(folder):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(folder) for f in files)
+
+
+class DatasetCache:
+    """
+    Local cache of table groups under root, one folder per key.
+
+    Usage:
+        cache = DatasetCache("~/.cache/coffee_shop_datasets")
+        key = config_key({"group": "customers", "seed": 42, ...})
+        dfs = cache.get(key, ["Customers"])
+        if dfs is None:
+            dfs = {"Customers": generate_customers()}
+            cache.put(key, dfs)
+    """
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = os.path.expanduser(root)
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    def _table_path(self, folder, name):
+        return os.path.join(folder, name + TABLE_SUFFIX)
+
+    def _lookup(self, key, names):
+        """
+        Returns the entry folder when it holds all of names, marking it as recently used.
+        """
+        folder = os.path.join(self.root, key)
+        if not all(os.path.exists(self._table_path(folder, name)) for name in names):
+            return None
+        # The folder mtime is the last access time used for LRU eviction
+        os.utime(folder)
+        return folder
+
+    def get(self, key, names):
+        """
+        Returns {name: DataFrame} for a cached entry, or None on a miss.
+        """
+        import pyarrow as pa
+
+        folder = self._lookup(key, names)
+        if folder is None:
+            return None
+        dfs = {}
+        for name in names:
+            with pa.memory_map(self._table_path(folder, name)) as source:
+                dfs[name] = pa.ipc.open_file(source).read_all().to_pandas()
+        logging.info("Dataset cache hit for %s (%s)", ", ".join(names), key[:12])
+        return dfs
+
+    def put(self, key, dfs):
+        """
+        Stores {name: DataFrame} under key.
+        """
+        for _ in self.put_windows(key, list(dfs), [tuple(dfs.values())]):
+            pass
+
+    def get_windows(self, key, names, split=None):
+        """
+        Returns an iterator of (one DataFrame per name) windows for a cached entry,
+        in the order they were stored, or None on a miss.
+        With split, the windows are those split returns instead: it is called with the
+        memory-mapped pyarrow Tables (one per name) and returns, for each window, one
+        (start, stop) row range per table. Only one window is converted at a time.
+        """
+        folder = self._lookup(key, names)
+        if folder is None:
+            return None
+        logging.info("Dataset cache hit for %s (%s)", ", ".join(names), key[:12])
+        return self._read_windows(folder, names, split)
+
+    def _read_windows(self, folder, names, split=None):
+        import pyarrow as pa
+
+        sources = [pa.memory_map(self._table_path(folder, name)) for name in names]
+        try:
+            readers = [pa.ipc.open_file(source) for source in sources]
+            if split is not None:
+                # Uncompressed IPC files are read without copying; slices are views
+                tables = [reader.read_all() for reader in readers]
+                for bounds in split(*tables):
+                    yield tuple(table.slice(start, stop - start).to_pandas()
+                                for table, (start, stop) in zip(tables, bounds))
+                return
+            for batch_index in range(readers[0].num_record_batches):
+                yield tuple(pa.Table.from_batches([reader.get_batch(batch_index)]).to_pandas()
+                            for reader in readers)
+        finally:
+            for source in sources:
+                source.close()
+
+    def put_windows(self, key, names, windows):
+        """
+        Yields the given windows unchanged while storing each one as a record batch.
+        The entry is committed only after the last window, so a consumer that stops
+        early or fails leaves nothing behind.
+        """
+        import pyarrow as pa
+
+        temp_folder = os.path.join(self.root, f"{TEMP_PREFIX}{key}-{uuid.uuid4().hex[:8]}")
+        os.makedirs(temp_folder)
+        writers = None
+        try:
+            for window in windows:
+                tables = [pa.Table.from_pandas(df, preserve_index=False) for df in window]
+                if writers is None:
+                    writers = [pa.ipc.new_file(self._table_path(temp_folder, name), table.schema)
+                               for name, table in zip(names, tables)]
+                for writer, table in zip(writers, tables):
+                    writer.write_table(table)
+                yield window
+            if writers is None:
+                return
+            for writer in writers:
+                writer.close()
+            writers = None
+            self._commit(temp_folder, key)
+        finally:
+            for writer in writers or []:
+                writer.close()
+            shutil.rmtree(temp_folder, ignore_errors=True)
+
+    def _commit(self, temp_folder, key):
+        folder = os.path.join(self.root, key)
+        try:
+            os.replace(temp_folder, folder)
+        except OSError:
+            # Another run committed the same key first; both hold the same tables
+            if not os.path.isdir(folder):
+                raise
+            return
+        logging.info("Stored dataset cache entry %s (%d bytes)", key[:12], folder_bytes(folder))
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """
+        Removes least recently used entries until the cache fits in max_bytes,
+        never removing keep. Also removes stale temporary folders.
+        """
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path):
+                continue
+            if name.startswith(TEMP_PREFIX):
+                if time.time() - os.path.getmtime(path) > STALE_TEMP_SECONDS:
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            entries.append((os.path.getmtime(path), name, folder_bytes(path)))
+
+        total = sum(size for _, _, size in entries)
+        for _, name, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            total -= size
+            logging.info("Evicted dataset cache entry %s (%d bytes)", name[:12], size)
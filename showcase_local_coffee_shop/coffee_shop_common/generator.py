@@ -0,0 +1,556 @@
+"""
+Coffee shop dataset generator shared by the local script (dataset_generation/generate_data.py)
+and the Cloud Run job (google_cloud_run/generate_and_store/main.py).
+
+Every function takes a GeneratorConfig instead of reading module globals, so both entry
+points produce identical tables from equal configurations, and each run (or test) can use
+its own configuration. Nothing is random at import time: every table, and the orders of
+every day, are drawn from their own numpy Generator seeded from config.random_seed, so a
+longer date range starts with exactly the tables of a shorter one.
+
+NumPy and pandas are imported inside the functions that need them (like pyarrow in the
+storage code), so importing this module is cheap and a Cloud Run cold start pays for the
+heavy imports only once the first table is generated.
+"""
+import logging
+from datetime import datetime, timedelta
+
+# In-memory column types of the generated tables: 32-bit ids (CustomerId in orders is the
+# nullable Int32), categorical labels, datetime64 dates and float32 money rounded to cents.
+ID_DTYPE = "int32"
+QUANTITY_DTYPE = "int8"
+MONEY_DTYPE = "float32"
+
+# Defaults of GeneratorConfig
+CUSTOMER_LEVELS = ["3%", "5%", "7%", "10%", "15%"]
+# Store weights for uneven distribution across the five original stores.
+# Stores beyond these are synthesized in Kyiv districts with log-normal weights
+# around the same mean (store_weight_sigma controls how uneven they are).
+STORE_WEIGHTS = [0.3, 0.2, 0.25, 0.15, 0.1]
+STORE_ORIGINS = ["Brazil", "Colombia", "Ethiopia", "Vietnam", "Indonesia", "Kenya", "Guatemala",
+                 "Peru", "Honduras", "Costa Rica", "Rwanda", "Sumatra"]
+STORE_STREETS = ["Khreshchatyk St", "Volodymyrska St", "Saksahanskoho St", "Velyka Vasylkivska St",
+                 "Yaroslaviv Val St", "Lesi Ukrainky Blvd", "Peremohy Ave", "Mykilsko-Slobidska St",
+                 "Obolonska Embankment", "Kharkivske Hwy"]
+# Approximate district centers used to place synthesized stores
+KYIV_DISTRICTS = {
+    "Shevchenkivskyi": (50.4501, 30.5234),
+    "Podilskyi": (50.4410, 30.5140),
+    "Pecherskyi": (50.4350, 30.5550),
+    "Obolonskyi": (50.4450, 30.4800),
+    "Darnytskyi": (50.4580, 30.5980),
+    "Holosiivskyi": (50.3930, 30.5090),
+    "Desnianskyi": (50.5120, 30.6060),
+    "Dniprovskyi": (50.4560, 30.6160),
+    "Sviatoshynskyi": (50.4580, 30.3700),
+    "Solomianskyi": (50.4300, 30.4470),
+}
+# Order composition distributions
+ORDER_TYPES = ["In-store", "Takeaway"]
+ITEM_COUNTS = [1, 2, 3, 4, 5]
+ITEM_WEIGHTS = [0.4, 0.3, 0.2, 0.07, 0.03]
+QUANTITIES = [1, 2, 3]
+QUANTITY_WEIGHTS = [0.8, 0.15, 0.05]
+
+PRODUCTS = [
+    {"ProductName": "Espresso", "ProductCategory": "Beverage", "Price": 2.5},
+    {"ProductName": "Latte", "ProductCategory": "Beverage", "Price": 4.0},
+    {"ProductName": "Cappuccino", "ProductCategory": "Beverage", "Price": 4.5},
+    {"ProductName": "Americano", "ProductCategory": "Beverage", "Price": 3.0},
+    {"ProductName": "Flat White", "ProductCategory": "Beverage", "Price": 3.5},
+    {"ProductName": "Matcha", "ProductCategory": "Beverage", "Price": 4.0},
+    {"ProductName": "Cold Brew", "ProductCategory": "Beverage", "Price": 4.0},
+    {"ProductName": "Espresso Tonic", "ProductCategory": "Beverage", "Price": 4.5},
+    {"ProductName": "Croissant", "ProductCategory": "Pastry", "Price": 3.0},
+    {"ProductName": "Blueberry Muffin", "ProductCategory": "Pastry", "Price": 2.0},
+    {"ProductName": "Chocolate Chip Cookie", "ProductCategory": "Pastry", "Price": 2.0},
+    {"ProductName": "Cheesecake Slice", "ProductCategory": "Pastry", "Price": 4.0},
+    {"ProductName": "Bagel with Cream Cheese", "ProductCategory": "Savory", "Price": 3.0},
+    {"ProductName": "Ham & Cheese Sandwich", "ProductCategory": "Savory", "Price": 4.0},
+    {"ProductName": "Chicken Sandwich", "ProductCategory": "Savory", "Price": 4.0},
+]
+# The five original Kyiv stores; stores beyond these are synthesized
+STORES = [
+    {"StoreId": 1, "StoreName": "Brazil Coffee", "District": "Shevchenkivskyi", "City": "Kyiv",
+     "Address": "1 Shevchenko St, Kyiv", "Latitude": 50.4501, "Longitude": 30.5234},
+    {"StoreId": 2, "StoreName": "Colombia Coffee", "District": "Podilskyi", "City": "Kyiv",
+     "Address": "5 Podil St, Kyiv", "Latitude": 50.4410, "Longitude": 30.5140},
+    {"StoreId": 3, "StoreName": "Ethiopia Coffee", "District": "Pecherskyi", "City": "Kyiv",
+     "Address": "10 Pechersk St, Kyiv", "Latitude": 50.4350, "Longitude": 30.5550},
+    {"StoreId": 4, "StoreName": "Vietnam Coffee", "District": "Obolonskyi", "City": "Kyiv",
+     "Address": "20 Obolon Ave, Kyiv", "Latitude": 50.4450, "Longitude": 30.4800},
+    {"StoreId": 5, "StoreName": "Indonesia Coffee", "District": "Darnytskyi", "City": "Kyiv",
+     "Address": "15 Darnytsia Rd, Kyiv", "Latitude": 50.4580, "Longitude": 30.5980},
+]
+
+
+class GeneratorConfig:
+    """
+    Parameters of the generated dataset:
+
+    - random_seed: seed of every random stream (customers, stores, store weights, orders)
+    - num_customers / num_stores: size of the customer and store universes. Customers are
+      drawn uniformly and stores by weight from CDFs precomputed once per run, so the cost
+      per order does not grow with either universe
+    - start / end: order date range; end defaults to the current time
+    - registration_end: customers register between start and registration_end (capped at end;
+      on start itself when registration_end is earlier). The range does not move with end, so
+      customers keep their registration dates from run to run
+    - low_start / low_end: low-frequency window, with lambda_low instead of lambda_high
+      average orders per day (the daily order count is Poisson distributed)
+    - customer_levels: discount levels customers are drawn from uniformly
+    - customer_share: share of orders placed by a registered customer
+    - store_weights / store_weight_sigma, store_origins, store_streets, kyiv_districts:
+      store traffic weights and the pools synthesized stores are drawn from
+    - order_types, item_counts / item_weights, quantities / quantity_weights: order composition
+    """
+
+    def __init__(self, random_seed=42, num_customers=500, num_stores=5,
+                 start=datetime(2022, 1, 1), end=None, registration_end=datetime(2023, 12, 31),
+                 low_start=datetime(2022, 2, 25), low_end=datetime(2022, 5, 31),
+                 lambda_high=10, lambda_low=3,
+                 customer_levels=CUSTOMER_LEVELS, customer_share=0.3,
+                 store_weights=STORE_WEIGHTS, store_weight_sigma=0.5,
+                 store_origins=STORE_ORIGINS, store_streets=STORE_STREETS, kyiv_districts=KYIV_DISTRICTS,
+                 order_types=ORDER_TYPES, item_counts=ITEM_COUNTS, item_weights=ITEM_WEIGHTS,
+                 quantities=QUANTITIES, quantity_weights=QUANTITY_WEIGHTS):
+        self.random_seed = random_seed
+        self.num_customers = num_customers
+        self.num_stores = num_stores
+        self.start = start
+        self.end = end if end is not None else datetime.now()
+        self.registration_end = registration_end
+        self.low_start = low_start
+        self.low_end = low_end
+        self.lambda_high = lambda_high
+        self.lambda_low = lambda_low
+        self.customer_levels = list(customer_levels)
+        self.customer_share = customer_share
+        self.store_weights = list(store_weights)
+        self.store_weight_sigma = store_weight_sigma
+        self.store_origins = list(store_origins)
+        self.store_streets = list(store_streets)
+        self.kyiv_districts = dict(kyiv_districts)
+        self.order_types = list(order_types)
+        self.item_counts = list(item_counts)
+        self.item_weights = list(item_weights)
+        self.quantities = list(quantities)
+        self.quantity_weights = list(quantity_weights)
+
+
+def generate_customers(config, rng=None):
+    """
+    Generates the customers table.
+    Customers register from the business start date until config.registration_end; dates
+    past the end date (for short date ranges) are capped at it.
+    Columns are built directly from arrays drawn with the numpy Generator rng.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if rng is None:
+        # Own stream, so the customers table does not change with order generation
+        rng = np.random.default_rng([config.random_seed, 0])
+
+    levels = config.customer_levels
+    level_codes = rng.integers(0, len(levels), size=config.num_customers)
+    registration_span = max((config.registration_end - config.start).days, 0)
+    registration_days = rng.integers(0, registration_span + 1, size=config.num_customers)
+    registration_dates = np.minimum(np.datetime64(config.start.date(), "D") + registration_days,
+                                    np.datetime64(config.end.date(), "D"))
+    customers_df = pd.DataFrame({
+        "CustomerId": np.arange(1, config.num_customers + 1, dtype=ID_DTYPE),
+        "LevelOfDiscount": pd.Categorical.from_codes(level_codes, levels),
+        "RegistrationDate": registration_dates
+    })
+    logging.info("Generated customers table with %d entries.", len(customers_df))
+    return customers_df
+
+
+def generate_products(config=None):
+    """
+    Generates the products table (the same for every configuration).
+    """
+    import pandas as pd
+
+    products = [{"ProductId": product_id, **product} for product_id, product in enumerate(PRODUCTS, start=1)]
+    logging.info("Generated products table with %d entries.", len(products))
+    return pd.DataFrame(products).astype({"ProductId": ID_DTYPE, "Price": MONEY_DTYPE})
+
+
+def generate_stores(config, rng=None):
+    """
+    Generates the stores table for config.num_stores Kyiv-based coffee shops.
+    Each store includes address and geographic coordinates matching its district.
+    The first five stores are fixed; the rest are synthesized from arrays drawn with rng.
+    """
+    import numpy as np
+    import pandas as pd
+
+    stores_df = pd.DataFrame(STORES[:config.num_stores])
+    if config.num_stores > len(STORES):
+        if rng is None:
+            rng = np.random.default_rng([config.random_seed, 1])
+        stores_df = pd.concat([stores_df, synthesize_stores(config, len(STORES) + 1, config.num_stores, rng)],
+                              ignore_index=True)
+    logging.info("Generated stores table with %d entries.", len(stores_df))
+    return stores_df.astype({"StoreId": ID_DTYPE})
+
+
+def synthesize_stores(config, first_store_id, last_store_id, rng):
+    """
+    Synthesizes stores first_store_id..last_store_id with a coffee-origin name, a street
+    address and coordinates scattered around the center of a random Kyiv district.
+    """
+    import numpy as np
+    import pandas as pd
+
+    store_ids = np.arange(first_store_id, last_store_id + 1)
+    num_stores = len(store_ids)
+    districts = np.asarray(list(config.kyiv_districts))
+    centers = np.asarray(list(config.kyiv_districts.values()))
+    district_codes = rng.integers(0, len(districts), size=num_stores)
+    origins = np.asarray(config.store_origins)[rng.integers(0, len(config.store_origins), size=num_stores)]
+    streets = np.asarray(config.store_streets)[rng.integers(0, len(config.store_streets), size=num_stores)]
+    house_numbers = rng.integers(1, 200, size=num_stores)
+    # About 1 km of scatter around the district center
+    coordinates = np.round(centers[district_codes] + rng.normal(0, 0.01, size=(num_stores, 2)), 4)
+
+    return pd.DataFrame({
+        "StoreId": store_ids,
+        "StoreName": pd.Series(origins) + " Coffee #" + pd.Series(store_ids).astype(str),
+        "District": districts[district_codes],
+        "City": "Kyiv",
+        "Address": pd.Series(house_numbers).astype(str) + " " + pd.Series(streets) + ", Kyiv",
+        "Latitude": coordinates[:, 0],
+        "Longitude": coordinates[:, 1]
+    })
+
+
+def store_weights(config, rng=None):
+    """
+    Returns the sampling weight of each of the config.num_stores stores, in StoreId order.
+    The five original stores keep config.store_weights; synthesized stores get log-normal
+    weights with the same mean.
+    """
+    import numpy as np
+
+    weights = np.asarray(config.store_weights[:config.num_stores], dtype=np.float64)
+    num_synthesized = config.num_stores - len(weights)
+    if num_synthesized > 0:
+        if rng is None:
+            rng = np.random.default_rng([config.random_seed, 2])
+        mean_weight = np.mean(config.store_weights)
+        sigma = config.store_weight_sigma
+        # Shift the log-normal so its mean equals mean_weight
+        synthesized = rng.lognormal(np.log(mean_weight) - sigma ** 2 / 2, sigma, size=num_synthesized)
+        weights = np.concatenate([weights, synthesized])
+    return weights
+
+
+def money_values(values):
+    """
+    Widens float32 money values to float64 rounded to whole cents.
+    """
+    import numpy as np
+
+    return np.round(np.asarray(values, dtype=np.float64), 2)
+
+
+def discount_rates(levels):
+    """
+    Converts LevelOfDiscount values ("3%", ..., or "None") to fractional discount rates.
+    Categorical levels are parsed once per category.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(levels.dtype, pd.CategoricalDtype):
+        # The trailing 0 is the rate for missing levels (code -1)
+        rates = np.append(discount_rates(pd.Series(levels.cat.categories)), 0.0)
+        return rates[levels.cat.codes.to_numpy()]
+    return pd.to_numeric(levels.str.rstrip("%"), errors="coerce").fillna(0).to_numpy() / 100.0
+
+
+def weighted_cdf(weights):
+    """
+    Precomputes normalized cumulative weights for sample_cdf.
+    """
+    import numpy as np
+
+    cdf = np.cumsum(np.asarray(weights, dtype=np.float64))
+    return cdf / cdf[-1]
+
+
+def sample_cdf(rng, cdf, size):
+    """
+    Draws size indices with the probabilities of a precomputed CDF: one uniform draw and
+    a binary search per sample. Draws the same indices as rng.choice(len(cdf), size, p=weights),
+    without rebuilding and validating the weights on every call.
+    """
+    return cdf.searchsorted(rng.random(size), side="right")
+
+
+def order_tables(config, customers_df, products_df):
+    """
+    Precomputes the lookup arrays and CDFs that generate_orders_window samples from.
+    Built once per run, so the cost of a window depends on its number of orders only,
+    not on the size of the customer, product or store universes.
+    """
+    import numpy as np
+
+    price_by_product = np.zeros(products_df["ProductId"].max() + 1)
+    price_by_product[products_df["ProductId"].to_numpy()] = money_values(products_df["Price"])
+    return {
+        "customer_ids": customers_df["CustomerId"].to_numpy(ID_DTYPE),
+        # Discount rate of each customer, aligned with customer_ids
+        "customer_discounts": discount_rates(customers_df["LevelOfDiscount"]),
+        "product_ids": products_df["ProductId"].to_numpy(ID_DTYPE),
+        "price_by_product": price_by_product,
+        "store_cdf": weighted_cdf(store_weights(config)),
+        "item_cdf": weighted_cdf(config.item_weights),
+        "quantity_cdf": weighted_cdf(config.quantity_weights),
+    }
+
+
+def day_rng(config, day):
+    """
+    Returns the Generator for the orders of one day. Its seed is derived from config.random_seed
+    and the date only, so the orders of a day do not depend on the range they are generated in:
+    moving config.end forward appends days without changing any earlier order.
+    """
+    import numpy as np
+
+    return np.random.default_rng(np.random.SeedSequence(config.random_seed, spawn_key=(day.toordinal(),)))
+
+
+def generate_orders_window(config, customers_df, products_df, start, end,
+                           first_order_id=1, first_order_detail_id=1, tables=None):
+    """
+    Generates orders and order details for the days from start to end (inclusive).
+    Uses Poisson sampling for daily orders and weighted random selection of stores.
+    Stores only the ProductId in order details.
+
+    Each day is drawn from its own stream (see day_rng): the order count and all of the
+    day's orders are drawn in bulk from the lookup arrays and CDFs in tables (see
+    order_tables; built here when not given), and the tables are built once from the
+    concatenated arrays with the compact column types above. Any split of a date range
+    into windows therefore yields the same orders as the whole range.
+    Ids start at first_order_id / first_order_detail_id so consecutive windows
+    can be concatenated into one table.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if tables is None:
+        tables = order_tables(config, customers_df, products_df)
+
+    # One Poisson draw per day; the low-frequency window uses lambda_low
+    days = pd.date_range(start, end, freq="D")
+    in_low_window = (days >= config.low_start) & (days <= config.low_end)
+    daily_lambda = np.where(in_low_window, config.lambda_low, config.lambda_high)
+    day_draws = []
+    for day, lam in zip(days, daily_lambda):
+        rng = day_rng(config, day)
+        day_draws.append(draw_orders(config, tables, rng, rng.poisson(lam)))
+    if not day_draws:
+        # Empty range (e.g. an incremental run with no new days): zero-length columns
+        day_draws.append(draw_orders(config, tables, day_rng(config, start), 0))
+    draws = {key: np.concatenate([draw[key] for draw in day_draws]) for key in day_draws[0]}
+    orders_per_day = [len(draw["order_type_codes"]) for draw in day_draws[:len(days)]]
+    order_dates = np.repeat(days.to_numpy().astype("datetime64[D]"), orders_per_day)
+
+    return order_frames(config, tables, draws, order_dates, first_order_id, first_order_detail_id)
+
+
+def draw_orders(config, tables, rng, num_orders):
+    """
+    Draws the random attributes of num_orders orders and their order details with rng,
+    from the lookup arrays and CDFs in tables.
+    """
+    import numpy as np
+
+    order_type_codes = rng.choice(len(config.order_types), size=num_orders)
+    # Assign a customer to about customer_share of the orders
+    has_customer = rng.random(num_orders) > 1 - config.customer_share
+    customer_positions = rng.integers(0, len(tables["customer_ids"]), size=num_orders)
+    # Assign store based on weighted random selection (StoreIds are 1..num_stores)
+    store_ids = (sample_cdf(rng, tables["store_cdf"], num_orders) + 1).astype(ID_DTYPE)
+    # Generate a random number of items for each order (most orders have 1-3 items)
+    num_items = np.asarray(config.item_counts)[sample_cdf(rng, tables["item_cdf"], num_orders)]
+
+    num_order_details = int(num_items.sum())
+    product_ids = tables["product_ids"][rng.integers(0, len(tables["product_ids"]), size=num_order_details)]
+    # Generate quantity (most order details have quantity = 1)
+    quantities = np.asarray(config.quantities, dtype=QUANTITY_DTYPE)[
+        sample_cdf(rng, tables["quantity_cdf"], num_order_details)]
+    return {
+        "order_type_codes": order_type_codes,
+        "has_customer": has_customer,
+        "customer_positions": customer_positions,
+        "store_ids": store_ids,
+        "num_items": num_items,
+        "product_ids": product_ids,
+        "quantities": quantities,
+    }
+
+
+def build_orders(config, tables, rng, order_dates, first_order_id=1, first_order_detail_id=1):
+    """
+    Generates one order (and its order details) per entry of order_dates, drawing
+    everything but the order count with rng from the lookup arrays and CDFs in tables.
+    Used by the live stream mode (live_stream.py).
+    """
+    draws = draw_orders(config, tables, rng, len(order_dates))
+    return order_frames(config, tables, draws, order_dates, first_order_id, first_order_detail_id)
+
+
+def order_frames(config, tables, draws, order_dates, first_order_id=1, first_order_detail_id=1):
+    """
+    Builds the orders and order details tables from the arrays of draw_orders, with
+    subtotals and discounts computed by array lookups by ProductId and customer.
+    """
+    import numpy as np
+    import pandas as pd
+
+    num_orders = len(order_dates)
+    order_ids = np.arange(first_order_id, first_order_id + num_orders, dtype=ID_DTYPE)
+    has_customer = draws["has_customer"]
+    customer_positions = draws["customer_positions"]
+    customer_ids = tables["customer_ids"][customer_positions]
+    num_order_details = len(draws["product_ids"])
+    detail_order_ids = np.repeat(order_ids, draws["num_items"])
+    product_ids = draws["product_ids"]
+    quantities = draws["quantities"]
+
+    line_totals = tables["price_by_product"][product_ids] * quantities
+    order_subtotals = np.bincount(detail_order_ids - first_order_id, weights=line_totals, minlength=num_orders)
+    order_discount_rates = np.where(has_customer, tables["customer_discounts"][customer_positions], 0.0)
+    discount_amounts = np.round(order_subtotals * order_discount_rates, 2)
+    final_totals = np.round(order_subtotals - discount_amounts, 2)
+
+    orders_df = pd.DataFrame({
+        "OrderId": order_ids,
+        "OrderDate": order_dates,
+        "OrderType": pd.Categorical.from_codes(draws["order_type_codes"], config.order_types),
+        # Orders without a customer are missing values of the nullable Int32 column
+        "CustomerId": pd.arrays.IntegerArray(customer_ids, ~has_customer),
+        "StoreId": draws["store_ids"],
+        "SubTotal": np.round(order_subtotals, 2).astype(MONEY_DTYPE),
+        "TotalAmount": final_totals.astype(MONEY_DTYPE),
+        "DiscountApplied": order_discount_rates > 0,
+        "DiscountAmount": discount_amounts.astype(MONEY_DTYPE)
+    })
+    order_details_df = pd.DataFrame({
+        "OrderDetailId": np.arange(first_order_detail_id, first_order_detail_id + num_order_details,
+                                   dtype=ID_DTYPE),
+        "OrderId": detail_order_ids,
+        "ProductId": product_ids,
+        "Quantity": quantities
+    })
+
+    return orders_df, order_details_df
+
+
+def iter_order_windows(config, customers_df, products_df, chunk_days):
+    """
+    Yields (orders_df, order_details_df) for consecutive windows of chunk_days days
+    covering config.start..config.end. OrderId and OrderDetailId continue across windows,
+    so only one window is held in memory at a time, and the concatenated windows equal
+    the output of generate_orders.
+    """
+    tables = order_tables(config, customers_df, products_df)
+    window_start = config.start
+    next_order_id = 1
+    next_order_detail_id = 1
+    while window_start <= config.end:
+        window_end = min(window_start + timedelta(days=chunk_days - 1), config.end)
+        orders_df, order_details_df = generate_orders_window(
+            config, customers_df, products_df, window_start, window_end,
+            first_order_id=next_order_id, first_order_detail_id=next_order_detail_id, tables=tables
+        )
+        next_order_id += len(orders_df)
+        next_order_detail_id += len(order_details_df)
+        yield orders_df, order_details_df
+        window_start = window_end + timedelta(days=1)
+
+
+def generate_orders(config, customers_df, products_df):
+    """
+    Generates the full orders and order details tables for config.start..config.end.
+    """
+    orders_df, order_details_df = generate_orders_window(
+        config, customers_df, products_df, config.start, config.end
+    )
+    logging.info("Generated orders table with %d orders.", len(orders_df))
+    logging.info("Generated order details table with %d entries.", len(order_details_df))
+    return orders_df, order_details_df
+
+
+def order_partitions(config, partition_days):
+    """
+    Splits config.start..config.end into (index, start, end) partitions of partition_days days.
+    """
+    partitions = []
+    partition_start = config.start
+    while partition_start <= config.end:
+        partition_end = min(partition_start + timedelta(days=partition_days - 1), config.end)
+        partitions.append((len(partitions), partition_start, partition_end))
+        partition_start = partition_end + timedelta(days=1)
+    return partitions
+
+
+# Configuration and reference tables shared with pool workers, set once per process by _init_partition_worker
+_partition_tables = {}
+
+
+def _init_partition_worker(config, customers_df, products_df):
+    _partition_tables["config"] = config
+    _partition_tables["customers"] = customers_df
+    _partition_tables["products"] = products_df
+    _partition_tables["tables"] = order_tables(config, customers_df, products_df)
+
+
+def _generate_partition(partition):
+    """
+    Generates one partition with local ids starting at 1.
+    """
+    _, start, end = partition
+    return generate_orders_window(
+        _partition_tables["config"], _partition_tables["customers"], _partition_tables["products"],
+        start, end, tables=_partition_tables["tables"]
+    )
+
+
+def iter_order_partitions(config, customers_df, products_df, workers=None, partition_days=30):
+    """
+    Generates date partitions in a process pool and yields them in date order with
+    global OrderId / OrderDetailId assigned from the running totals of earlier partitions.
+    As every day has its own random stream, the output is identical for any number of
+    workers and partition size, and equal to generate_orders.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    partitions = order_partitions(config, partition_days)
+    if workers and workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_partition_worker,
+                                       initargs=(config, customers_df, products_df))
+        results = executor.map(_generate_partition, partitions)
+    else:
+        executor = None
+        _init_partition_worker(config, customers_df, products_df)
+        results = map(_generate_partition, partitions)
+
+    try:
+        order_offset = 0
+        order_detail_offset = 0
+        for orders_df, order_details_df in results:
+            orders_df["OrderId"] += order_offset
+            order_details_df["OrderId"] += order_offset
+            order_details_df["OrderDetailId"] += order_detail_offset
+            order_offset += len(orders_df)
+            order_detail_offset += len(order_details_df)
+            yield orders_df, order_details_df
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
@@ -0,0 +1,92 @@
+"""
+Parallel sharded CSV writer for large tables.
+
+write_csv_shards splits a table into N row ranges and writes each one as a gzip-compressed
+CSV shard from a process pool, so serialization and compression run on every core instead
+of one. Shards are named part-NNNNN-of-MMMMM.csv.gz, each with its own header row, and
+a manifest (_shards.json) records the shard names, row counts and sizes.
+
+The shard count is part of every name, so a loader can select exactly the shards of the
+current layout with one wildcard (part-*-of-MMMMM.csv.gz, see shard_pattern) even if a
+bucket still holds shards from a run with a different count. Shards are gzip-compressed
+with a fixed timestamp, so unchanged data gives byte-identical shards and the
+change-aware uploader skips them.
+"""
+import gzip
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+SHARD_MANIFEST = "_shards.json"
+SHARD_PREFIX = "part-"
+COMPRESS_LEVEL = 6
+STAGING_SUFFIX = ".inprogress"
+
+
+def shard_name(index, num_shards, compress=True):
+    return f"{SHARD_PREFIX}{index:05d}-of-{num_shards:05d}.csv" + (".gz" if compress else "")
+
+
+def shard_pattern(num_shards, compress=True):
+    """
+    Returns the wildcard matching every shard of a num_shards layout.
+    """
+    return f"{SHARD_PREFIX}*-of-{num_shards:05d}.csv" + (".gz" if compress else "")
+
+
+def _write_shard(df, path, compress):
+    """
+    Writes one shard under a staging name and renames it into place. Runs in a pool worker.
+    """
+    staging_path = path + STAGING_SUFFIX
+    with open(staging_path, "wb") as raw:
+        # mtime=0 keeps the gzip header, and so the shard bytes, independent of the run time
+        stream = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=COMPRESS_LEVEL, mtime=0) if compress else raw
+        try:
+            df.to_csv(stream, index=False)
+        finally:
+            if compress:
+                stream.close()
+    os.replace(staging_path, path)
+    return len(df), os.path.getsize(path)
+
+
+def write_csv_shards(df, folder, num_shards, workers=None, compress=True):
+    """
+    Writes df as num_shards CSV shards (gzip-compressed unless compress is False) into
+    folder using up to workers processes, removes shards of any other layout from folder
+    and writes the manifest last. Returns the manifest.
+    """
+    os.makedirs(folder, exist_ok=True)
+    num_shards = max(1, min(num_shards, len(df)))
+    names = [shard_name(index, num_shards, compress) for index in range(num_shards)]
+    for stale in set(os.listdir(folder)) - set(names):
+        if stale.startswith(SHARD_PREFIX) or stale == SHARD_MANIFEST:
+            os.remove(os.path.join(folder, stale))
+
+    import numpy as np  # imported here so the Cloud Run job can import this module before NumPy is needed
+
+    bounds = np.linspace(0, len(df), num_shards + 1).astype(int)
+    slices = [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+    paths = [os.path.join(folder, name) for name in names]
+    workers = min(workers or os.cpu_count() or 1, num_shards)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_write_shard, slices, paths, [compress] * num_shards))
+    else:
+        results = [_write_shard(shard_df, path, compress) for shard_df, path in zip(slices, paths)]
+
+    manifest = {
+        "num_shards": num_shards,
+        "compression": "gzip" if compress else "none",
+        "pattern": shard_pattern(num_shards, compress),
+        "columns": list(df.columns),
+        "rows": len(df),
+        "bytes": sum(size for _, size in results),
+        "shards": [{"name": name, "rows": rows, "bytes": size} for name, (rows, size) in zip(names, results)],
+    }
+    with open(os.path.join(folder, SHARD_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    logging.info("Saved %s as %d shards (%d bytes) with %d workers", folder, num_shards, manifest["bytes"], workers)
+    return manifest
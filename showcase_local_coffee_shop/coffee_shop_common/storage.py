@@ -0,0 +1,182 @@
+"""
+Local storage of the generated tables, shared by the local script (dataset_generation/generate_data.py)
+and the Cloud Run job (google_cloud_run/generate_and_store/main.py).
+
+Tables are passed as {filename: DataFrame} (e.g. "Orders.csv") and written as CSV, as gzip
+CSV shards (see sharded_csv.py) and/or as compressed Parquet with explicit column types.
+Orders and OrderDetails are partitioned by OrderDate month in Parquet, with a manifest
+(<Table>/_parquet.json) listing the part files of the current run, so a loader never picks up
+parts an earlier run with other windows left in the bucket.
+
+Like the generator, NumPy, pandas and pyarrow are imported inside the functions that use them.
+"""
+import json
+import logging
+import os
+import shutil
+
+from coffee_shop_common.generator import MONEY_DTYPE, money_values
+from coffee_shop_common.metrics import path_bytes
+from coffee_shop_common.sharded_csv import write_csv_shards
+
+PARQUET_COMPRESSION = "zstd"
+PARTITIONED_TABLES = {"Orders", "OrderDetails"}
+PARQUET_MANIFEST = "_parquet.json"
+PARQUET_SCHEMAS = {
+    "Customers": {"CustomerId": "int64", "LevelOfDiscount": "string", "RegistrationDate": "date32"},
+    "Products": {"ProductId": "int64", "ProductName": "string", "ProductCategory": "string",
+                 "Price": "double"},
+    "Stores": {"StoreId": "int64", "StoreName": "string", "District": "string", "City": "string",
+               "Address": "string", "Latitude": "double", "Longitude": "double"},
+    "Orders": {"OrderId": "int64", "OrderDate": "date32", "OrderType": "string", "CustomerId": "int64",
+               "StoreId": "int64", "SubTotal": "double", "TotalAmount": "double",
+               "DiscountApplied": "bool", "DiscountAmount": "double"},
+    "OrderDetails": {"OrderDetailId": "int64", "OrderId": "int64", "ProductId": "int64",
+                     "Quantity": "int64"},
+}
+# Tables written as gzip CSV shards under <folder>/shards/<Table>/ when shards are requested
+SHARDED_TABLES = {"Orders", "OrderDetails"}
+SHARD_FOLDER = "shards"
+
+
+def write_order_windows(windows, folder, formats=("csv",)):
+    """
+    Appends each (orders_df, order_details_df) window to Orders.csv / OrderDetails.csv
+    (and/or to the monthly Parquet partitions) as soon as it is produced,
+    so peak memory depends on the window size only.
+    """
+    try:
+        os.makedirs(folder, exist_ok=True)
+        orders_path = os.path.join(folder, "Orders.csv")
+        order_details_path = os.path.join(folder, "OrderDetails.csv")
+        num_orders = 0
+        num_order_details = 0
+        first_window = True
+        for window_index, (orders_df, order_details_df) in enumerate(windows):
+            if "csv" in formats:
+                mode = "w" if first_window else "a"
+                orders_df.to_csv(orders_path, mode=mode, header=first_window, index=False)
+                order_details_df.to_csv(order_details_path, mode=mode, header=first_window, index=False)
+            if "parquet" in formats:
+                store_parquet({"Orders.csv": orders_df, "OrderDetails.csv": order_details_df},
+                              folder, part=window_index)
+            first_window = False
+            num_orders += len(orders_df)
+            num_order_details += len(order_details_df)
+    except Exception as e:
+        logging.error("Error streaming order files: %s", e)
+        raise
+
+    logging.info("Streamed orders table with %d orders to %s", num_orders, orders_path)
+    logging.info("Streamed order details table with %d entries to %s", num_order_details, order_details_path)
+    return num_orders, num_order_details
+
+
+def parquet_table(name, df):
+    """
+    Converts a DataFrame to a pyarrow Table with the explicit column types from PARQUET_SCHEMAS.
+    """
+    import pyarrow as pa
+
+    schema = pa.schema([(column, pa.type_for_alias(PARQUET_SCHEMAS[name][column])) for column in df.columns])
+    # A plain cast would store float32 money as e.g. 3.1500000953674316
+    money = {column: money_values(df[column]) for column in df.columns if df[column].dtype == MONEY_DTYPE}
+    return pa.Table.from_pandas(df.assign(**money), preserve_index=False).cast(schema)
+
+
+def store_parquet(dfs, folder, part=0, partitioned=True):
+    """
+    Saves the provided DataFrames as compressed Parquet files in the specified folder.
+    When partitioned, Orders and OrderDetails go to <Table>/OrderMonth=YYYY-MM/part-NNNNN.parquet;
+    other tables (and unpartitioned output) go to <Table>.parquet.
+    part numbers the files of one streamed window; part 0 clears previous partitions.
+    The manifest of a partitioned table is rewritten after every part.
+    """
+    import numpy as np
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    order_months = None
+    if "Orders.csv" in dfs:
+        orders_df = dfs["Orders.csv"]
+        order_months = pd.Series(pd.to_datetime(orders_df["OrderDate"]).dt.strftime("%Y-%m").to_numpy(),
+                                 index=orders_df["OrderId"].to_numpy())
+
+    for filename, df in dfs.items():
+        name = os.path.splitext(filename)[0]
+        table = parquet_table(name, df)
+        if not partitioned or name not in PARTITIONED_TABLES or order_months is None:
+            filepath = os.path.join(folder, f"{name}.parquet")
+            pq.write_table(table, filepath, compression=PARQUET_COMPRESSION)
+            logging.info("Saved %s", filepath)
+            continue
+
+        table_folder = os.path.join(folder, name)
+        if part == 0:
+            shutil.rmtree(table_folder, ignore_errors=True)
+        months = order_months.loc[df["OrderId"].to_numpy()].to_numpy()
+        # Sort once by month, then write each month as a contiguous slice
+        order = np.argsort(months, kind="stable")
+        months = months[order]
+        table = table.take(order)
+        unique_months, starts = np.unique(months, return_index=True)
+        ends = np.append(starts[1:], len(months))
+        for month, start, end in zip(unique_months, starts, ends):
+            month_folder = os.path.join(table_folder, f"OrderMonth={month}")
+            os.makedirs(month_folder, exist_ok=True)
+            pq.write_table(table.slice(start, end - start),
+                           os.path.join(month_folder, f"part-{part:05d}.parquet"),
+                           compression=PARQUET_COMPRESSION)
+        write_parquet_manifest(table_folder)
+        logging.info("Saved %s (%d monthly partitions)", table_folder, len(unique_months))
+
+
+def write_parquet_manifest(table_folder):
+    """
+    Lists the part files under table_folder (as "/"-separated relative paths) in its manifest.
+    """
+    files = []
+    for root, _, file_names in os.walk(table_folder):
+        relative_root = os.path.relpath(root, table_folder)
+        files += [name if relative_root == "." else f"{relative_root.replace(os.sep, '/')}/{name}"
+                  for name in file_names if name.endswith(".parquet")]
+    with open(os.path.join(table_folder, PARQUET_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({"files": sorted(files)}, f, indent=2)
+
+
+def store_data(dfs, folder, formats=("csv",), partitioned=True, shards=None, shard_workers=None):
+    """
+    Saves the provided DataFrames to the specified folder in each of the given formats
+    ("csv" and/or "parquet").
+    Expects a dictionary with keys as filenames and values as DataFrames.
+    With shards set, SHARDED_TABLES are written as that many gzip CSV shards by
+    shard_workers processes.
+    """
+    try:
+        os.makedirs(folder, exist_ok=True)
+        if "csv" in formats:
+            for filename, df in dfs.items():
+                name = os.path.splitext(filename)[0]
+                if shards and name in SHARDED_TABLES:
+                    write_csv_shards(df, os.path.join(folder, SHARD_FOLDER, name), shards, shard_workers)
+                    continue
+                filepath = os.path.join(folder, filename)
+                df.to_csv(filepath, index=False)
+                logging.info("Saved %s", filepath)
+        if "parquet" in formats:
+            store_parquet(dfs, folder, partitioned=partitioned)
+    except Exception as e:
+        logging.error("Error saving files: %s", e)
+        raise
+
+
+def stored_bytes(filenames, folder):
+    """
+    Returns the size of the CSV and Parquet output written for the given table filenames.
+    """
+    paths = []
+    for filename in filenames:
+        name = os.path.splitext(filename)[0]
+        paths += [os.path.join(folder, filename), os.path.join(folder, f"{name}.parquet"),
+                  os.path.join(folder, name), os.path.join(folder, SHARD_FOLDER, name)]
+    return path_bytes(*paths)
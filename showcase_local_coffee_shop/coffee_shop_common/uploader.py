@@ -0,0 +1,266 @@
+"""
+Concurrent, change-aware uploader shared by the Cloud Run job (generate_and_store)
+and the local upload script (dataset_upload).
+
+Files are uploaded from a thread pool. A manifest of content hashes is kept next to
+the uploaded objects, so files that have not changed since the last run (e.g. Products.csv,
+Stores.csv) are skipped. Storing the manifest in the destination keeps it across runs of
+the ephemeral Cloud Run container. The destination is a pluggable backend: GCSBackend for
+a real bucket, LocalBackend for a local directory standing in for one.
+
+open_csv_stream / write_frames serialize DataFrames straight into an object writer
+(optionally gzip-compressed on the fly), without touching the local filesystem. An object
+replaced this way loses its manifest entry, so the next upload_folder run sends the local
+file again instead of comparing it with the hash of what used to be in the bucket.
+"""
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+MANIFEST_NAME = "_upload_manifest.json"
+DEFAULT_WORKERS = 8
+# Files at least this large are sent as chunked resumable uploads
+LARGE_FILE_THRESHOLD = 32 * 1024 * 1024
+CHUNK_SIZE = 8 * 1024 * 1024  # must be a multiple of 256 KB for GCS
+HASH_BLOCK_SIZE = 1024 * 1024
+STAGING_SUFFIX = ".inprogress"
+
+
+class GCSBackend:
+    """
+    Uploads to a Google Cloud Storage bucket.
+    """
+
+    def __init__(self, bucket_name, client=None):
+        from google.cloud import storage
+
+        self.bucket_name = bucket_name
+        self.bucket = (client or storage.Client()).bucket(bucket_name)
+
+    def upload(self, local_path, remote_path, chunk_size=None):
+        blob = self.bucket.blob(remote_path, chunk_size=chunk_size)
+        blob.upload_from_filename(local_path)
+
+    def open_writer(self, remote_path):
+        """Returns a binary writer; the object is committed only when it is closed."""
+        blob = self.bucket.blob(remote_path, chunk_size=CHUNK_SIZE)
+        return blob.open("wb", ignore_flush=True)
+
+    def rename(self, remote_path, new_remote_path):
+        self.bucket.rename_blob(self.bucket.blob(remote_path), new_remote_path)
+
+    def delete(self, remote_path):
+        self.bucket.blob(remote_path).delete()
+
+    def read_text(self, remote_path):
+        blob = self.bucket.blob(remote_path)
+        return blob.download_as_text() if blob.exists() else None
+
+    def write_text(self, remote_path, text):
+        self.bucket.blob(remote_path).upload_from_string(text, content_type="application/json")
+
+    def url(self, remote_path):
+        return f"gs://{self.bucket_name}/{remote_path}"
+
+
+class LocalBackend:
+    """
+    Stand-in for a bucket backed by a local directory, for offline runs and tests.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, remote_path):
+        return os.path.join(self.root, *remote_path.split("/"))
+
+    def upload(self, local_path, remote_path, chunk_size=None):
+        target = self._path(remote_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(local_path, target)
+
+    def open_writer(self, remote_path):
+        target = self._path(remote_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        return open(target, "wb")
+
+    def rename(self, remote_path, new_remote_path):
+        os.replace(self._path(remote_path), self._path(new_remote_path))
+
+    def delete(self, remote_path):
+        os.remove(self._path(remote_path))
+
+    def read_text(self, remote_path):
+        path = self._path(remote_path)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def write_text(self, remote_path, text):
+        target = self._path(remote_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def url(self, remote_path):
+        return self._path(remote_path)
+
+
+def file_hash(path):
+    """
+    Returns the hex MD5 digest of a file, read in blocks.
+    """
+    digest = hashlib.md5(usedforsecurity=False)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def list_files(local_folder, suffixes, exclude_dirs=()):
+    """
+    Returns the files under local_folder ending with one of suffixes, as paths relative
+    to local_folder using "/" separators. Top-level directories in exclude_dirs are skipped.
+    """
+    files = []
+    for root, dirs, file_names in os.walk(local_folder):
+        if root == local_folder:
+            dirs[:] = [d for d in dirs if d not in exclude_dirs]
+        for file_name in file_names:
+            if file_name.endswith(tuple(suffixes)):
+                relative_path = os.path.relpath(os.path.join(root, file_name), local_folder)
+                files.append(relative_path.replace(os.sep, "/"))
+    return sorted(files)
+
+
+def upload_folder(backend, local_folder, remote_prefix, suffixes=(".csv", ".parquet"),
+                  exclude_dirs=(), workers=DEFAULT_WORKERS, manifest_name=MANIFEST_NAME):
+    """
+    Uploads the matching files under local_folder to remote_prefix on the backend,
+    concurrently and skipping files whose content hash matches the manifest.
+    Returns a dict with the "uploaded" and "skipped" remote paths and the uploaded "bytes".
+    """
+    manifest_path = remote_prefix + manifest_name
+    manifest_text = backend.read_text(manifest_path)
+    manifest = json.loads(manifest_text) if manifest_text else {}
+
+    files = list_files(local_folder, suffixes, exclude_dirs)
+    local_paths = {remote_prefix + f: os.path.join(local_folder, *f.split("/")) for f in files}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        hashes = dict(zip(local_paths, executor.map(file_hash, local_paths.values())))
+        changed = [path for path in local_paths if manifest.get(path) != hashes[path]]
+        skipped = [path for path in local_paths if path not in changed]
+
+        futures = {}
+        for remote_path in changed:
+            local_path = local_paths[remote_path]
+            chunk_size = CHUNK_SIZE if os.path.getsize(local_path) >= LARGE_FILE_THRESHOLD else None
+            futures[executor.submit(backend.upload, local_path, remote_path, chunk_size)] = remote_path
+
+        uploaded = []
+        errors = []
+        for future in as_completed(futures):
+            remote_path = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                logging.error("Error uploading %s: %s", remote_path, e)
+                errors.append(e)
+                continue
+            manifest[remote_path] = hashes[remote_path]
+            uploaded.append(remote_path)
+            logging.info("Uploaded %s to %s", local_paths[remote_path], backend.url(remote_path))
+
+    # Record successful uploads even if some failed, so a retry only resends the failures
+    backend.write_text(manifest_path, json.dumps(manifest, indent=2, sort_keys=True))
+    if skipped:
+        logging.info("Skipped %d unchanged files: %s", len(skipped), ", ".join(skipped))
+    if errors:
+        raise errors[0]
+    uploaded_bytes = sum(os.path.getsize(local_paths[remote_path]) for remote_path in uploaded)
+    return {"uploaded": sorted(uploaded), "skipped": skipped, "bytes": uploaded_bytes}
+
+
+def forget_uploads(backend, manifest_path, remote_paths):
+    """
+    Removes remote_paths from the upload manifest at manifest_path, if it lists them.
+    """
+    manifest_text = backend.read_text(manifest_path)
+    manifest = json.loads(manifest_text) if manifest_text else {}
+    if not any(remote_path in manifest for remote_path in remote_paths):
+        return
+    for remote_path in remote_paths:
+        manifest.pop(remote_path, None)
+    backend.write_text(manifest_path, json.dumps(manifest, indent=2, sort_keys=True))
+
+
+@contextmanager
+def open_csv_stream(backend, remote_path, compress=False, manifest_prefix=None, publish=True):
+    """
+    Opens a text stream that writes straight into remote_path on the backend,
+    gzip-compressing on the fly when compress is True. Data goes to a staging object
+    that replaces remote_path only if the block completes, so a failed run never
+    leaves a truncated object behind. Before the replacement, remote_path is dropped from
+    the upload manifest under manifest_prefix (default: the object's folder).
+    With publish=False the completed staging object is kept for publish_staged, so several
+    objects can replace their predecessors only once all of them have been written.
+    """
+    staging_path = remote_path + STAGING_SUFFIX
+    raw = backend.open_writer(staging_path)
+    stream = gzip.GzipFile(fileobj=raw, mode="wb") if compress else raw
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    try:
+        yield text
+        text.flush()
+    except BaseException:
+        text.detach()
+        if compress:
+            stream.close()
+        raw.close()
+        backend.delete(staging_path)
+        raise
+    text.detach()
+    if compress:
+        stream.close()  # writes the gzip trailer; does not close raw
+    raw.close()
+    if publish:
+        publish_staged(backend, remote_path, manifest_prefix)
+
+
+def publish_staged(backend, remote_path, manifest_prefix=None):
+    """
+    Replaces remote_path with the staging object completed by open_csv_stream(publish=False).
+    """
+    if manifest_prefix is None:
+        manifest_prefix = remote_path.rsplit("/", 1)[0] + "/" if "/" in remote_path else ""
+    forget_uploads(backend, manifest_prefix + MANIFEST_NAME, [remote_path])
+    backend.rename(remote_path + STAGING_SUFFIX, remote_path)
+    logging.info("Streamed %s", backend.url(remote_path))
+
+
+def discard_staged(backend, remote_path):
+    """
+    Deletes the staging object left by open_csv_stream(publish=False); remote_path is untouched.
+    """
+    backend.delete(remote_path + STAGING_SUFFIX)
+
+
+def write_frames(backend, remote_path, frames, compress=False, manifest_prefix=None, publish=True):
+    """
+    Serializes an iterable of DataFrames as one CSV object (header from the first frame).
+    Returns the number of rows written.
+    """
+    rows = 0
+    with open_csv_stream(backend, remote_path, compress, manifest_prefix, publish) as stream:
+        for index, df in enumerate(frames):
+            df.to_csv(stream, header=index == 0, index=False)
+            rows += len(df)
+    return rows
@@ -0,0 +1,223 @@
+"""
+Vectorized integrity checks for the generated tables, run before they are stored.
+
+validate_tables checks the DataFrames of one run (or one window of orders together with
+the reference tables) with array operations only:
+
+- unique, non-null ids in every table
+- foreign keys: Orders.CustomerId / StoreId, OrderDetails.OrderId / ProductId, and
+  every order having at least one order detail
+- valid LevelOfDiscount values ("None" or a percentage such as "5%"), quantities and prices
+- SubTotal against the sum of price * quantity of the order's details
+- discount arithmetic: DiscountAmount = SubTotal * the customer's discount rate (0 without
+  a customer), TotalAmount = SubTotal - DiscountAmount and DiscountApplied = rate > 0
+- order and registration dates within the generated date range
+
+Each violation is reported with its row count and a few sample rows (with the expected
+values next to the stored ones). check_tables raises DataValidationError when any check
+fails, so a bad batch stops the run before anything is written or uploaded. Money is
+compared with half a cent of tolerance, as amounts are rounded to cents (and held as
+float32) while the expected values are recomputed from unrounded line totals.
+"""
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_ROWS = 5
+MONEY_TOLERANCE = 0.006
+ID_COLUMNS = {
+    "Customers": "CustomerId",
+    "Products": "ProductId",
+    "Stores": "StoreId",
+    "Orders": "OrderId",
+    "OrderDetails": "OrderDetailId",
+}
+# (child table, column, parent table)
+FOREIGN_KEYS = [
+    ("Orders", "CustomerId", "Customers"),
+    ("Orders", "StoreId", "Stores"),
+    ("OrderDetails", "OrderId", "Orders"),
+    ("OrderDetails", "ProductId", "Products"),
+]
+
+
+class DataValidationError(ValueError):
+    """
+    Raised by check_tables; violations holds the failed checks.
+    """
+
+    def __init__(self, violations):
+        self.violations = violations
+        super().__init__(format_violations(violations))
+
+
+def violation(check, table, mask, df, sample_rows, **expected):
+    """
+    Returns a violation record for the rows of df where mask is set, or None if there are none.
+    expected adds columns (e.g. recomputed amounts) to the sample rows.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    count = int(mask.sum())
+    if not count:
+        return None
+    rows = np.flatnonzero(mask)[:sample_rows]
+    sample = df.iloc[rows].copy()
+    for column, values in expected.items():
+        sample[column] = np.asarray(values)[rows]
+    return {"check": check, "table": table, "rows": count, "sample": sample}
+
+
+def format_violations(violations):
+    lines = [f"{len(violations)} data validation check(s) failed:"]
+    for item in violations:
+        lines.append(f"- {item['check']} ({item['table']}): {item['rows']} row(s), e.g.")
+        lines.append(item["sample"].to_string(index=False))
+    return "\n".join(lines)
+
+
+def discount_levels(levels):
+    """
+    Parses LevelOfDiscount values into (rates, valid): "None" and missing levels are rate 0,
+    "N%" is N / 100; anything else is invalid. Categorical levels are parsed once per category.
+    """
+    if isinstance(levels.dtype, pd.CategoricalDtype):
+        rates, valid = discount_levels(pd.Series(levels.cat.categories.astype(str)))
+        codes = levels.cat.codes.to_numpy()
+        # Code -1 (missing) is a valid level with rate 0
+        return np.append(rates, 0.0)[codes], np.append(valid, True)[codes]
+    text = levels.astype("string")
+    numbers = pd.to_numeric(text.str.rstrip("%"), errors="coerce")
+    valid = (text.isna() | (text == "None") | (text.str.endswith("%") & numbers.notna())).to_numpy(bool)
+    return numbers.fillna(0).to_numpy(np.float64) / 100.0, valid
+
+
+def as_dates(values):
+    return pd.to_datetime(pd.Series(values)).to_numpy("datetime64[D]")
+
+
+def date_bounds_mask(values, start, end):
+    dates = as_dates(values)
+    mask = np.zeros(len(dates), dtype=bool)
+    if start is not None:
+        mask |= dates < np.datetime64(pd.Timestamp(start).date(), "D")
+    if end is not None:
+        mask |= dates > np.datetime64(pd.Timestamp(end).date(), "D")
+    return mask
+
+
+def validate_tables(dfs, start=None, end=None, sample_rows=SAMPLE_ROWS):
+    """
+    Runs every check that applies to the given tables and returns the violations.
+    dfs maps table names or filenames ("Orders" or "Orders.csv") to DataFrames; checks
+    that need a missing table are skipped. start / end bound the order and registration dates.
+    """
+    tables = {os.path.splitext(name)[0]: df for name, df in dfs.items()}
+    violations = []
+
+    def add(*args, **expected):
+        item = violation(*args, sample_rows, **expected)
+        if item is not None:
+            violations.append(item)
+
+    for name, column in ID_COLUMNS.items():
+        if name in tables:
+            ids = tables[name][column]
+            add("null_id", name, ids.isna(), tables[name])
+            add("duplicate_id", name, ids.duplicated(keep=False), tables[name])
+
+    for child, column, parent in FOREIGN_KEYS:
+        if child in tables and parent in tables:
+            values = tables[child][column]
+            missing = values.notna() & ~values.isin(tables[parent][ID_COLUMNS[parent]])
+            add("foreign_key", f"{child}.{column} -> {parent}", missing, tables[child])
+
+    if "Customers" in tables:
+        customers = tables["Customers"]
+        _, valid_levels = discount_levels(customers["LevelOfDiscount"])
+        add("discount_level", "Customers", ~valid_levels, customers)
+        add("date_bounds", "Customers", date_bounds_mask(customers["RegistrationDate"], start, end), customers)
+    if "Products" in tables:
+        products = tables["Products"]
+        add("price", "Products", ~(products["Price"].to_numpy(np.float64) > 0), products)
+    if "OrderDetails" in tables:
+        order_details = tables["OrderDetails"]
+        add("quantity", "OrderDetails", ~(order_details["Quantity"].to_numpy(np.int64) > 0), order_details)
+    if "Orders" in tables:
+        orders = tables["Orders"]
+        add("date_bounds", "Orders", date_bounds_mask(orders["OrderDate"], start, end), orders)
+
+    if {"Orders", "OrderDetails", "Products"} <= tables.keys():
+        violations += validate_amounts(tables, sample_rows)
+    return violations
+
+
+def validate_amounts(tables, sample_rows=SAMPLE_ROWS):
+    """
+    Checks every order's SubTotal against its details and its discount and total amounts
+    against the customer's discount rate.
+    """
+    orders, order_details, products = tables["Orders"], tables["OrderDetails"], tables["Products"]
+    violations = []
+
+    def add(*args, **expected):
+        item = violation(*args, sample_rows, **expected)
+        if item is not None:
+            violations.append(item)
+
+    order_positions = pd.Index(orders["OrderId"]).get_indexer(order_details["OrderId"])
+    product_positions = pd.Index(products["ProductId"]).get_indexer(order_details["ProductId"])
+    # Details with dangling keys are reported by the foreign key checks
+    linked = (order_positions >= 0) & (product_positions >= 0)
+    prices = products["Price"].to_numpy(np.float64)
+    line_totals = prices[product_positions[linked]] * order_details["Quantity"].to_numpy(np.float64)[linked]
+    expected_subtotals = np.bincount(order_positions[linked], weights=line_totals, minlength=len(orders))
+    add("orders_without_details", "Orders", np.bincount(order_positions[order_positions >= 0],
+                                                         minlength=len(orders)) == 0, orders)
+
+    subtotals = orders["SubTotal"].to_numpy(np.float64)
+    add("subtotal", "Orders", np.abs(subtotals - expected_subtotals) > MONEY_TOLERANCE, orders,
+        ExpectedSubTotal=np.round(expected_subtotals, 2))
+
+    rates = np.zeros(len(orders))
+    if "Customers" in tables:
+        customers = tables["Customers"]
+        customer_rates, _ = discount_levels(customers["LevelOfDiscount"])
+        customer_positions = pd.Index(customers["CustomerId"]).get_indexer(orders["CustomerId"])
+        rates = np.where(customer_positions >= 0, np.append(customer_rates, 0.0)[customer_positions], 0.0)
+        expected_discounts = np.round(expected_subtotals * rates, 2)
+        discounts = orders["DiscountAmount"].to_numpy(np.float64)
+        add("discount_amount", "Orders", np.abs(discounts - expected_discounts) > MONEY_TOLERANCE, orders,
+            DiscountRate=rates, ExpectedDiscountAmount=expected_discounts)
+        add("discount_applied", "Orders", orders["DiscountApplied"].to_numpy(bool) != (rates > 0), orders,
+            DiscountRate=rates)
+
+    expected_totals = np.round(expected_subtotals - orders["DiscountAmount"].to_numpy(np.float64), 2)
+    add("total_amount", "Orders", np.abs(orders["TotalAmount"].to_numpy(np.float64) - expected_totals)
+        > MONEY_TOLERANCE, orders, ExpectedTotalAmount=expected_totals)
+    return violations
+
+
+def check_tables(dfs, start=None, end=None, sample_rows=SAMPLE_ROWS):
+    """
+    Validates the tables and raises DataValidationError on any violation.
+    """
+    started = time.perf_counter()
+    violations = validate_tables(dfs, start, end, sample_rows)
+    if violations:
+        logging.error(format_violations(violations))
+        raise DataValidationError(violations)
+    logging.info("Validated %d tables (%d rows) in %.2fs.", len(dfs), sum(len(df) for df in dfs.values()),
+                 time.perf_counter() - started)
+
+
+def check_windows(windows, reference_dfs, start=None, end=None):
+    """
+    Yields each (orders_df, order_details_df) window after checking it together with the
+    reference tables (Customers, Products, Stores), for the modes that write orders window by window.
+    """
+    for orders_df, order_details_df in windows:
+        check_tables({**reference_dfs, "Orders": orders_df, "OrderDetails": order_details_df}, start, end)
+        yield orders_df, order_details_df
@@ -1,41 +1,67 @@
-import pandas as pd
-import random
-import numpy as np
 import os
+import sys
 import logging
-from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from coffee_shop_common import generator
+from coffee_shop_common.dataset_cache import DatasetCache, config_key
+from coffee_shop_common.generator import ID_DTYPE, MONEY_DTYPE, QUANTITY_DTYPE, GeneratorConfig
+from coffee_shop_common.metrics import RunMetrics, profile_to
+from coffee_shop_common.storage import store_data, stored_bytes, write_order_windows
+from coffee_shop_common.uploader import file_hash
 
 # -----------------------------
 # CONFIGURATION PARAMETERS
 # -----------------------------
-# Seed for reproducibility
-RANDOM_SEED = 42
-random.seed(RANDOM_SEED)
-np.random.seed(RANDOM_SEED)
-
-NUM_CUSTOMERS = 500
-
-# Overall order date range
-OVERALL_START = datetime(2022, 1, 1)
-OVERALL_END = datetime.now()  # current date
-
-# Low-frequency window (fewer orders in this period)
-LOW_START = datetime(2022, 2, 25)
-LOW_END = datetime(2022, 5, 31)
-
-# Poisson parameters for order generation:
-# Poisson distribution is used to simulate the random number of orders per day.
-# LAMBDA_HIGH is the average number of orders per day outside the low-frequency window,
-# while LAMBDA_LOW is used within the low-frequency window.
-LAMBDA_HIGH = 10  # average orders per day outside the low-frequency window
-LAMBDA_LOW = 3    # average orders per day inside the low-frequency window
+# Dataset parameters: random seed, customer / store universe sizes, order date range
+# (up to the current date), Poisson order rates (lambda_high average orders per day,
+# lambda_low inside the low-frequency window), discount levels and order composition.
+# The generator and its defaults live in coffee_shop_common/generator.py, shared with
+# the Cloud Run job, so equal configurations produce identical data in both places.
+# Override parameters here, e.g. GeneratorConfig(num_customers=50000, lambda_high=100).
+GENERATOR_CONFIG = GeneratorConfig()
 
 # File output folder
 DATA_FOLDER = r"E:\github_repos\data-analyst-portfolio\showcase_local_coffee_shop\dataset_generation"
 
-# Store weights for uneven distribution across stores
-STORE_IDS = [1, 2, 3, 4, 5]
-STORE_WEIGHTS = [0.3, 0.2, 0.25, 0.15, 0.1]
+# Output formats written by store_data (coffee_shop_common/storage.py): "csv" and/or "parquet".
+# Parquet output is compressed, uses explicit column types and partitions
+# Orders / OrderDetails by OrderDate month (requires pyarrow).
+OUTPUT_FORMATS = ["csv"]
+
+# Sharded CSV output for large tables: with e.g. CSV_SHARDS = 16, store_data writes
+# Orders / OrderDetails as 16 gzip-compressed shards (shards/<Table>/part-NNNNN-of-00016.csv.gz,
+# plus a _shards.json manifest) from a pool of SHARD_WORKERS processes instead of one
+# monolithic CSV. None keeps single CSV files. BigQuery loads the shards with one wildcard URI.
+CSV_SHARDS = None
+SHARD_WORKERS = os.cpu_count()
+
+# Day-window size for streaming generation of Orders.csv / OrderDetails.csv.
+# None keeps the in-memory mode; e.g. 90 appends the tables one quarter at a time.
+STREAM_CHUNK_DAYS = None
+
+# Parallel generation: the date range is split into PARTITION_DAYS partitions generated
+# in a pool of PARALLEL_WORKERS processes. Every day has its own random stream, so the output
+# is the same as single-process generation. None keeps single-process generation.
+PARALLEL_WORKERS = None
+PARTITION_DAYS = 30
+
+# Local cache of generated tables, keyed on a hash of the generator configuration
+# (see coffee_shop_common/dataset_cache.py). Runs with a configuration that has been
+# generated before read the tables from the cache instead of generating them.
+# Set the DATASET_CACHE_DIR environment variable to an empty string to disable it.
+DATASET_CACHE_DIR = os.environ.get("DATASET_CACHE_DIR",
+                                   os.path.join(os.path.expanduser("~"), ".cache", "coffee_shop_datasets"))
+DATASET_CACHE_MAX_BYTES = 5 * 2 ** 30
+
+# Set the PROFILE_GENERATE_ORDERS environment variable to a file path to dump a
+# cProfile of order generation there (e.g. generate_orders.prof)
+PROFILE_GENERATE_ORDERS = os.environ.get("PROFILE_GENERATE_ORDERS")
+
+# Check the generated tables (unique ids, foreign keys, SubTotal / discount / total
+# arithmetic and date bounds, see coffee_shop_common/validation.py) before they are
+# stored. A failed check logs the violations with sample rows and stops the run.
+VALIDATE_DATA = True
 
 # -----------------------------
 # LOGGING CONFIGURATION
@@ -44,241 +70,175 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-def generate_customers():
-    """
-    Generates the customers table.
-    Customers register from the business start date until the current date.
+def cache_config(group):
     """
-    customer_levels = ["None", "3%", "5%", "7%", "10%"]
-    customers = []
-    customer_reg_start = OVERALL_START  # customers register from business start
-    customer_reg_days = (OVERALL_END - OVERALL_START).days  # registration period
-    
-    for customer_id in range(1, NUM_CUSTOMERS + 1):
-        level_of_discount = random.choice(customer_levels)
-        registration_date = (
-            customer_reg_start + timedelta(days=random.randint(0, customer_reg_days))
-        ).strftime("%Y-%m-%d")
-        customers.append({
-            "CustomerId": str(customer_id),
-            "LevelOfDiscount": level_of_discount,
-            "RegistrationDate": registration_date
-        })
-    logging.info("Generated customers table with %d entries.", len(customers))
-    return pd.DataFrame(customers)
-
-
-def generate_products():
+    Returns the configuration that determines a group of tables ("products", "stores",
+    "customers" or "orders"), used as its cache key. Each group includes only what it
+    depends on, so e.g. stores are shared by configurations that differ in lambda_high,
+    and orders by the full, windowed and parallel modes (which generate the same orders;
+    cached_order_windows re-chunks them to the requested windows).
+    Hashes of this file and of the shared generator are included, so changing the
+    generator invalidates its entries. The end date is the effective one (the configured
+    end defaults to the current time, orders are daily).
     """
-    Generates the products table.
-    """
-    product_data = [
-        {"ProductName": "Espresso", "ProductCategory": "Beverage", "Price": 2.5},
-        {"ProductName": "Latte", "ProductCategory": "Beverage", "Price": 4.0},
-        {"ProductName": "Cappuccino", "ProductCategory": "Beverage", "Price": 4.5},
-        {"ProductName": "Americano", "ProductCategory": "Beverage", "Price": 3.0},
-        {"ProductName": "Flat White", "ProductCategory": "Beverage", "Price": 3.5},
-        {"ProductName": "Matcha", "ProductCategory": "Beverage", "Price": 4.0},
-        {"ProductName": "Cold Brew", "ProductCategory": "Beverage", "Price": 4.0},
-        {"ProductName": "Espresso Tonic", "ProductCategory": "Beverage", "Price": 4.5},
-        {"ProductName": "Croissant", "ProductCategory": "Pastry", "Price": 3.0},
-        {"ProductName": "Blueberry Muffin", "ProductCategory": "Pastry", "Price": 2.0},
-        {"ProductName": "Chocolate Chip Cookie", "ProductCategory": "Pastry", "Price": 2.0},
-        {"ProductName": "Cheesecake Slice", "ProductCategory": "Pastry", "Price": 4.0},
-        {"ProductName": "Bagel with Cream Cheese", "ProductCategory": "Savory", "Price": 3.0},
-        {"ProductName": "Ham & Cheese Sandwich", "ProductCategory": "Savory", "Price": 4.0},
-        {"ProductName": "Chicken Sandwich", "ProductCategory": "Savory", "Price": 4.0},
-    ]
-    products = []
-    for product_id, product in enumerate(product_data, start=1):
-        products.append({
-            "ProductId": product_id,
-            "ProductName": product["ProductName"],
-            "ProductCategory": product["ProductCategory"],
-            "Price": product["Price"]
-        })
-    logging.info("Generated products table with %d entries.", len(products))
-    return pd.DataFrame(products)
-
-
-def generate_stores():
+    settings = GENERATOR_CONFIG
+    config = {
+        "group": group,
+        "code": [file_hash(os.path.abspath(__file__)), file_hash(os.path.abspath(generator.__file__))],
+        "dtypes": [ID_DTYPE, QUANTITY_DTYPE, MONEY_DTYPE],
+    }
+    if group in ("stores", "orders"):
+        config.update(random_seed=settings.random_seed, num_stores=settings.num_stores,
+                      store_weights=settings.store_weights, store_weight_sigma=settings.store_weight_sigma,
+                      store_origins=settings.store_origins, store_streets=settings.store_streets,
+                      kyiv_districts=settings.kyiv_districts)
+    if group in ("customers", "orders"):
+        config.update(random_seed=settings.random_seed, num_customers=settings.num_customers,
+                      customer_levels=settings.customer_levels,
+                      start_date=settings.start.date(), end_date=settings.end.date(),
+                      registration_end=settings.registration_end.date())
+    if group == "orders":
+        config.update(low_window=[settings.low_start.date(), settings.low_end.date()],
+                      lambda_high=settings.lambda_high, lambda_low=settings.lambda_low,
+                      customer_share=settings.customer_share, order_types=settings.order_types,
+                      item_counts=settings.item_counts, item_weights=settings.item_weights,
+                      quantities=settings.quantities, quantity_weights=settings.quantity_weights)
+    return config
+
+
+def cached_tables(cache, group, build):
     """
-    Generates the stores table for 5 Kyiv-based coffee shops.
-    Each store includes address and geographic coordinates matching its district.
+    Returns {table name: DataFrame} for a group from the dataset cache, or calls build()
+    to generate it and stores the result. Without a cache it just calls build().
     """
-    store_data = [
-        {
-            "StoreId": 1,
-            "StoreName": "Brazil Coffee",
-            "District": "Shevchenkivskyi",
-            "City": "Kyiv",
-            "Address": "1 Shevchenko St, Kyiv",
-            "Latitude": 50.4501,
-            "Longitude": 30.5234
-        },
-        {
-            "StoreId": 2,
-            "StoreName": "Colombia Coffee",
-            "District": "Podilskyi",
-            "City": "Kyiv",
-            "Address": "5 Podil St, Kyiv",
-            "Latitude": 50.4410,
-            "Longitude": 30.5140
-        },
-        {
-            "StoreId": 3,
-            "StoreName": "Ethiopia Coffee",
-            "District": "Pecherskyi",
-            "City": "Kyiv",
-            "Address": "10 Pechersk St, Kyiv",
-            "Latitude": 50.4350,
-            "Longitude": 30.5550
-        },
-        {
-            "StoreId": 4,
-            "StoreName": "Vietnam Coffee",
-            "District": "Obolonskyi",
-            "City": "Kyiv",
-            "Address": "20 Obolon Ave, Kyiv",
-            "Latitude": 50.4450,
-            "Longitude": 30.4800
-        },
-        {
-            "StoreId": 5,
-            "StoreName": "Indonesia Coffee",
-            "District": "Darnytskyi",
-            "City": "Kyiv",
-            "Address": "15 Darnytsia Rd, Kyiv",
-            "Latitude": 50.4580,
-            "Longitude": 30.5980
-        }
-    ]
-    logging.info("Generated stores table with %d entries.", len(store_data))
-    return pd.DataFrame(store_data)
+    if cache is None:
+        return build()
+    key = config_key(cache_config(group))
+    dfs = cache.get(key, CACHE_GROUPS[group])
+    if dfs is None:
+        dfs = build()
+        cache.put(key, dfs)
+    return dfs
 
 
-def generate_orders(customers_df, products_df):
+def cached_order_windows(cache, windows, window_days):
     """
-    Generates the orders and order details tables using Poisson sampling for daily orders.
-    Assigns each order to a store based on weighted random selection.
-    Stores only the ProductId in order details.
+    Returns the order windows for the current configuration from the dataset cache, or
+    passes the (lazy) windows through while storing them, so memory stays per window.
+    Cached orders are re-chunked into window_days-day windows, as the entry may have been
+    stored by a run with other windows (or by a full run, as one window).
     """
-    orders = []
-    order_details = []
-    order_detail_id = 1
+    if cache is None:
+        return windows
+    key = config_key(cache_config("orders"))
+    cached = cache.get_windows(key, CACHE_GROUPS["orders"], order_window_split(GENERATOR_CONFIG, window_days))
+    if cached is not None:
+        return cached
+    return cache.put_windows(key, CACHE_GROUPS["orders"], windows)
 
-    current_day = OVERALL_START
-    order_id = 1
 
-    while current_day <= OVERALL_END:
-        # Determine if current_day is in low-frequency window
-        if LOW_START <= current_day <= LOW_END:
-            daily_lambda = LAMBDA_LOW
-        else:
-            daily_lambda = LAMBDA_HIGH
-
-        # Sample number of orders for current day using Poisson distribution
-        orders_today = np.random.poisson(lam=daily_lambda)
-        
-        for _ in range(orders_today):
-            order_date_str = current_day.strftime("%Y-%m-%d")
-            order_type = random.choice(["In-store", "Takeaway"])
-            # Assign customer only about 10% of the time
-            customer_id = random.choice(customers_df["CustomerId"]) if random.random() > 0.85 else None
-            # Assign store based on weighted random selection
-            store_id = random.choices(STORE_IDS, weights=STORE_WEIGHTS, k=1)[0]
-
-            # Generate a random number of items for this order (most orders have 1-3 items)
-            num_items = random.choices(population=[1, 2, 3, 4, 5],
-                                       weights=[0.4, 0.3, 0.2, 0.07, 0.03], k=1)[0]
-            order_subtotal = 0.0
-
-            for _ in range(num_items):
-                product = random.choice(products_df.to_dict('records'))
-                product_id = product["ProductId"]
-                base_price = product["Price"]
-                price = base_price  # no inflation adjustment
-                # Generate quantity (most order details have quantity = 1)
-                quantity = random.choices(population=[1, 2, 3],
-                                          weights=[0.8, 0.15, 0.05], k=1)[0]
-                line_total = price * quantity
-                order_subtotal += line_total
-
-                order_details.append({
-                    "OrderDetailId": order_detail_id,
-                    "OrderId": order_id,
-                    "ProductId": product_id,
-                    "Quantity": quantity
-                })
-                order_detail_id += 1
-
-            # Determine discount based on customer information
-            if customer_id is not None:
-                customer_record = customers_df.loc[customers_df["CustomerId"] == customer_id].iloc[0]
-                discount_str = customer_record["LevelOfDiscount"]
-                discount_rate = 0 if discount_str == "None" else float(discount_str.strip('%')) / 100.0
-            else:
-                discount_rate = 0
-
-            discount_amount = round(order_subtotal * discount_rate, 2)
-            final_total = round(order_subtotal - discount_amount, 2)
-
-            orders.append({
-                "OrderId": order_id,
-                "OrderDate": order_date_str,
-                "OrderType": order_type,
-                "CustomerId": customer_id,
-                "StoreId": store_id,
-                "SubTotal": round(order_subtotal, 2),
-                "TotalAmount": final_total,
-                "DiscountApplied": discount_rate > 0,
-                "DiscountAmount": discount_amount
-            })
-            order_id += 1
-
-        current_day += timedelta(days=1)
-
-    logging.info("Generated orders table with %d orders.", order_id - 1)
-    logging.info("Generated order details table with %d entries.", order_detail_id - 1)
-    return pd.DataFrame(orders), pd.DataFrame(order_details)
-
-
-def store_data(dfs, folder=DATA_FOLDER):
+def order_window_split(config, window_days):
     """
-    Saves the provided DataFrames to CSV files in the specified folder.
-    Expects a dictionary with keys as filenames and values as DataFrames.
+    Returns a DatasetCache split function that cuts cached (Orders, OrderDetails) into the
+    window_days-day windows iter_order_windows generates. Orders are sorted by OrderDate
+    and order details by OrderId, so each window is one contiguous row range per table.
     """
-    try:
-        os.makedirs(folder, exist_ok=True)
-        for filename, df in dfs.items():
-            filepath = os.path.join(folder, filename)
-            df.to_csv(filepath, index=False)
-            logging.info("Saved %s", filepath)
-    except Exception as e:
-        logging.error("Error saving files: %s", e)
-        raise
+    def split(orders, order_details):
+        import numpy as np
+
+        window_starts = [start.date() for _, start, _ in generator.order_partitions(config, window_days)]
+        order_dates = orders.column("OrderDate").to_numpy().astype("datetime64[D]")
+        order_bounds = np.append(np.searchsorted(order_dates, np.array(window_starts, dtype="datetime64[D]")),
+                                 len(order_dates))
+        # First OrderId of each window (past the last order for the end bound)
+        order_ids = orders.column("OrderId").to_numpy().astype(np.int64)
+        first_ids = np.append(order_ids, np.iinfo(np.int64).max)[order_bounds]
+        detail_bounds = np.searchsorted(order_details.column("OrderId").to_numpy().astype(np.int64), first_ids)
+        return [((int(order_bounds[i]), int(order_bounds[i + 1])), (int(detail_bounds[i]), int(detail_bounds[i + 1])))
+                for i in range(len(window_starts))]
+
+    return split
+
+
+# Tables stored together in one dataset cache entry
+CACHE_GROUPS = {
+    "products": ["Products"],
+    "stores": ["Stores"],
+    "customers": ["Customers"],
+    "orders": ["Orders", "OrderDetails"],
+}
 
 
 def main():
     """
     Main function to generate and store data.
+    Emits one JSON record with per-stage metrics at the end of the run.
     """
     logging.info("Data generation started.")
+    config = GENERATOR_CONFIG
+    metrics = RunMetrics("generate_data")
+    cache = DatasetCache(DATASET_CACHE_DIR, DATASET_CACHE_MAX_BYTES) if DATASET_CACHE_DIR else None
 
-    customers_df = generate_customers()
-    products_df = generate_products()
-    stores_df = generate_stores()
-    orders_df, order_details_df = generate_orders(customers_df, products_df)
-
-    # Dictionary of DataFrames to store
-    dfs = {
-        "Orders.csv": orders_df,
-        "Customers.csv": customers_df,
-        "Products.csv": products_df,
-        "OrderDetails.csv": order_details_df,
-        "Stores.csv": stores_df
-    }
-    store_data(dfs)
+    try:
+        with metrics.stage("generate_customers") as stage:
+            customers_df = cached_tables(cache, "customers", lambda: {"Customers": generator.generate_customers(config)})["Customers"]
+            stage["rows"] = len(customers_df)
+        with metrics.stage("generate_reference_tables") as stage:
+            products_df = cached_tables(cache, "products", lambda: {"Products": generator.generate_products(config)})["Products"]
+            stores_df = cached_tables(cache, "stores", lambda: {"Stores": generator.generate_stores(config)})["Stores"]
+            stage["rows"] = len(products_df) + len(stores_df)
+
+        # Dictionary of DataFrames to store
+        dfs = {
+            "Customers.csv": customers_df,
+            "Products.csv": products_df,
+            "Stores.csv": stores_df
+        }
+        if PARALLEL_WORKERS or STREAM_CHUNK_DAYS:
+            # Orders are generated and written window by window in these modes
+            if CSV_SHARDS:
+                logging.warning("CSV_SHARDS is ignored for Orders/OrderDetails written window by window.")
+            with metrics.stage("generate_and_store_orders") as stage, profile_to(PROFILE_GENERATE_ORDERS):
+                if PARALLEL_WORKERS:
+                    logging.info("Generating orders in %d-day partitions with %s workers.",
+                                 PARTITION_DAYS, PARALLEL_WORKERS)
+                    windows = cached_order_windows(
+                        cache, generator.iter_order_partitions(config, customers_df, products_df, PARALLEL_WORKERS,
+                                                               PARTITION_DAYS), PARTITION_DAYS)
+                else:
+                    windows = cached_order_windows(
+                        cache, generator.iter_order_windows(config, customers_df, products_df, STREAM_CHUNK_DAYS),
+                        STREAM_CHUNK_DAYS)
+                if VALIDATE_DATA:
+                    from coffee_shop_common.validation import check_windows
+                    windows = check_windows(windows, dfs, config.start, config.end)
+                counts = write_order_windows(windows, DATA_FOLDER, OUTPUT_FORMATS)
+                stage["rows"] = sum(counts)
+                stage["bytes"] = stored_bytes(["Orders.csv", "OrderDetails.csv"], DATA_FOLDER)
+        else:
+            with metrics.stage("generate_orders") as stage, profile_to(PROFILE_GENERATE_ORDERS):
+                order_dfs = cached_tables(cache, "orders", lambda: dict(zip(
+                    CACHE_GROUPS["orders"], generator.generate_orders(config, customers_df, products_df))))
+                orders_df, order_details_df = order_dfs["Orders"], order_dfs["OrderDetails"]
+                stage["rows"] = len(orders_df) + len(order_details_df)
+            dfs["Orders.csv"] = orders_df
+            dfs["OrderDetails.csv"] = order_details_df
+
+        if VALIDATE_DATA:
+            from coffee_shop_common.validation import check_tables
+            with metrics.stage("validate") as stage:
+                check_tables(dfs, config.start, config.end)
+                stage["rows"] = sum(len(df) for df in dfs.values())
+
+        with metrics.stage("store_data") as stage:
+            store_data(dfs, DATA_FOLDER, OUTPUT_FORMATS, shards=CSV_SHARDS, shard_workers=SHARD_WORKERS)
+            stage["rows"] = sum(len(df) for df in dfs.values())
+            stage["bytes"] = stored_bytes(dfs, DATA_FOLDER)
+    except Exception:
+        metrics.emit("failed")
+        raise
+
+    metrics.emit()
     logging.info("Data generation completed successfully.")
 
 
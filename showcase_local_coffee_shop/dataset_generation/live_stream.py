@@ -0,0 +1,350 @@
+"""
+Live order stream for load-testing streaming ingestion.
+
+Emits timestamped orders in real time at a target rate, built with the same order and
+order-detail logic as generate_orders (build_orders in coffee_shop_common/generator.py). Each order is one
+NDJSON event with its order details nested under "OrderDetails".
+
+A producer task releases batch k (k = 1, 2, ...) at k * batch size / rate seconds after
+the start, timestamped over the interval before it, and puts it on a bounded queue; a consumer task writes batches to the sink. When the sink falls
+behind, the queue fills up and the producer waits on it (backpressure) instead of
+buffering without limit, and the achieved rate drops below the target. Achieved versus
+target throughput is logged periodically and reported at the end.
+
+Sinks:
+    ndjson  rotating NDJSON files in --output (a file is renamed from .inprogress once full)
+    unix    a Unix domain socket at --socket (the reader's pace is the backpressure)
+    stdout  standard output (logs go to stderr)
+
+Usage:
+    python live_stream.py --rate 5000 --duration 60 --sink ndjson --output live_orders
+    python live_stream.py --rate 2000 --sink unix --socket /tmp/coffee_orders.sock
+    python live_stream.py --rate 100 --max-orders 1000 --sink stdout
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from coffee_shop_common import generator  # noqa: E402
+
+DEFAULT_RATE = 1000  # orders per second
+DEFAULT_BATCH_SIZE = 250  # orders per batch written to the sink
+DEFAULT_QUEUE_BATCHES = 8  # batches buffered before the producer has to wait
+DEFAULT_ROTATE_BYTES = 64 * 1024 * 1024
+DEFAULT_REPORT_SECONDS = 5.0
+STAGING_SUFFIX = ".inprogress"
+
+
+# -----------------------------
+# SINKS
+# -----------------------------
+class RotatingNDJSONSink:
+    """
+    Appends events to NDJSON files in folder, starting a new file once the current one
+    reaches max_bytes. Files are written as <name>.inprogress and renamed when complete.
+    """
+
+    def __init__(self, folder, max_bytes=DEFAULT_ROTATE_BYTES, prefix="orders"):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.file = None
+        self.path = None
+        self.file_bytes = 0
+        self.file_index = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def _open(self):
+        started = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self.path = os.path.join(self.folder, f"{self.prefix}-{started}-{self.file_index:05d}.ndjson")
+        self.file = open(self.path + STAGING_SUFFIX, "wb")
+        self.file_bytes = 0
+        self.file_index += 1
+
+    def _finish(self):
+        if self.file is None:
+            return
+        self.file.close()
+        os.replace(self.path + STAGING_SUFFIX, self.path)
+        logging.info("Finished %s (%d bytes)", self.path, self.file_bytes)
+        self.file = None
+
+    def _write(self, data):
+        if self.file is None:
+            self._open()
+        self.file.write(data)
+        self.file_bytes += len(data)
+        if self.file_bytes >= self.max_bytes:
+            self._finish()
+
+    async def write(self, data):
+        await asyncio.to_thread(self._write, data)
+
+    async def close(self):
+        await asyncio.to_thread(self._finish)
+
+
+class UnixSocketSink:
+    """
+    Writes events to a Unix domain socket; drain() waits while the reader is behind.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+
+    async def write(self, data):
+        if self.writer is None:
+            _, self.writer = await asyncio.open_unix_connection(self.path)
+        self.writer.write(data)
+        await self.writer.drain()
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+
+class StdoutSink:
+    """
+    Writes events to standard output; a blocked pipe blocks the writer thread.
+    """
+
+    def _write(self, data):
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+
+    async def write(self, data):
+        await asyncio.to_thread(self._write, data)
+
+    async def close(self):
+        pass
+
+
+def make_sink(args):
+    if args.sink == "ndjson":
+        return RotatingNDJSONSink(args.output, args.rotate_bytes)
+    if args.sink == "unix":
+        if not args.socket:
+            raise ValueError("--socket is required for the unix sink")
+        return UnixSocketSink(args.socket)
+    return StdoutSink()
+
+
+# -----------------------------
+# EVENTS
+# -----------------------------
+def order_events(orders_df, order_details_df, timestamps):
+    """
+    Serializes a batch as NDJSON: one event per order with its order details nested.
+    """
+    detail_columns = ["OrderDetailId", "ProductId", "Quantity"]
+    details = [dict(zip(detail_columns, row))
+               for row in zip(*(order_details_df[column].tolist() for column in detail_columns))]
+    # Order details are generated in OrderId order, so each order's details are a contiguous run
+    detail_ends = np.cumsum(np.bincount(order_details_df["OrderId"] - orders_df["OrderId"].iloc[0],
+                                        minlength=len(orders_df))).tolist()
+    customer_ids = orders_df["CustomerId"]
+
+    columns = {
+        "OrderId": orders_df["OrderId"].tolist(),
+        "OrderTimestamp": np.datetime_as_string(timestamps, unit="ms", timezone="UTC").tolist(),
+        "OrderDate": np.datetime_as_string(orders_df["OrderDate"].to_numpy(), unit="D").tolist(),
+        "OrderType": orders_df["OrderType"].astype(str).tolist(),
+        "CustomerId": customer_ids.astype(object).where(customer_ids.notna(), None).tolist(),
+        "StoreId": orders_df["StoreId"].tolist(),
+        "SubTotal": generator.money_values(orders_df["SubTotal"]).tolist(),
+        "TotalAmount": generator.money_values(orders_df["TotalAmount"]).tolist(),
+        "DiscountApplied": orders_df["DiscountApplied"].tolist(),
+        "DiscountAmount": generator.money_values(orders_df["DiscountAmount"]).tolist(),
+    }
+    lines = []
+    detail_start = 0
+    for values, detail_end in zip(zip(*columns.values()), detail_ends):
+        event = dict(zip(columns, values))
+        event["OrderDetails"] = details[detail_start:detail_end]
+        detail_start = detail_end
+        lines.append(json.dumps(event, separators=(",", ":")))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+# -----------------------------
+# STREAM
+# -----------------------------
+class StreamStats:
+    def __init__(self, target_rate):
+        self.target_rate = target_rate
+        self.started = time.perf_counter()
+        self.orders = 0
+        self.order_details = 0
+        self.batches = 0
+        self.bytes = 0
+        self.backpressure_seconds = 0.0
+        self.max_queue_depth = 0
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        achieved = self.orders / elapsed if elapsed > 0 else 0.0
+        return {
+            "target_orders_per_sec": self.target_rate,
+            "achieved_orders_per_sec": round(achieved, 1),
+            "achieved_ratio": round(achieved / self.target_rate, 3) if self.target_rate else None,
+            "elapsed_seconds": round(elapsed, 2),
+            "orders": self.orders,
+            "order_details": self.order_details,
+            "batches": self.batches,
+            "bytes": self.bytes,
+            "backpressure_seconds": round(self.backpressure_seconds, 2),
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+async def produce(queue, stats, stop, rate, batch_size, max_orders, config, rng, tables):
+    """
+    Puts batch k of batch_size orders on the queue k * batch_size / rate seconds after
+    stats.started, with order timestamps spread over the interval before it, so after k
+    batches exactly rate orders per second have been sent. When the queue is full the
+    producer waits, and the schedule moves back by the time lost instead of catching up
+    with a burst afterwards, so the sink never sees more than the target rate.
+    """
+    interval = batch_size / rate
+    schedule_start = stats.started
+    batches = 0
+    next_order_id = 1
+    next_order_detail_id = 1
+    while not stop.is_set() and (max_orders is None or next_order_id <= max_orders):
+        num_orders = batch_size if max_orders is None else min(batch_size, max_orders - next_order_id + 1)
+        release_at = schedule_start + (batches + 1) * interval
+        delay = release_at - time.perf_counter()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(stop.wait(), delay)
+                break
+            except asyncio.TimeoutError:
+                pass
+
+        batch_start = np.datetime64(datetime.now(timezone.utc).replace(tzinfo=None), "ms") - np.timedelta64(
+            round(interval * 1000), "ms")
+        offsets = np.sort(rng.random(num_orders)) * interval * 1000
+        timestamps = batch_start + offsets.astype("timedelta64[ms]")
+        orders_df, order_details_df = generator.build_orders(
+            config, tables, rng, timestamps.astype("datetime64[D]"), next_order_id, next_order_detail_id)
+        payload = order_events(orders_df, order_details_df, timestamps)
+        next_order_id += len(orders_df)
+        next_order_detail_id += len(order_details_df)
+
+        waited = time.perf_counter()
+        await queue.put((payload, len(orders_df), len(order_details_df)))
+        stats.backpressure_seconds += time.perf_counter() - waited
+        stats.max_queue_depth = max(stats.max_queue_depth, queue.qsize())
+        batches += 1
+        # A slow sink or generator lowers the achieved rate: the time lost is not made up later
+        behind = time.perf_counter() - (schedule_start + (batches + 1) * interval)
+        if behind > 0:
+            schedule_start += behind
+    await queue.put(None)
+
+
+async def consume(queue, sink, stats):
+    while True:
+        item = await queue.get()
+        if item is None:
+            break
+        payload, num_orders, num_order_details = item
+        await sink.write(payload)
+        stats.orders += num_orders
+        stats.order_details += num_order_details
+        stats.batches += 1
+        stats.bytes += len(payload)
+
+
+async def report_progress(stats, every):
+    last_orders, last_time = 0, time.perf_counter()
+    while True:
+        await asyncio.sleep(every)
+        now = time.perf_counter()
+        logging.info("%.0f orders/s (target %d), %d orders sent, backpressure %.1fs, max queue depth %d",
+                     (stats.orders - last_orders) / (now - last_time), stats.target_rate, stats.orders,
+                     stats.backpressure_seconds, stats.max_queue_depth)
+        last_orders, last_time = stats.orders, now
+
+
+async def run_stream(sink, rate=DEFAULT_RATE, batch_size=DEFAULT_BATCH_SIZE, queue_batches=DEFAULT_QUEUE_BATCHES,
+                     duration=None, max_orders=None, report_seconds=DEFAULT_REPORT_SECONDS, seed=None):
+    """
+    Streams orders to sink until duration seconds have passed, max_orders have been sent
+    or the process is interrupted, and returns the throughput report.
+    """
+    config = generator.GeneratorConfig()
+    customers_df = generator.generate_customers(config)
+    products_df = generator.generate_products(config)
+    tables = generator.order_tables(config, customers_df, products_df)
+    rng = np.random.default_rng(config.random_seed if seed is None else seed)
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    try:
+        loop.add_signal_handler(signal.SIGINT, stop.set)
+        loop.add_signal_handler(signal.SIGTERM, stop.set)
+    except (NotImplementedError, RuntimeError):  # no signal handlers on Windows event loops
+        pass
+    if duration is not None:
+        loop.call_later(duration, stop.set)
+
+    queue = asyncio.Queue(maxsize=queue_batches)
+    logging.info("Streaming orders at %d/s in batches of %d to %s.", rate, batch_size, type(sink).__name__)
+    stats = StreamStats(rate)
+    reporter = asyncio.create_task(report_progress(stats, report_seconds))
+    consumer = asyncio.create_task(consume(queue, sink, stats))
+    producer = asyncio.create_task(produce(queue, stats, stop, rate, batch_size, max_orders, config, rng, tables))
+    try:
+        await asyncio.gather(producer, consumer)
+    except (BrokenPipeError, ConnectionError) as e:
+        logging.warning("Sink closed: %s", e)
+        producer.cancel()
+    finally:
+        reporter.cancel()
+        await sink.close()
+
+    report = stats.report()
+    logging.info("Live stream report: %s", json.dumps(report))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream live coffee shop orders to a sink.")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help=f"target orders per second (default: {DEFAULT_RATE})")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"orders per batch (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--queue-batches", type=int, default=DEFAULT_QUEUE_BATCHES,
+                        help=f"batches buffered before backpressure (default: {DEFAULT_QUEUE_BATCHES})")
+    parser.add_argument("--duration", type=float, help="seconds to stream (default: until interrupted)")
+    parser.add_argument("--max-orders", type=int, help="stop after this many orders")
+    parser.add_argument("--sink", choices=["ndjson", "unix", "stdout"], default="ndjson")
+    parser.add_argument("--output", default="live_orders", help="folder for the ndjson sink (default: live_orders)")
+    parser.add_argument("--rotate-bytes", type=int, default=DEFAULT_ROTATE_BYTES,
+                        help="size at which the ndjson sink starts a new file (default: 64 MiB)")
+    parser.add_argument("--socket", help="socket path for the unix sink")
+    parser.add_argument("--report-seconds", type=float, default=DEFAULT_REPORT_SECONDS,
+                        help=f"progress log interval (default: {DEFAULT_REPORT_SECONDS})")
+    parser.add_argument("--seed", type=int, help="random seed (default: the generator's random_seed)")
+    args = parser.parse_args()
+
+    # Logs go to stderr, which keeps stdout clean for the stdout sink
+    logging.getLogger().setLevel(logging.INFO)
+    asyncio.run(run_stream(make_sink(args), args.rate, args.batch_size, args.queue_batches,
+                           args.duration, args.max_orders, args.report_seconds, args.seed))
+
+
+if __name__ == "__main__":
+    main()
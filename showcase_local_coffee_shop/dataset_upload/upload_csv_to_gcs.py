@@ -1,25 +1,21 @@
 import os
-from google.cloud import storage
+import sys
+import logging
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from coffee_shop_common.sharded_csv import SHARD_MANIFEST
+from coffee_shop_common.uploader import GCSBackend, upload_folder
 
 # Configure
 BUCKET_NAME = "coffee-shop-showcase" 
 folder_path = "E:\github_repos\data-analyst-portfolio\showcase_local_coffee_shop\dataset_generation"
 GCS_FOLDER = "csv_sources/"  # Folder inside the bucket
 
-def upload_files():
-    """Uploads all CSVs from a local folder to a GCS bucket."""
-    client = storage.Client()
-    bucket = client.bucket(BUCKET_NAME)
-
-    for file_name in os.listdir(folder_path):
-        if file_name.endswith(".csv"):
-            local_path = os.path.join(folder_path, file_name)
-            gcs_path = os.path.join(GCS_FOLDER, file_name)
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-            blob = bucket.blob(gcs_path)
-            blob.upload_from_filename(local_path)
-
-            print(f"Uploaded {file_name} to gs://{BUCKET_NAME}/{gcs_path}")
+def upload_files():
+    """Uploads new or changed CSVs from a local folder to a GCS bucket, concurrently."""
+    upload_folder(GCSBackend(BUCKET_NAME), folder_path, GCS_FOLDER, suffixes=(".csv", ".csv.gz", SHARD_MANIFEST))
 
 if __name__ == "__main__":
     upload_files()
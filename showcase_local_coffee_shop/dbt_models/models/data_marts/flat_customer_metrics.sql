@@ -1,38 +1,35 @@
-WITH order_counts AS (
+WITH customer_orders AS (
     SELECT 
         customer_key
-        , COUNT(DISTINCT order_key) AS orders_all_time
-        , COUNT(DISTINCT CASE 
-            WHEN order_date >= DATE_ADD(CURRENT_DATE(), INTERVAL -180 DAY) 
-            THEN order_key 
-        END) AS orders_past_180_days
+        , COUNT(*) AS orders_all_time
+        , COUNTIF(order_date >= DATE_ADD(CURRENT_DATE(), INTERVAL -180 DAY)) AS orders_past_180_days
         , MAX(order_date) AS last_order_date
-    FROM {{ ref('fact_order_details') }}
+        -- Summed as NUMERIC in millionths, like the local engine (MONEY_UNITS), so the total and
+        -- how a half cent rounds do not depend on the order the FLOAT64 amounts are added in
+        , SUM(ROUND(CAST(total_amount AS NUMERIC), 6)) AS monetary
+    FROM {{ ref('fact_orders') }}
     WHERE customer_key IS NOT NULL
     GROUP BY customer_key
 )
 
 , ltv_metrics AS (
     SELECT 
-        od.customer_key
+        co.customer_key
         , dc.registration_date
         , DATE_DIFF(CURRENT_DATE(), dc.registration_date, DAY) AS customer_age_days
-        , ROUND(SUM(od.total_amount), 2) AS ltv
-    FROM {{ ref('fact_order_details') }} od
+        , CAST(ROUND(co.monetary, 2) AS FLOAT64) AS ltv
+    FROM customer_orders co
     JOIN {{ ref('dim_customer') }} dc
-        ON od.customer_key = dc.customer_key
-    GROUP BY od.customer_key, dc.registration_date
+        ON co.customer_key = dc.customer_key
 )
 
 , rfm_prep AS (
     SELECT
         customer_key
-        , DATE_DIFF(CURRENT_DATE(), MAX(order_date), DAY) AS recency
-        , COUNT(DISTINCT order_key) AS frequency
-        , SUM(total_amount) AS monetary
-    FROM {{ ref('fact_order_details') }}
-    WHERE customer_key IS NOT NULL
-    GROUP BY customer_key
+        , DATE_DIFF(CURRENT_DATE(), last_order_date, DAY) AS recency
+        , orders_all_time AS frequency
+        , monetary
+    FROM customer_orders
 )
 
 , rfm_tiles AS (
@@ -79,7 +76,7 @@ SELECT
     , rfm.f_score
     , rfm.m_score
     , rfm.segment
-FROM order_counts oc
+FROM customer_orders oc
 LEFT JOIN ltv_metrics ltv 
     ON oc.customer_key = ltv.customer_key
 LEFT JOIN rfm_segments rfm 
@@ -1,3 +1,15 @@
+{#- Incremental only when raw orders are appended (see incremental_load in dbt_project.yml) -#}
+{{
+    config(
+        materialized='incremental' if var('incremental_load') else 'table',
+        incremental_strategy='merge',
+        unique_key='order_detail_id',
+        partition_by={'field': 'order_date', 'data_type': 'date', 'granularity': 'month'},
+        cluster_by=['store_key', 'customer_key'],
+        on_schema_change='append_new_columns'
+    )
+}}
+
 WITH prep AS (
     SELECT
         order_details.OrderDetailId AS order_detail_id
@@ -10,6 +22,10 @@ WITH prep AS (
     FROM {{source('coffee_shop_raw', 'orders')}} AS orders
     INNER JOIN {{source('coffee_shop_raw', 'order_details')}} AS order_details
         ON orders.OrderId = order_details.OrderId
+    {% if is_incremental() %}
+    -- Only the latest loaded day onwards; rows for that day are merged again on order_detail_id
+    WHERE orders.OrderDate >= (SELECT MAX(order_date) FROM {{ this }})
+    {% endif %}
 )
 
 , calc AS (
@@ -23,7 +39,8 @@ WITH prep AS (
         --, dim_date.date_key
         , prep.quantity
         , prep.quantity * dim_product.price AS sub_total
-        , ifnull(dim_customer.level_of_discount, 0) AS discount_rate
+        -- level_of_discount is a percent string ('5%', or 'None'); orders without a customer get no discount
+        , ifnull(safe_cast(rtrim(dim_customer.level_of_discount, '%') AS float64) / 100, 0) AS discount_rate
     FROM prep
     INNER JOIN {{ ref('dim_order') }} AS dim_order
         ON prep.order_id = dim_order.order_id
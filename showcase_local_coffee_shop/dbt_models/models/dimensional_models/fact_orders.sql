@@ -0,0 +1,64 @@
+{#- Incremental only when raw orders are appended (see incremental_load in dbt_project.yml) -#}
+{{
+    config(
+        materialized='incremental' if var('incremental_load') else 'table',
+        incremental_strategy='merge',
+        unique_key='order_key',
+        partition_by={'field': 'order_date', 'data_type': 'date', 'granularity': 'month'},
+        cluster_by=['store_key', 'customer_key'],
+        on_schema_change='append_new_columns'
+    )
+}}
+
+WITH order_items AS (
+    SELECT
+        fact_order_details.order_key
+        , fact_order_details.customer_key
+        , fact_order_details.store_key
+        , fact_order_details.order_date
+        , COUNT(*) AS item_count
+        , SUM(fact_order_details.quantity) AS quantity
+        , SUM(fact_order_details.sub_total) AS sub_total
+        , SUM(fact_order_details.discount_amount) AS discount_amount
+        , SUM(fact_order_details.total_amount) AS total_amount
+        , MAX(CASE WHEN dim_product.product_category = 'Beverage' THEN 1 ELSE 0 END) AS has_beverage
+        , MAX(CASE WHEN dim_product.product_category = 'Pastry' THEN 1 ELSE 0 END) AS has_pastry
+        , MAX(CASE WHEN dim_product.product_category = 'Savory' THEN 1 ELSE 0 END) AS has_savory
+    FROM {{ ref('fact_order_details') }} AS fact_order_details
+    LEFT JOIN {{ ref('dim_product') }} AS dim_product
+        ON fact_order_details.product_key = dim_product.product_key
+    {% if is_incremental() %}
+    -- All items of an order share its date, so orders from the latest loaded day onwards are complete
+    WHERE fact_order_details.order_date >= (SELECT MAX(order_date) FROM {{ this }})
+    {% endif %}
+    GROUP BY
+        fact_order_details.order_key
+        , fact_order_details.customer_key
+        , fact_order_details.store_key
+        , fact_order_details.order_date
+)
+
+SELECT
+    order_key
+    , customer_key
+    , store_key
+    , order_date
+    , item_count
+    , quantity
+    , sub_total
+    , discount_amount
+    , total_amount
+    , has_beverage
+    , has_pastry
+    , has_savory
+    , CASE
+        WHEN has_beverage + has_pastry + has_savory = 3 THEN 'All Categories'
+        WHEN has_beverage = 1 AND has_pastry = 1 AND has_savory = 0 THEN 'Beverage + Pastry'
+        WHEN has_beverage = 1 AND has_savory = 1 AND has_pastry = 0 THEN 'Beverage + Savory'
+        WHEN has_pastry = 1 AND has_savory = 1 AND has_beverage = 0 THEN 'Pastry + Savory'
+        WHEN has_beverage = 1 AND has_pastry = 0 AND has_savory = 0 THEN 'Beverage Only'
+        WHEN has_pastry = 1 AND has_beverage = 0 AND has_savory = 0 THEN 'Pastry Only'
+        WHEN has_savory = 1 AND has_beverage = 0 AND has_pastry = 0 THEN 'Savory Only'
+        ELSE 'Other'
+    END AS product_mix_type
+FROM order_items
@@ -1,187 +1,312 @@
 import os
+import json
 import logging
-import random
-import numpy as np
-import pandas as pd
+import sys
 from datetime import datetime, timedelta
-from google.cloud import storage
+
+# Shared helpers live in showcase_local_coffee_shop/coffee_shop_common (copied into /app by the Dockerfile).
+# NumPy, pandas and google-cloud-storage are imported by the stages that use them, to keep cold starts short.
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from coffee_shop_common import generator
+from coffee_shop_common.generator import GeneratorConfig
+from coffee_shop_common.metrics import RunMetrics, profile_to
+from coffee_shop_common.sharded_csv import SHARD_MANIFEST
+from coffee_shop_common.storage import PARQUET_MANIFEST, store_data, stored_bytes, write_order_windows
+from coffee_shop_common.uploader import (GCSBackend, discard_staged, open_csv_stream, publish_staged, upload_folder,
+                                         write_frames)
 
 # ----- Configuration -----
-RANDOM_SEED = 42
-random.seed(RANDOM_SEED)
-np.random.seed(RANDOM_SEED)
-
-NUM_CUSTOMERS = 500
-OVERALL_START = datetime(2022, 1, 1)
-OVERALL_END = datetime.now()
-LOW_START = datetime(2022, 2, 25)
-LOW_END = datetime(2022, 5, 31)
-LAMBDA_HIGH = 10
-LAMBDA_LOW = 3
+# Dataset parameters (seed, date range, order rates, discount levels, ...) default to the shared generator's,
+# so the job and dataset_generation/generate_data.py produce identical data; only the universe sizes are set here
+GENERATOR_CONFIG = GeneratorConfig(num_customers=int(os.environ.get("NUM_CUSTOMERS", "500")),
+                                   num_stores=int(os.environ.get("NUM_STORES", "5")))
+STREAM_CHUNK_DAYS = None  # e.g. 90 to append Orders/OrderDetails in day windows
+PARALLEL_WORKERS = None  # e.g. os.cpu_count(); output is identical for any worker count
+PARTITION_DAYS = 30
+
+# Output formats: "csv" and/or "parquet" (compressed, explicit types, Orders/OrderDetails partitioned by month)
+OUTPUT_FORMATS = [f.strip() for f in os.environ.get("OUTPUT_FORMATS", "csv").split(",")]
+
+# Sharded CSV: e.g. CSV_SHARDS=16 writes Orders/OrderDetails as gzip shards under shards/<Table>/ from a
+# process pool (SHARD_WORKERS, default all cores); load_to_bq reads them with CSV_SHARDED=true
+CSV_SHARDS = int(os.environ.get("CSV_SHARDS", "0"))
+SHARD_WORKERS = int(os.environ.get("SHARD_WORKERS", "0")) or os.cpu_count()
 
 LOCAL_FOLDER = "data_output"
 BUCKET_NAME = "coffee-shop-showcase"
 GCS_FOLDER = "csv_sources/"
-STORE_IDS = [1, 2, 3, 4, 5]
-STORE_WEIGHTS = [0.3, 0.2, 0.25, 0.15, 0.1]
+# Incremental mode: generate only the days after the watermark stored in the bucket
+INCREMENTAL_MODE = os.environ.get("INCREMENTAL_MODE", "false").lower() == "true"
+WATERMARK_PATH = GCS_FOLDER + "_watermark.json"
+DELTA_FOLDER = "delta"
+LOAD_SPEC_PATH = GCS_FOLDER + DELTA_FOLDER + "/_load.json"
+# Direct mode: stream each table as CSV straight into the bucket, never touching local disk
+OUTPUT_MODE = os.environ.get("OUTPUT_MODE", "disk")
+DIRECT_GZIP = os.environ.get("DIRECT_GZIP", "false").lower() == "true"
+# Path to dump a cProfile of order generation to (opt-in)
+PROFILE_GENERATE_ORDERS = os.environ.get("PROFILE_GENERATE_ORDERS")
+# Check keys, amounts and dates of the generated tables before anything is stored or uploaded
+VALIDATE_DATA = os.environ.get("VALIDATE_DATA", "true").lower() == "true"
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-# ----- Data Generation Functions -----
-def generate_customers():
-    customer_levels = ["3%", "5%", "7%", "10%", "15%"]
-    customers = []
-    customer_reg_days = (OVERALL_END - OVERALL_START).days
-    for customer_id in range(1, NUM_CUSTOMERS + 1):
-        level = random.choice(customer_levels)
-        reg_date = (
-            OVERALL_START + timedelta(days=random.randint(0, customer_reg_days))
-        ).strftime("%Y-%m-%d")
-        customers.append({
-            "CustomerId": str(customer_id),
-            "LevelOfDiscount": level,
-            "RegistrationDate": reg_date
-        })
-    logging.info("Generated customers table with %d entries.", len(customers))
-    return pd.DataFrame(customers)
-
-def generate_products():
-    product_data = [
-        {"ProductName": "Espresso", "ProductCategory": "Beverage", "Price": 2.5},
-        {"ProductName": "Latte", "ProductCategory": "Beverage", "Price": 4.0},
-        {"ProductName": "Cappuccino", "ProductCategory": "Beverage", "Price": 4.5},
-        {"ProductName": "Americano", "ProductCategory": "Beverage", "Price": 3.0},
-        {"ProductName": "Flat White", "ProductCategory": "Beverage", "Price": 3.5},
-        {"ProductName": "Matcha", "ProductCategory": "Beverage", "Price": 4.0},
-        {"ProductName": "Cold Brew", "ProductCategory": "Beverage", "Price": 4.0},
-        {"ProductName": "Espresso Tonic", "ProductCategory": "Beverage", "Price": 4.5},
-        {"ProductName": "Croissant", "ProductCategory": "Pastry", "Price": 3.0},
-        {"ProductName": "Blueberry Muffin", "ProductCategory": "Pastry", "Price": 2.0},
-        {"ProductName": "Chocolate Chip Cookie", "ProductCategory": "Pastry", "Price": 2.0},
-        {"ProductName": "Cheesecake Slice", "ProductCategory": "Pastry", "Price": 4.0},
-        {"ProductName": "Bagel with Cream Cheese", "ProductCategory": "Savory", "Price": 3.0},
-        {"ProductName": "Ham & Cheese Sandwich", "ProductCategory": "Savory", "Price": 4.0},
-        {"ProductName": "Chicken Sandwich", "ProductCategory": "Savory", "Price": 4.0},
-    ]
-    products = []
-    for product_id, product in enumerate(product_data, start=1):
-        products.append({
-            "ProductId": product_id,
-            "ProductName": product["ProductName"],
-            "ProductCategory": product["ProductCategory"],
-            "Price": product["Price"]
-        })
-    logging.info("Generated products table with %d entries.", len(products))
-    return pd.DataFrame(products)
-
-def generate_stores():
-    store_data = [
-        {"StoreId": 1, "StoreName": "Brazil Coffee", "District": "Shevchenkivskyi", "City": "Kyiv",
-         "Address": "1 Shevchenko St, Kyiv", "Latitude": 50.4501, "Longitude": 30.5234},
-        {"StoreId": 2, "StoreName": "Colombia Coffee", "District": "Podilskyi", "City": "Kyiv",
-         "Address": "5 Podil St, Kyiv", "Latitude": 50.4410, "Longitude": 30.5140},
-        {"StoreId": 3, "StoreName": "Ethiopia Coffee", "District": "Pecherskyi", "City": "Kyiv",
-         "Address": "10 Pechersk St, Kyiv", "Latitude": 50.4350, "Longitude": 30.5550},
-        {"StoreId": 4, "StoreName": "Vietnam Coffee", "District": "Obolonskyi", "City": "Kyiv",
-         "Address": "20 Obolon Ave, Kyiv", "Latitude": 50.4450, "Longitude": 30.4800},
-        {"StoreId": 5, "StoreName": "Indonesia Coffee", "District": "Darnytskyi", "City": "Kyiv",
-         "Address": "15 Darnytsia Rd, Kyiv", "Latitude": 50.4580, "Longitude": 30.5980}
-    ]
-    logging.info("Generated stores table with %d entries.", len(store_data))
-    return pd.DataFrame(store_data)
-
-def generate_orders(customers_df, products_df):
-    orders = []
-    order_details = []
-    order_detail_id = 1
-    order_id = 1
-    current_day = OVERALL_START
-
-    while current_day <= OVERALL_END:
-        daily_lambda = LAMBDA_LOW if LOW_START <= current_day <= LOW_END else LAMBDA_HIGH
-        orders_today = np.random.poisson(lam=daily_lambda)
-        for _ in range(orders_today):
-            order_date = current_day.strftime("%Y-%m-%d")
-            order_type = random.choice(["In-store", "Takeaway"])
-            customer_id = random.choice(customers_df["CustomerId"]) if random.random() > 0.7 else None
-            store_id = random.choices(STORE_IDS, weights=STORE_WEIGHTS, k=1)[0]
-            num_items = random.choices([1, 2, 3, 4, 5], [0.4, 0.3, 0.2, 0.07, 0.03])[0]
-            order_subtotal = 0.0
-
-            for _ in range(num_items):
-                product = random.choice(products_df.to_dict("records"))
-                quantity = random.choices([1, 2, 3], [0.8, 0.15, 0.05])[0]
-                line_total = product["Price"] * quantity
-                order_subtotal += line_total
-
-                order_details.append({
-                    "OrderDetailId": order_detail_id,
-                    "OrderId": order_id,
-                    "ProductId": product["ProductId"],
-                    "Quantity": quantity
-                })
-                order_detail_id += 1
-
-            discount_rate = 0.0
-            if customer_id:
-                discount_str = customers_df.loc[customers_df["CustomerId"] == customer_id].iloc[0]["LevelOfDiscount"]
-                discount_rate = float(discount_str.strip('%')) / 100.0 if discount_str != "None" else 0.0
-
-            discount_amt = round(order_subtotal * discount_rate, 2)
-            total = round(order_subtotal - discount_amt, 2)
-
-            orders.append({
-                "OrderId": order_id,
-                "OrderDate": order_date,
-                "OrderType": order_type,
-                "CustomerId": customer_id,
-                "StoreId": store_id,
-                "SubTotal": round(order_subtotal, 2),
-                "TotalAmount": total,
-                "DiscountApplied": discount_rate > 0,
-                "DiscountAmount": discount_amt
-            })
-            order_id += 1
-        current_day += timedelta(days=1)
-
-    logging.info("Generated orders table with %d orders.", order_id - 1)
-    logging.info("Generated order details table with %d entries.", order_detail_id - 1)
-    return pd.DataFrame(orders), pd.DataFrame(order_details)
-
-def store_data(dfs, folder=LOCAL_FOLDER):
-    os.makedirs(folder, exist_ok=True)
-    for filename, df in dfs.items():
-        filepath = os.path.join(folder, filename)
-        df.to_csv(filepath, index=False)
-        logging.info("Saved %s", filepath)
-
-def upload_to_gcs():
-    client = storage.Client()
-    bucket = client.bucket(BUCKET_NAME)
-    for file_name in os.listdir(LOCAL_FOLDER):
-        if file_name.endswith(".csv"):
-            local_path = os.path.join(LOCAL_FOLDER, file_name)
-            gcs_path = os.path.join(GCS_FOLDER, file_name)
-            blob = bucket.blob(gcs_path)
-            blob.upload_from_filename(local_path)
-            logging.info(f"Uploaded {file_name} to gs://{BUCKET_NAME}/{gcs_path}")
+# ----- Storage Functions -----
+def upload_to_gcs(local_folder=LOCAL_FOLDER, gcs_folder=GCS_FOLDER):
+    """Uploads new or changed files concurrently; deltas are uploaded separately by main_incremental."""
+    return upload_folder(GCSBackend(BUCKET_NAME), local_folder, gcs_folder,
+                         suffixes=(".csv", ".parquet", ".csv.gz", SHARD_MANIFEST, PARQUET_MANIFEST), exclude_dirs=(DELTA_FOLDER,))
 
-def main():
+# ----- Incremental Mode -----
+def load_watermark(bucket):
+    blob = bucket.blob(WATERMARK_PATH)
+    if not blob.exists():
+        return None
+    return json.loads(blob.download_as_text())
+
+def save_watermark(bucket, watermark):
+    bucket.blob(WATERMARK_PATH).upload_from_string(json.dumps(watermark), content_type="application/json")
+    logging.info("Saved watermark: last_date=%s, last_order_id=%d, last_order_detail_id=%d",
+                 watermark["last_date"], watermark["last_order_id"], watermark["last_order_detail_id"])
+
+def read_load_spec(bucket):
+    blob = bucket.blob(LOAD_SPEC_PATH)
+    if not blob.exists():
+        return None
+    return json.loads(blob.download_as_text())
+
+def pending_delta(load_spec):
+    """
+    Returns the load spec of the previous delta if load_to_bq has not loaded any of it yet, so the
+    new delta can include its days; None once it is loaded. A delta loaded only in part cannot be
+    replaced without losing or duplicating rows, so the run stops until load_to_bq finishes it.
+    """
+    if load_spec is None or load_spec["loaded"]:
+        return None
+    if load_spec.get("loaded_tables") or "base_watermark" not in load_spec:
+        raise RuntimeError(f"The delta up to {load_spec['last_date']} is not fully loaded "
+                           f"(loaded tables: {load_spec.get('loaded_tables', [])}); run load_to_bq before generating more.")
+    return load_spec
+
+def generate_increment(config, customers_df, products_df, watermark):
+    """
+    Generates orders for the days after the watermark and returns them with the next watermark.
+    Without a watermark it starts from config.start. Every day has its own random stream, so the
+    deltas of consecutive runs add up to exactly what generate_orders produces for the whole range.
+    """
+    if watermark is None:
+        start, first_order_id, first_order_detail_id = config.start, 1, 1
+    else:
+        start = datetime.strptime(watermark["last_date"], "%Y-%m-%d") + timedelta(days=1)
+        first_order_id = watermark["last_order_id"] + 1
+        first_order_detail_id = watermark["last_order_detail_id"] + 1
+
+    orders_df, order_details_df = generator.generate_orders_window(
+        config, customers_df, products_df, start, config.end,
+        first_order_id=first_order_id, first_order_detail_id=first_order_detail_id)
+    logging.info("Generated %d new orders and %d new order details from %s.",
+                 len(orders_df), len(order_details_df), start.strftime("%Y-%m-%d"))
+
+    next_watermark = {
+        "last_date": config.end.strftime("%Y-%m-%d") if start <= config.end else watermark["last_date"],
+        "last_order_id": first_order_id + len(orders_df) - 1,
+        "last_order_detail_id": first_order_detail_id + len(order_details_df) - 1,
+    }
+    return orders_df, order_details_df, next_watermark
+
+def main_incremental(metrics, config):
+    """
+    Generates only the days after the stored watermark. Dimension tables are replaced as usual,
+    while new orders go to delta files that load_to_bq appends (WRITE_APPEND) in incremental mode.
+    The first run has no watermark, so its delta holds the full history and is loaded with WRITE_TRUNCATE.
+    If the previous delta was not loaded, the new delta starts where that one did (see pending_delta).
+    """
+    logging.info("Starting incremental data generation and upload pipeline...")
+    from google.cloud import storage
+    bucket = storage.Client().bucket(BUCKET_NAME)
+    watermark = load_watermark(bucket)
+    pending = pending_delta(read_load_spec(bucket))
+    if pending is not None:
+        # Overwriting the unloaded delta would lose its days. They are regenerated from the watermark the
+        # delta started at instead (every day has its own random stream, so they come out the same).
+        logging.warning("The delta up to %s was not loaded; including its days in the new delta.", pending["last_date"])
+        watermark = pending["base_watermark"]
+
+    customers_df, products_df, stores_df = generate_reference_tables(metrics, config)
+    with metrics.stage("generate_orders") as stage, profile_to(PROFILE_GENERATE_ORDERS):
+        orders_df, order_details_df, next_watermark = generate_increment(config, customers_df, products_df, watermark)
+        stage["rows"] = len(orders_df) + len(order_details_df)
+
+    delta_folder = os.path.join(LOCAL_FOLDER, DELTA_FOLDER)
+    dimension_dfs = {"Customers.csv": customers_df, "Products.csv": products_df, "Stores.csv": stores_df}
+    delta_dfs = {"Orders.csv": orders_df, "OrderDetails.csv": order_details_df}
+    validate_data(metrics, config, {**dimension_dfs, **delta_dfs})
+    with metrics.stage("store_data") as stage:
+        store_data(dimension_dfs, LOCAL_FOLDER, OUTPUT_FORMATS)
+        # Deltas are written as single files so stale monthly partitions are never picked up again
+        store_data(delta_dfs, delta_folder, OUTPUT_FORMATS, partitioned=False)
+        stage["rows"] = sum(len(df) for df in (*dimension_dfs.values(), *delta_dfs.values()))
+        stage["bytes"] = stored_bytes(dimension_dfs, LOCAL_FOLDER) + stored_bytes(delta_dfs, delta_folder)
+    with metrics.stage("upload") as stage:
+        uploads = [upload_to_gcs(), upload_to_gcs(delta_folder, GCS_FOLDER + DELTA_FOLDER + "/")]
+        stage["rows"] = sum(len(upload["uploaded"]) for upload in uploads)
+        stage["bytes"] = sum(upload["bytes"] for upload in uploads)
+
+    load_spec = {
+        "write_disposition": "WRITE_TRUNCATE" if watermark is None else "WRITE_APPEND",
+        "last_date": next_watermark["last_date"],
+        "orders": len(orders_df),
+        "order_details": len(order_details_df),
+        "loaded": False,
+        # load_to_bq records each appended table, so a retry after a partial failure skips them
+        "loaded_tables": [],
+        # Where this delta starts, so a run that finds it unloaded can regenerate its days
+        "base_watermark": watermark,
+    }
+    bucket.blob(LOAD_SPEC_PATH).upload_from_string(json.dumps(load_spec), content_type="application/json")
+    # The watermark moves only after the delta and its load spec are safely in the bucket
+    save_watermark(bucket, next_watermark)
+    logging.info("Incremental pipeline completed successfully.")
+
+# ----- Direct Mode -----
+def main_direct(metrics, config):
+    """
+    Streams every table as CSV (optionally gzip-compressed, as <name>.csv.gz) straight from the
+    DataFrames into the bucket. Orders are written window by window when PARALLEL_WORKERS or
+    STREAM_CHUNK_DAYS is set, so neither local disk nor the full orders table is needed.
+    Every table is written to a staging object first and all of them replace the previous
+    run's objects only after the orders have streamed (and validated) cleanly.
+    """
+    logging.info("Starting direct data generation and upload pipeline...")
+    backend = GCSBackend(BUCKET_NAME)
+    suffix = ".gz" if DIRECT_GZIP else ""
+
+    customers_df, products_df, stores_df = generate_reference_tables(metrics, config)
+    reference_dfs = {"Customers.csv": customers_df, "Products.csv": products_df, "Stores.csv": stores_df}
+    validate_data(metrics, config, reference_dfs)
+    staged = []
+    try:
+        with metrics.stage("stream_reference_tables") as stage:
+            for filename, df in reference_dfs.items():
+                stage["rows"] += write_frames(backend, GCS_FOLDER + filename + suffix, [df], DIRECT_GZIP,
+                                              publish=False)
+                staged.append(GCS_FOLDER + filename + suffix)
+        num_orders, num_order_details = stream_orders(metrics, config, backend, customers_df, products_df,
+                                                      reference_dfs, suffix)
+        staged += [GCS_FOLDER + "Orders.csv" + suffix, GCS_FOLDER + "OrderDetails.csv" + suffix]
+    except BaseException:
+        for remote_path in staged:
+            discard_staged(backend, remote_path)
+        raise
+    for remote_path in staged:
+        publish_staged(backend, remote_path)
+    logging.info("Streamed %d orders and %d order details to the bucket.", num_orders, num_order_details)
+    logging.info("Direct pipeline completed successfully.")
+
+def stream_orders(metrics, config, backend, customers_df, products_df, reference_dfs, suffix):
+    """Streams Orders and OrderDetails to staging objects; returns their row counts."""
+    if PARALLEL_WORKERS:
+        windows = generator.iter_order_partitions(config, customers_df, products_df, PARALLEL_WORKERS, PARTITION_DAYS)
+    elif STREAM_CHUNK_DAYS:
+        windows = generator.iter_order_windows(config, customers_df, products_df, STREAM_CHUNK_DAYS)
+    else:
+        with metrics.stage("generate_orders") as stage, profile_to(PROFILE_GENERATE_ORDERS):
+            orders_df, order_details_df = generator.generate_orders(config, customers_df, products_df)
+            stage["rows"] = len(orders_df) + len(order_details_df)
+        windows = [(orders_df, order_details_df)]
+    if VALIDATE_DATA:
+        from coffee_shop_common.validation import check_windows
+        windows = check_windows(windows, reference_dfs, config.start, config.end)
+
+    num_orders, num_order_details = 0, 0
+    # Lazy windows are generated while streaming, so this stage includes their generation
+    with metrics.stage("stream_orders") as stage, \
+            open_csv_stream(backend, GCS_FOLDER + "Orders.csv" + suffix, DIRECT_GZIP,
+                            publish=False) as orders_stream, \
+            open_csv_stream(backend, GCS_FOLDER + "OrderDetails.csv" + suffix, DIRECT_GZIP,
+                            publish=False) as order_details_stream:
+        for window_index, (orders_df, order_details_df) in enumerate(windows):
+            orders_df.to_csv(orders_stream, header=window_index == 0, index=False)
+            order_details_df.to_csv(order_details_stream, header=window_index == 0, index=False)
+            num_orders += len(orders_df)
+            num_order_details += len(order_details_df)
+        stage["rows"] = num_orders + num_order_details
+    return num_orders, num_order_details
+
+def main_disk(metrics, config):
     logging.info("Starting data generation and upload pipeline...")
-    customers_df = generate_customers()
-    products_df = generate_products()
-    stores_df = generate_stores()
-    orders_df, order_details_df = generate_orders(customers_df, products_df)
+    customers_df, products_df, stores_df = generate_reference_tables(metrics, config)
     dfs = {
-        "Orders.csv": orders_df,
         "Customers.csv": customers_df,
         "Products.csv": products_df,
-        "OrderDetails.csv": order_details_df,
         "Stores.csv": stores_df,
     }
-    store_data(dfs)
-    upload_to_gcs()
+    if PARALLEL_WORKERS or STREAM_CHUNK_DAYS:
+        # Orders are generated and written window by window in these modes
+        if CSV_SHARDS:
+            logging.warning("CSV_SHARDS is ignored for Orders/OrderDetails written window by window.")
+        with metrics.stage("generate_and_store_orders") as stage, profile_to(PROFILE_GENERATE_ORDERS):
+            if PARALLEL_WORKERS:
+                logging.info("Generating orders in %d-day partitions with %s workers.", PARTITION_DAYS, PARALLEL_WORKERS)
+                windows = generator.iter_order_partitions(config, customers_df, products_df, PARALLEL_WORKERS,
+                                                          PARTITION_DAYS)
+            else:
+                windows = generator.iter_order_windows(config, customers_df, products_df, STREAM_CHUNK_DAYS)
+            if VALIDATE_DATA:
+                from coffee_shop_common.validation import check_windows
+                windows = check_windows(windows, dfs, config.start, config.end)
+            counts = write_order_windows(windows, LOCAL_FOLDER, OUTPUT_FORMATS)
+            stage["rows"] = sum(counts)
+            stage["bytes"] = stored_bytes(["Orders.csv", "OrderDetails.csv"], LOCAL_FOLDER)
+    else:
+        with metrics.stage("generate_orders") as stage, profile_to(PROFILE_GENERATE_ORDERS):
+            orders_df, order_details_df = generator.generate_orders(config, customers_df, products_df)
+            stage["rows"] = len(orders_df) + len(order_details_df)
+        dfs["Orders.csv"] = orders_df
+        dfs["OrderDetails.csv"] = order_details_df
+    validate_data(metrics, config, dfs)
+    with metrics.stage("store_data") as stage:
+        store_data(dfs, LOCAL_FOLDER, OUTPUT_FORMATS, shards=CSV_SHARDS, shard_workers=SHARD_WORKERS)
+        stage["rows"] = sum(len(df) for df in dfs.values())
+        stage["bytes"] = stored_bytes(dfs, LOCAL_FOLDER)
+    with metrics.stage("upload") as stage:
+        upload = upload_to_gcs()
+        stage["rows"] = len(upload["uploaded"])
+        stage["bytes"] = upload["bytes"]
     logging.info("Pipeline completed successfully.")
 
+def generate_reference_tables(metrics, config):
+    with metrics.stage("generate_customers") as stage:
+        customers_df = generator.generate_customers(config)
+        stage["rows"] = len(customers_df)
+    with metrics.stage("generate_reference_tables") as stage:
+        products_df = generator.generate_products(config)
+        stores_df = generator.generate_stores(config)
+        stage["rows"] = len(products_df) + len(stores_df)
+    return customers_df, products_df, stores_df
+
+def validate_data(metrics, config, dfs):
+    """Raises DataValidationError with sample rows if the tables fail any check (see coffee_shop_common/validation.py)."""
+    if not VALIDATE_DATA:
+        return
+    from coffee_shop_common.validation import check_tables
+    with metrics.stage("validate") as stage:
+        check_tables(dfs, config.start, config.end)
+        stage["rows"] = sum(len(df) for df in dfs.values())
+
+def main():
+    """Runs the configured pipeline and emits one JSON record with per-stage metrics."""
+    metrics = RunMetrics("generate_and_store")
+    try:
+        if INCREMENTAL_MODE:
+            main_incremental(metrics, GENERATOR_CONFIG)
+        elif OUTPUT_MODE == "direct":
+            main_direct(metrics, GENERATOR_CONFIG)
+        else:
+            main_disk(metrics, GENERATOR_CONFIG)
+    except Exception:
+        metrics.emit("failed")
+        raise
+    metrics.emit()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
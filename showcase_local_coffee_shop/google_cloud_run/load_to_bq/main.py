@@ -1,6 +1,164 @@
 from google.cloud import bigquery
+from google.cloud import storage
+from concurrent.futures import ThreadPoolExecutor
 import functions_framework
+import json
 import os
+import time
+
+TABLES = {
+    "Customers.csv": "customers",
+    "Orders.csv": "orders",
+    "Products.csv": "products",
+    "OrderDetails.csv": "order_details",
+    "Stores.csv": "stores"
+}
+
+# Explicit schemas, in CSV column order, so loads skip autodetect inference
+SCHEMAS = {
+    "customers": [
+        bigquery.SchemaField("CustomerId", "INT64"),
+        bigquery.SchemaField("LevelOfDiscount", "STRING"),
+        bigquery.SchemaField("RegistrationDate", "DATE"),
+    ],
+    "orders": [
+        bigquery.SchemaField("OrderId", "INT64"),
+        bigquery.SchemaField("OrderDate", "DATE"),
+        bigquery.SchemaField("OrderType", "STRING"),
+        bigquery.SchemaField("CustomerId", "INT64"),
+        bigquery.SchemaField("StoreId", "INT64"),
+        bigquery.SchemaField("SubTotal", "FLOAT64"),
+        bigquery.SchemaField("TotalAmount", "FLOAT64"),
+        bigquery.SchemaField("DiscountApplied", "BOOL"),
+        bigquery.SchemaField("DiscountAmount", "FLOAT64"),
+    ],
+    "products": [
+        bigquery.SchemaField("ProductId", "INT64"),
+        bigquery.SchemaField("ProductName", "STRING"),
+        bigquery.SchemaField("ProductCategory", "STRING"),
+        bigquery.SchemaField("Price", "FLOAT64"),
+    ],
+    "order_details": [
+        bigquery.SchemaField("OrderDetailId", "INT64"),
+        bigquery.SchemaField("OrderId", "INT64"),
+        bigquery.SchemaField("ProductId", "INT64"),
+        bigquery.SchemaField("Quantity", "INT64"),
+    ],
+    "stores": [
+        bigquery.SchemaField("StoreId", "INT64"),
+        bigquery.SchemaField("StoreName", "STRING"),
+        bigquery.SchemaField("District", "STRING"),
+        bigquery.SchemaField("City", "STRING"),
+        bigquery.SchemaField("Address", "STRING"),
+        bigquery.SchemaField("Latitude", "FLOAT64"),
+        bigquery.SchemaField("Longitude", "FLOAT64"),
+    ],
+}
+
+# Tables generated incrementally: in LOAD_MODE=incremental they are loaded from the
+# delta files written by generate_and_store, with the disposition given in delta/_load.json
+DELTA_TABLES = {"Orders.csv", "OrderDetails.csv"}
+DELTA_FOLDER = "delta/"
+
+# Tables written by generate_and_store as monthly Parquet partitions (<Table>/OrderMonth=YYYY-MM/*.parquet),
+# listed in <Table>/_parquet.json
+PARTITIONED_TABLES = {"Orders.csv", "OrderDetails.csv"}
+PARQUET_MANIFEST = "_parquet.json"
+
+# Tables written by generate_and_store with CSV_SHARDS as gzip CSV shards (shards/<Table>/part-*-of-N.csv.gz)
+SHARDED_TABLES = {"Orders.csv", "OrderDetails.csv"}
+SHARD_FOLDER = "shards/"
+SHARD_MANIFEST = "_shards.json"
+
+
+def source_uri(bucket, prefix, filename, source_format, partitioned):
+    """Returns the GCS URI of a table's CSV file or Parquet file, or the URIs of its Parquet partitions."""
+    if source_format == "parquet":
+        stem = os.path.splitext(filename)[0]
+        if partitioned:
+            return partition_uris(bucket, prefix, stem)
+        return f"gs://{bucket}/{prefix}{stem}.parquet"
+    return f"gs://{bucket}/{prefix}{filename}"
+
+
+def partition_uris(bucket, prefix, stem):
+    """
+    Returns the URIs of the Parquet parts listed in the table's manifest. Parts left in the
+    bucket by an earlier run with other windows are not listed, so they are never loaded.
+    """
+    blob = storage.Client().bucket(bucket).blob(f"{prefix}{stem}/{PARQUET_MANIFEST}")
+    manifest = json.loads(blob.download_as_text())
+    return [f"gs://{bucket}/{prefix}{stem}/{path}" for path in manifest["files"]]
+
+
+def sharded_uri(bucket, prefix, filename):
+    """
+    Returns a wildcard URI matching the shards listed in the table's shard manifest.
+    The shard count is part of the pattern, so shards of an earlier layout are not picked up.
+    """
+    stem = os.path.splitext(filename)[0]
+    blob = storage.Client().bucket(bucket).blob(f"{prefix}{SHARD_FOLDER}{stem}/{SHARD_MANIFEST}")
+    manifest = json.loads(blob.download_as_text())
+    return f"gs://{bucket}/{prefix}{SHARD_FOLDER}{stem}/{manifest['pattern']}"
+
+
+def read_load_spec(bucket, gcs_prefix):
+    blob = storage.Client().bucket(bucket).blob(f"{gcs_prefix}{DELTA_FOLDER}_load.json")
+    return blob, json.loads(blob.download_as_text())
+
+
+def build_job_config(table, source_format, write_disposition):
+    if source_format == "parquet":
+        # Parquet carries its own typed schema, so no header skipping or type inference
+        return bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition=write_disposition,
+        )
+    return bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.CSV,
+        skip_leading_rows=1,
+        schema=SCHEMAS[table],
+        write_disposition=write_disposition,
+    )
+
+
+def run_load_jobs(client, loads):
+    """
+    Submits every load at once, then waits on all of them together, so total latency
+    tracks the slowest table rather than the sum of all tables.
+    loads is a list of dicts with "table", "uri" (one URI or a list), "table_id" and "job_config".
+    Returns per-table results with row counts and seconds from submission to completion.
+    A load whose submission fails is reported as failed; the jobs already submitted are still
+    waited on, so the caller records every table that was loaded.
+    """
+    started = time.perf_counter()
+    submitted = []
+    submit_failures = {}
+    for load in loads:
+        submitted_at = time.perf_counter()
+        try:
+            job = client.load_table_from_uri(load["uri"], load["table_id"], job_config=load["job_config"])
+        except Exception as e:
+            submit_failures[load["table"]] = {"table_id": load["table_id"], "uri": load["uri"], "status": "failed",
+                                              "error": str(e), "seconds": round(time.perf_counter() - submitted_at, 3)}
+            continue
+        submitted.append((load, job, submitted_at))
+
+    def wait(item):
+        load, job, submitted_at = item
+        result = {"table_id": load["table_id"], "uri": load["uri"]}
+        try:
+            job.result()
+            result.update(status="loaded", rows=job.output_rows)
+        except Exception as e:
+            result.update(status="failed", error=str(e))
+        result["seconds"] = round(time.perf_counter() - submitted_at, 3)
+        return load["table"], result
+
+    with ThreadPoolExecutor(max_workers=max(len(submitted), 1)) as executor:
+        results = {**dict(executor.map(wait, submitted)), **submit_failures}
+    return {load["table"]: results[load["table"]] for load in loads}, round(time.perf_counter() - started, 3)
+
 
 @functions_framework.http
 def load_csvs(request):
@@ -8,30 +166,64 @@ def load_csvs(request):
     dataset = os.environ["DATASET"]
     bucket = os.environ["BUCKET"]
     gcs_prefix = os.environ["GCS_PREFIX"]
+    incremental = os.environ.get("LOAD_MODE", "full") == "incremental"
+    source_format = os.environ.get("SOURCE_FORMAT", "csv")
+    # "gzip" for the <name>.csv.gz objects written by generate_and_store in direct mode
+    csv_compression = os.environ.get("CSV_COMPRESSION", "none")
+    # "true" to load SHARDED_TABLES from the gzip shards written by generate_and_store with CSV_SHARDS
+    csv_sharded = os.environ.get("CSV_SHARDED", "false").lower() == "true"
 
-    tables = {
-        "Customers.csv": "customers",
-        "Orders.csv": "orders",
-        "Products.csv": "products",
-        "OrderDetails.csv": "order_details",
-        "Stores.csv": "stores"
-    }
+    if incremental:
+        load_spec_blob, load_spec = read_load_spec(bucket, gcs_prefix)
 
-    client = bigquery.Client(project=project)
+    loads = []
+    skipped = []
+    for filename, table in TABLES.items():
+        if incremental and filename in DELTA_TABLES:
+            if load_spec["loaded"] or table in load_spec.get("loaded_tables", []):
+                print(f"⏭️ Delta for {filename} already loaded, skipping")
+                skipped.append(table)
+                continue
+            # Deltas are always single files, never monthly partitions or shards
+            uri = source_uri(bucket, gcs_prefix + DELTA_FOLDER, filename, source_format, False)
+            write_disposition = load_spec["write_disposition"]
+        else:
+            uri = source_uri(bucket, gcs_prefix, filename, source_format, filename in PARTITIONED_TABLES)
+            if source_format == "csv" and csv_sharded and filename in SHARDED_TABLES:
+                uri = sharded_uri(bucket, gcs_prefix, filename)
+            elif source_format == "csv" and csv_compression == "gzip":
+                uri += ".gz"
+            write_disposition = bigquery.WriteDisposition.WRITE_TRUNCATE
 
-    for filename, table in tables.items():
-        uri = f"gs://{bucket}/{gcs_prefix}{filename}"
-        table_id = f"{project}.{dataset}.{table}"
+        loads.append({
+            "table": table,
+            "uri": uri,
+            "table_id": f"{project}.{dataset}.{table}",
+            "job_config": build_job_config(table, source_format, write_disposition),
+        })
 
-        job_config = bigquery.LoadJobConfig(
-            source_format=bigquery.SourceFormat.CSV,
-            skip_leading_rows=1,
-            autodetect=True,
-            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
-        )
+    client = bigquery.Client(project=project)
+    results, total_seconds = run_load_jobs(client, loads)
+    for table, result in results.items():
+        if not isinstance(result["uri"], str):
+            result["uri"] = f"{len(result['uri'])} parts listed in {PARQUET_MANIFEST}"
+        if result["status"] == "loaded":
+            print(f"✅ Loaded {result['uri']} into {result['table_id']}: {result['rows']} rows in {result['seconds']}s")
+        else:
+            print(f"❌ Failed to load {result['uri']} into {result['table_id']}: {result['error']}")
 
-        job = client.load_table_from_uri(uri, table_id, job_config=job_config)
-        job.result()
-        print(f"✅ Loaded {filename} into {table_id}")
+    failed = [table for table, result in results.items() if result["status"] != "loaded"]
+    if incremental and not load_spec["loaded"]:
+        # Record every delta table appended so far, so a retry after a partial failure (or a
+        # repeated call) does not append it twice; the delta is consumed once all of them are
+        delta_tables = [TABLES[filename] for filename in DELTA_TABLES]
+        loaded_tables = set(load_spec.get("loaded_tables", []))
+        loaded_tables |= {table for table, result in results.items()
+                          if table in delta_tables and result["status"] == "loaded"}
+        load_spec["loaded_tables"] = sorted(loaded_tables)
+        load_spec["loaded"] = loaded_tables >= set(delta_tables)
+        load_spec_blob.upload_from_string(json.dumps(load_spec), content_type="application/json")
 
-    return "All tables loaded.", 200
+    body = {"tables": results, "skipped": skipped, "total_seconds": total_seconds}
+    status = 500 if failed else 200
+    return json.dumps(body), status, {"Content-Type": "application/json"}
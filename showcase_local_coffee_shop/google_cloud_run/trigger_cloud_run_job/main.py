@@ -2,29 +2,115 @@ import functions_framework
 import google.auth
 from google.auth.transport.requests import Request
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
 import os
+import threading
+
+# Warm instances reuse the credentials and the pooled session across invocations
+SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+# Tokens are refreshed once they are this close to expiry, not on every request
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+# (connect, read) seconds
+TIMEOUT = (5, 30)
+POOL_SIZE = 8
+# Only failures where the job was not started are retried: connection errors, 429 and 503.
+# A read timeout or another 5xx may follow a started run, so retrying could start a duplicate.
+RETRY = Retry(total=3, connect=3, read=0, status=3, status_forcelist=(429, 503),
+              allowed_methods=frozenset({"POST"}), backoff_factor=0.5, raise_on_status=False)
+
+_session = None
+_credentials = None
+_lock = threading.Lock()
+_credentials_lock = threading.Lock()
+# Job URL -> Future of the run request currently in flight for it
+_inflight = {}
+
+
+def get_session():
+    global _session
+    with _lock:
+        if _session is None:
+            adapter = HTTPAdapter(pool_maxsize=POOL_SIZE, max_retries=RETRY)
+            _session = requests.Session()
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def get_token(force_refresh=False):
+    """
+    Returns an access token for the function's service account, loading the default
+    credentials once per instance and refreshing them only near expiry.
+    """
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None:
+            _credentials, _ = google.auth.default(scopes=SCOPES)
+        # google-auth keeps expiry as naive UTC
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        expiry = _credentials.expiry
+        if force_refresh or not _credentials.token or (expiry is not None and expiry - TOKEN_REFRESH_MARGIN <= now):
+            _credentials.refresh(Request(session=get_session()))
+        return _credentials.token
+
+
+def run_job(url):
+    """Sends the run request; retries once with a fresh token if the cached one is rejected."""
+    session = get_session()
+    response = session.post(url, headers={"Authorization": f"Bearer {get_token()}"}, timeout=TIMEOUT)
+    if response.status_code == 401:
+        response = session.post(url, headers={"Authorization": f"Bearer {get_token(force_refresh=True)}"},
+                                 timeout=TIMEOUT)
+    return response.status_code, response.text
+
+
+def run_job_coalesced(url):
+    """
+    Runs the job unless a run request for it is already in flight on this instance, in which
+    case it waits for that request and shares its result instead of starting a second run.
+    Returns (status_code, text, coalesced).
+    """
+    with _lock:
+        future = _inflight.get(url)
+        leader = future is None
+        if leader:
+            future = _inflight[url] = Future()
+    if not leader:
+        status_code, text = future.result()
+        return status_code, text, True
+    try:
+        result = run_job(url)
+        future.set_result(result)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(url, None)
+    return (*result, False)
+
 
 @functions_framework.http
 def trigger_job(request):
     project_id = os.environ["PROJECT_ID"]
     job_name = os.environ["JOB_NAME"]
     region = os.environ["REGION"]
+    # Overridable to point the function at a local stub (see benchmarks/trigger_latency.py)
+    endpoint = os.environ.get("RUN_API_ENDPOINT", f"https://{region}-run.googleapis.com")
 
-    url = f"https://{region}-run.googleapis.com/apis/run.googleapis.com/v1/namespaces/{project_id}/jobs/{job_name}:run"
-
-    # Get default credentials (uses Cloud Function's service account)
-    credentials, _ = google.auth.default()
-    auth_req = Request()
-    credentials.refresh(auth_req)
-    id_token = credentials.token
-
-    headers = {
-        "Authorization": f"Bearer {id_token}"
-    }
+    url = f"{endpoint}/apis/run.googleapis.com/v1/namespaces/{project_id}/jobs/{job_name}:run"
 
-    response = requests.post(url, headers=headers)
+    try:
+        status_code, text, coalesced = run_job_coalesced(url)
+    except requests.RequestException as e:
+        return f"❌ Failed to trigger job: {e}", 500
 
-    if response.status_code == 200:
+    if status_code == 200:
+        if coalesced:
+            return f"✅ Job {job_name} already triggered by a concurrent request.", 200
         return f"✅ Job {job_name} triggered successfully.", 200
     else:
-        return f"❌ Failed to trigger job: {response.status_code} - {response.text}", 500
+        return f"❌ Failed to trigger job: {status_code} - {text}", 500
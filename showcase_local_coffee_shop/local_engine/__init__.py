@@ -0,0 +1,4 @@
+"""
+In-process pandas/NumPy implementation of the dbt models, for running the transformations
+on generated tables locally instead of in BigQuery.
+"""
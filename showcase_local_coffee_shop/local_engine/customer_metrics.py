@@ -0,0 +1,302 @@
+"""
+Incremental customer metrics and RFM scores with running per-customer state.
+
+flat_customer_metrics recomputes every customer's aggregates and sorts all customers
+three times for the NTILE(5) scores on each run. CustomerMetricsState instead keeps
+per customer the order count, spend, last order day and orders in the last ACTIVE_DAYS
+days, and updates them from each batch of new fact_orders rows:
+
+- Only customers in the batch change; their old values are removed from, and their new
+  values added to, one histogram per RFM dimension: exact counts per last order day and
+  per order count, and a DDSketch (relative_accuracy, default 1%) for monetary value.
+- The 180-day counts are kept with per-day buckets of the orders inside the window; when
+  the clock moves forward (advance_to), the days leaving the window are subtracted.
+- Tile boundaries come from the histograms' bucket counts (O(buckets)), so scoring
+  needs no sort over the customer base.
+
+A daily update therefore costs in proportion to that day's orders (plus the expiring
+day); scoring every customer is a vectorized lookup of their bucket's tile.
+
+Scores match flat_customer_metrics except where NTILE itself is arbitrary: customers
+sharing a value (or, for monetary value, a sketch bucket) get the tile of the group's
+middle rank instead of being split across a boundary. Counts, recency and LTV are exact:
+spend is kept in integer MONEY_UNITS like flat_customer_metrics sums it, so batching the
+orders by day does not change how a half cent rounds.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from local_engine.models import (ACTIVE_DAYS, MONEY_UNITS, RFM_TILES, bq_round, current_date, lookup,
+                                 money_units, rfm_segment, round_money_units)
+from local_engine.sketches import CountHistogram, DDSketch
+
+EPOCH = np.datetime64("1970-01-01", "D")
+INITIAL_CAPACITY = 1024
+
+
+def day_numbers(dates):
+    """Days since 1970-01-01 of the given dates."""
+    return (pd.to_datetime(pd.Series(dates)).to_numpy("datetime64[D]") - EPOCH).astype(np.int64)
+
+
+def split_by_day(days, positions, counts):
+    """
+    Yields (day, positions, counts) for each run of equal days in the day-sorted arrays.
+    """
+    starts = np.flatnonzero(np.diff(days, prepend=days[:1] - 1)) if len(days) else np.array([], dtype=np.int64)
+    ends = np.append(starts[1:], len(days))
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        yield int(days[start]), positions[start:end], counts[start:end]
+
+
+class CustomerMetricsState:
+    """
+    Running customer aggregates plus the histograms behind the R, F and M tiles.
+
+    Orders are loaded by whole days: update() ignores orders dated on or before the last
+    loaded day (loaded_through), so re-feeding a day that is already in does not double
+    count it. today plays the role of CURRENT_DATE() and only moves forward.
+    """
+
+    def __init__(self, today=None, relative_accuracy=0.01):
+        self.today = int(day_numbers([current_date() if today is None else today])[0])
+        self.loaded_through = None
+        self.positions = {}
+        self.customer_keys = []
+        self.orders_all_time = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        # Spend in MONEY_UNITS
+        self.monetary = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self.last_order_day = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self.orders_past_180_days = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        # Order day -> (customer positions, order counts) for days inside the activity window
+        self.window_days = {}
+        self.recency_histogram = CountHistogram()
+        self.frequency_histogram = CountHistogram()
+        self.monetary_sketch = DDSketch(relative_accuracy)
+
+    def __len__(self):
+        return len(self.customer_keys)
+
+    # -----------------------------
+    # UPDATES
+    # -----------------------------
+    def customer_positions(self, customer_keys):
+        """
+        Positions of the customers in the state arrays, appending customers seen for the first time.
+        """
+        positions = np.empty(len(customer_keys), dtype=np.int64)
+        for index, key in enumerate(customer_keys):
+            position = self.positions.get(key)
+            if position is None:
+                position = self.positions[key] = len(self.customer_keys)
+                self.customer_keys.append(key)
+            positions[index] = position
+        if len(self.customer_keys) > len(self.orders_all_time):
+            self.grow(len(self.customer_keys))
+        return positions
+
+    def grow(self, size):
+        capacity = max(size, 2 * len(self.orders_all_time))
+        for name in ("orders_all_time", "monetary", "last_order_day", "orders_past_180_days"):
+            array = getattr(self, name)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def update(self, fact_orders_df):
+        """
+        Adds a batch of fact_orders rows (customer_key, order_date, total_amount) dated after
+        loaded_through. Returns the number of orders added.
+        """
+        days = day_numbers(fact_orders_df["order_date"])
+        new = fact_orders_df["customer_key"].notna().to_numpy()
+        if self.loaded_through is not None:
+            new = new & (days > self.loaded_through)
+        if not new.any():
+            return 0
+        days = days[new]
+        customer_keys = fact_orders_df["customer_key"].to_numpy(object)[new]
+        batch_keys, batch_codes = np.unique(customer_keys, return_inverse=True)
+        positions = self.customer_positions(batch_keys.tolist())
+        counts = np.bincount(batch_codes, minlength=len(batch_keys))
+        amounts = money_units(fact_orders_df["total_amount"].to_numpy(np.float64)[new])
+        spend = np.bincount(batch_codes, weights=amounts, minlength=len(batch_keys)).astype(np.int64)
+        last_days = np.full(len(batch_keys), np.iinfo(np.int64).min)
+        np.maximum.at(last_days, batch_codes, days)
+
+        existing = positions[self.orders_all_time[positions] > 0]
+        self.remove_from_histograms(existing)
+        self.orders_all_time[positions] += counts
+        self.monetary[positions] += spend
+        self.last_order_day[positions] = np.maximum(self.last_order_day[positions], last_days)
+        self.add_to_histograms(positions)
+
+        self.add_to_window(positions[batch_codes], days)
+        self.loaded_through = max(self.loaded_through or int(days.max()), int(days.max()))
+        return len(days)
+
+    def add_to_histograms(self, positions):
+        self.recency_histogram.add(self.last_order_day[positions])
+        self.frequency_histogram.add(self.orders_all_time[positions])
+        self.monetary_sketch.add(self.monetary[positions] / MONEY_UNITS)
+
+    def remove_from_histograms(self, positions):
+        self.recency_histogram.remove(self.last_order_day[positions])
+        self.frequency_histogram.remove(self.orders_all_time[positions])
+        self.monetary_sketch.remove(self.monetary[positions] / MONEY_UNITS)
+
+    def add_to_window(self, order_positions, days):
+        """
+        Counts orders dated inside the activity window and keeps them per day for expiry.
+        """
+        in_window = days >= self.today - ACTIVE_DAYS
+        order_positions, days = order_positions[in_window], days[in_window]
+        np.add.at(self.orders_past_180_days, order_positions, 1)
+        # Sort by (day, customer) once and split into per-day runs of (customer, order count)
+        order = np.lexsort((order_positions, days))
+        days, order_positions = days[order], order_positions[order]
+        pair_starts = np.flatnonzero(np.diff(days, prepend=-1) | np.diff(order_positions, prepend=-1))
+        pair_counts = np.diff(np.append(pair_starts, len(days)))
+        for day, day_positions, day_counts in split_by_day(days[pair_starts], order_positions[pair_starts],
+                                                           pair_counts):
+            if day in self.window_days:
+                previous_positions, previous_counts = self.window_days[day]
+                day_positions = np.concatenate([previous_positions, day_positions])
+                day_counts = np.concatenate([previous_counts, day_counts])
+            self.window_days[day] = (day_positions, day_counts)
+
+    def advance_to(self, today):
+        """
+        Moves CURRENT_DATE() forward, expiring the order days that leave the activity window.
+        """
+        today = int(day_numbers([today])[0])
+        if today < self.today:
+            raise ValueError("CustomerMetricsState can only move forward in time")
+        self.today = today
+        for day in [day for day in self.window_days if day < today - ACTIVE_DAYS]:
+            day_positions, day_counts = self.window_days.pop(day)
+            np.subtract.at(self.orders_past_180_days, day_positions, day_counts)
+
+    def merge(self, other):
+        """
+        Folds in a state built from other orders (e.g. another partition of the history),
+        at this state's date (other must not be ahead of it). Costs in proportion to the other state's customers.
+        """
+        if other.today > self.today:
+            raise ValueError("Cannot merge a state that is ahead of this one; advance this state first")
+        count = len(other)
+        positions = self.customer_positions(other.customer_keys)
+        existing = positions[self.orders_all_time[positions] > 0]
+        self.remove_from_histograms(existing)
+        self.orders_all_time[positions] += other.orders_all_time[:count]
+        self.monetary[positions] += other.monetary[:count]
+        self.last_order_day[positions] = np.maximum(self.last_order_day[positions], other.last_order_day[:count])
+        self.add_to_histograms(positions)
+        for day, (day_positions, day_counts) in other.window_days.items():
+            self.add_to_window(np.repeat(positions[day_positions], day_counts),
+                               np.full(int(day_counts.sum()), day, dtype=np.int64))
+        if self.loaded_through is None or (other.loaded_through or 0) > self.loaded_through:
+            self.loaded_through = other.loaded_through
+
+    # -----------------------------
+    # SCORES AND OUTPUT
+    # -----------------------------
+    def scores(self, positions=None):
+        """
+        (r_score, f_score, m_score) of the customers at positions (default: all).
+        Recency is ranked descending, i.e. by last order day ascending.
+        """
+        positions = np.arange(len(self)) if positions is None else np.asarray(positions)
+        return (self.recency_histogram.score(self.last_order_day[positions], RFM_TILES),
+                self.frequency_histogram.score(self.orders_all_time[positions], RFM_TILES),
+                self.monetary_sketch.score(self.monetary[positions] / MONEY_UNITS, RFM_TILES))
+
+    def to_frame(self, dim_customer_df=None):
+        """
+        All customers with the columns of flat_customer_metrics. registration_date and
+        customer_age_days need dim_customer_df.
+        """
+        count = len(self)
+        today = pd.Timestamp(EPOCH + self.today)
+        orders_all_time = self.orders_all_time[:count]
+        orders_past_180_days = self.orders_past_180_days[:count]
+        ltv = round_money_units(self.monetary[:count], 2)
+        customer_keys = pd.array(self.customer_keys, dtype="str")
+        if dim_customer_df is not None:
+            registration_date = dim_customer_df["registration_date"].array.take(
+                lookup(dim_customer_df["customer_key"], customer_keys), allow_fill=True)
+        else:
+            registration_date = pd.array(np.full(count, np.datetime64("NaT"), dtype="datetime64[s]"))
+        r_score, f_score, m_score = self.scores()
+
+        return pd.DataFrame({
+            "customer_key": customer_keys,
+            "registration_date": registration_date,
+            "is_active_180d": (orders_past_180_days > 0).astype(np.int64),
+            "orders_all_time": orders_all_time,
+            "orders_past_180_days": orders_past_180_days,
+            "days_since_last_order": self.today - self.last_order_day[:count],
+            "ltv": ltv,
+            "customer_age_days": pd.array((today - pd.DatetimeIndex(registration_date)).days, dtype="Int64"),
+            "avg_order_value": bq_round(ltv / orders_all_time, 2),
+            "r_score": r_score,
+            "f_score": f_score,
+            "m_score": m_score,
+            "segment": pd.array(rfm_segment(r_score, f_score, m_score), dtype="str"),
+        })
+
+    # -----------------------------
+    # PERSISTENCE
+    # -----------------------------
+    def save(self, path):
+        """
+        Saves the state as one .npz file, so daily runs can pick up where the last one stopped.
+        """
+        count = len(self)
+        window_days = sorted(self.window_days)
+        window_sizes = [len(self.window_days[day][0]) for day in window_days]
+        histograms = {name: getattr(self, name).state()
+                      for name in ("recency_histogram", "frequency_histogram", "monetary_sketch")}
+        settings = {"today": self.today, "loaded_through": self.loaded_through,
+                    "relative_accuracy": self.monetary_sketch.relative_accuracy}
+        # A file object keeps numpy from appending ".npz" to the path
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                settings=np.array(json.dumps(settings)),
+                customer_keys=np.array(self.customer_keys, dtype=str),
+                orders_all_time=self.orders_all_time[:count],
+                monetary=self.monetary[:count],
+                last_order_day=self.last_order_day[:count],
+                orders_past_180_days=self.orders_past_180_days[:count],
+                window_days=np.repeat(np.array(window_days, dtype=np.int64), window_sizes),
+                window_positions=np.concatenate([self.window_days[day][0] for day in window_days] or [[]]).astype(int),
+                window_counts=np.concatenate([self.window_days[day][1] for day in window_days] or [[]]).astype(int),
+                **{f"{name}_{part}": values for name, (keys, counts) in histograms.items()
+                   for part, values in (("keys", keys), ("counts", counts))},
+            )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            settings = json.loads(data["settings"].item())
+            state = cls(relative_accuracy=settings["relative_accuracy"])
+            state.today = settings["today"]
+            state.loaded_through = settings["loaded_through"]
+            state.customer_keys = data["customer_keys"].tolist()
+            state.positions = {key: position for position, key in enumerate(state.customer_keys)}
+            state.grow(len(state.customer_keys))
+            count = len(state.customer_keys)
+            for name in ("orders_all_time", "monetary", "last_order_day", "orders_past_180_days"):
+                getattr(state, name)[:count] = data[name]
+            if data["monetary"].dtype.kind == "f":
+                # Saved before spend was kept in MONEY_UNITS
+                state.monetary[:count] = money_units(data["monetary"])
+            for day, day_positions, day_counts in split_by_day(data["window_days"], data["window_positions"],
+                                                               data["window_counts"]):
+                state.window_days[day] = (day_positions, day_counts)
+            for name in ("recency_histogram", "frequency_histogram", "monetary_sketch"):
+                getattr(state, name).load_state(data[f"{name}_keys"], data[f"{name}_counts"])
+        return state
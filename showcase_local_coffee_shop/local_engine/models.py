@@ -0,0 +1,443 @@
+"""
+Vectorized pandas/NumPy versions of the dbt models in dbt_models/models.
+
+Each function mirrors one model and returns the same columns, computed the same way:
+surrogate keys as in dbt_utils.generate_surrogate_key (hex MD5 of the id cast to a string),
+line-item discount math as in fact_order_details, the product mix classification of
+fact_orders and NTILE(5)-based RFM scores as in flat_customer_metrics.
+
+Joins are done by row position instead of by surrogate key: order_detail_links looks up
+each order detail's order, customer, store and product once in the raw and dimension id
+indexes, and every model gathers its columns from those positions. Hashing and string
+joins on millions of keys would otherwise dominate the run time. A position of -1 is a
+LEFT JOIN miss (null key and attributes); rows missing an INNER JOIN match are dropped.
+
+Raw tables use the generator's column names (OrderId, CustomerId, ...), either as
+generated in memory or as read back from CSV or Parquet (see run_models.read_raw_tables).
+"""
+import hashlib
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from local_engine.hashing import md5_hex_ids
+
+# dbt_utils.generate_surrogate_key replaces nulls with this string before hashing
+SURROGATE_KEY_NULL = "_dbt_utils_surrogate_key_null_"
+RFM_TILES = 5
+ACTIVE_DAYS = 180
+# Spend is summed in integer millionths: line totals like 3.15 * 90% = 2.835 are not whole
+# cents, so ROUND() of a float sum near a half cent would depend on the summation order
+MONEY_UNITS = 10 ** 6
+PRODUCT_CATEGORIES = ["Beverage", "Pastry", "Savory"]
+PRODUCT_MIX_TYPES = {
+    # (has_beverage, has_pastry, has_savory) -> product_mix_type, as in fact_orders.sql
+    (1, 1, 1): "All Categories",
+    (1, 1, 0): "Beverage + Pastry",
+    (1, 0, 1): "Beverage + Savory",
+    (0, 1, 1): "Pastry + Savory",
+    (1, 0, 0): "Beverage Only",
+    (0, 1, 0): "Pastry Only",
+    (0, 0, 1): "Savory Only",
+}
+
+
+# -----------------------------
+# HELPERS
+# -----------------------------
+def surrogate_key(*columns):
+    """
+    dbt_utils.generate_surrogate_key: hex MD5 of the columns cast to STRING and joined
+    with "-", with nulls replaced by SURROGATE_KEY_NULL.
+    """
+    if len(columns) == 1 and pd.api.types.is_integer_dtype(columns[0]):
+        ids = np.asarray(columns[0])
+        if len(ids) and ids.min() >= 0:
+            # Single id columns, the common case, are hashed vectorized
+            return hex_strings(md5_hex_ids(ids))
+    parts = [pd.Series(column).astype("string").fillna(SURROGATE_KEY_NULL).tolist() for column in columns]
+    keys = [hashlib.md5("-".join(values).encode("utf-8")).hexdigest() for values in zip(*parts)]
+    return pd.array(keys, dtype="str")
+
+
+def hex_strings(digests):
+    """
+    Converts an "S32" array of hex digests to a pandas string array.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return pd.array(digests.astype(str), dtype="str")
+    # Arrow converts the fixed-width bytes in one pass instead of decoding them row by row
+    return pd.array(pa.array(digests).cast(pa.string()), dtype="str")
+
+
+def discount_rate(levels):
+    """
+    Converts LevelOfDiscount values ("None", "3%", ...) to fractional rates, with 0
+    for "None" and missing levels, like the generator's TotalAmount.
+    """
+    numbers = pd.to_numeric(pd.Series(levels).astype("string").str.rstrip("%"), errors="coerce")
+    return numbers.fillna(0).to_numpy(np.float64) / 100.0
+
+
+def bq_round(values, digits=0):
+    """
+    BigQuery ROUND: rounds halves away from zero (numpy rounds them to even).
+    """
+    scale = 10.0 ** digits
+    values = np.asarray(values, dtype=np.float64)
+    return np.sign(values) * np.floor(np.abs(values) * scale + 0.5) / scale
+
+
+def money_units(amounts):
+    """
+    Amounts as int64 millionths (MONEY_UNITS), with 0 for NULL, which SUM() skips.
+    Sums of these are exact whatever order or batches they are added in.
+    """
+    amounts = np.nan_to_num(np.asarray(amounts, dtype=np.float64))
+    return np.rint(amounts * MONEY_UNITS).astype(np.int64)
+
+
+def round_money_units(units, digits=2):
+    """
+    bq_round of amounts given in MONEY_UNITS, rounded on the integers so a half cent
+    is never lost to float error.
+    """
+    step = MONEY_UNITS // 10 ** digits
+    units = np.asarray(units, dtype=np.int64)
+    return np.sign(units) * ((np.abs(units) + step // 2) // step) / 10 ** digits
+
+
+def ntile(values, tiles, descending=False):
+    """
+    NTILE(tiles) OVER (ORDER BY values): splits the ordered rows into tiles buckets
+    whose sizes differ by at most one, larger buckets first. Ties keep their input
+    order (BigQuery leaves the order of ties unspecified).
+    """
+    values = np.asarray(values)
+    order = np.argsort(-values if descending else values, kind="stable")
+    result = np.empty(len(values), dtype=np.int64)
+    result[order] = tile_of_rank(np.arange(len(values)), len(values), tiles)
+    return result
+
+
+def tile_of_rank(ranks, count, tiles):
+    """
+    NTILE(tiles) bucket (1-based) of the 0-based ranks among count ordered rows.
+    """
+    size, larger = divmod(count, tiles)
+    # The first `larger` buckets hold size + 1 rows
+    boundary = larger * (size + 1)
+    return np.where(ranks < boundary, ranks // (size + 1), larger + (ranks - boundary) // max(size, 1)) + 1
+
+
+def current_date():
+    """CURRENT_DATE() in BigQuery's default time zone (UTC)."""
+    return pd.Timestamp(datetime.now(timezone.utc).date())
+
+
+def lookup(index_values, values):
+    """
+    Positions of values in index_values, -1 where there is no match (including nulls).
+    """
+    return pd.Index(index_values).get_indexer(pd.Series(values))
+
+
+def take(values, positions):
+    """
+    values at positions, with nulls where the position is -1 (a LEFT JOIN miss).
+    Integer columns with misses come back as float; callers cast ids to Int64.
+    """
+    return pd.Series(values).array.take(positions, allow_fill=True)
+
+
+def to_dates(values):
+    return pd.to_datetime(pd.Series(values)).dt.normalize().array
+
+
+def group_first_rows(codes, num_groups):
+    """
+    Position of the first row of each group in codes.
+    """
+    first_rows = np.full(num_groups, len(codes))
+    np.minimum.at(first_rows, codes, np.arange(len(codes)))
+    return first_rows
+
+
+# -----------------------------
+# DIMENSIONS
+# -----------------------------
+def dim_customer(customers):
+    customer_id = customers["CustomerId"].to_numpy(np.int64)
+    return pd.DataFrame({
+        "customer_key": surrogate_key(customer_id),
+        "customer_id": customer_id,
+        "registration_date": to_dates(customers["RegistrationDate"]),
+        "level_of_discount": customers["LevelOfDiscount"].astype("str").array,
+    })
+
+
+def dim_product(products):
+    product_id = products["ProductId"].to_numpy(np.int64)
+    return pd.DataFrame({
+        "product_key": surrogate_key(product_id),
+        "product_id": product_id,
+        "product_name": products["ProductName"].array,
+        "product_category": products["ProductCategory"].array,
+        # Prices are loaded from CSV text, i.e. exact cents
+        "price": np.round(products["Price"].to_numpy(np.float64), 2),
+    })
+
+
+def dim_store(stores):
+    store_id = stores["StoreId"].to_numpy(np.int64)
+    return pd.DataFrame({
+        "store_key": surrogate_key(store_id),
+        "store_id": store_id,
+        "store_name": stores["StoreName"].array,
+        "district": stores["District"].array,
+        "city": stores["City"].array,
+        "address": stores["Address"].array,
+        "latitude": stores["Latitude"].to_numpy(np.float64),
+        "longitude": stores["Longitude"].to_numpy(np.float64),
+    })
+
+
+def dim_order(orders):
+    order_id = orders["OrderId"].to_numpy(np.int64)
+    return pd.DataFrame({
+        "order_key": surrogate_key(order_id),
+        "order_id": order_id,
+        "order_type": orders["OrderType"].astype("str").array,
+        "discount_applied": orders["DiscountApplied"].to_numpy(bool),
+    })
+
+
+# -----------------------------
+# FACTS
+# -----------------------------
+def order_detail_links(orders, order_details, dims):
+    """
+    Row positions linking each kept order detail to its raw order and its dimension rows,
+    plus the grouping of details into orders:
+    - detail / order / dim_*: per kept detail, its row in order_details, orders and each
+      dimension. Details without a raw order or dim_order row are dropped (the INNER JOINs
+      of fact_order_details); customer, store and product positions are -1 on a miss.
+    - order_codes: per kept detail, the row of its order in fact_orders.
+    - order_rows: per fact_orders row, the position of its first detail.
+    """
+    order_positions = lookup(orders["OrderId"], order_details["OrderId"])
+    detail_positions = np.flatnonzero(order_positions >= 0)
+    order_positions = order_positions[detail_positions]
+    dim_order_positions = lookup(dims["dim_order"]["order_id"], orders["OrderId"].to_numpy()[order_positions])
+    keep = dim_order_positions >= 0
+    detail_positions, order_positions = detail_positions[keep], order_positions[keep]
+    dim_order_positions = dim_order_positions[keep]
+    order_codes, order_ids = pd.factorize(dim_order_positions)
+    return {
+        "detail": detail_positions,
+        "order": order_positions,
+        "dim_order": dim_order_positions,
+        "dim_customer": lookup(dims["dim_customer"]["customer_id"], orders["CustomerId"].array[order_positions]),
+        "dim_store": lookup(dims["dim_store"]["store_id"], orders["StoreId"].to_numpy()[order_positions]),
+        "dim_product": lookup(dims["dim_product"]["product_id"],
+                              order_details["ProductId"].to_numpy()[detail_positions]),
+        "order_codes": order_codes,
+        "order_rows": group_first_rows(order_codes, len(order_ids)),
+    }
+
+
+def fact_order_details(orders, order_details, dims, links):
+    """
+    Line-item fact: raw orders INNER JOIN order details INNER JOIN dim_order, LEFT JOIN
+    the customer, store and product dimensions. sub_total = quantity * price and the
+    customer's discount rate (0 without a customer) gives discount and total amounts.
+    """
+    quantity = order_details["Quantity"].to_numpy(np.int64)[links["detail"]]
+    prices = np.append(dims["dim_product"]["price"].to_numpy(np.float64), np.nan)
+    sub_total = quantity * prices[links["dim_product"]]
+    # ifnull(discount rate, 0): orders without a (known) customer get no discount
+    customer_rates = np.append(discount_rate(dims["dim_customer"]["level_of_discount"]), 0.0)
+    rate = customer_rates[links["dim_customer"]]
+    discount_amount = sub_total * rate
+
+    order_detail_id = order_details["OrderDetailId"].to_numpy(np.int64)[links["detail"]]
+    return pd.DataFrame({
+        "order_detail_key": surrogate_key(order_detail_id),
+        "order_detail_id": order_detail_id,
+        "order_key": take(dims["dim_order"]["order_key"], links["dim_order"]),
+        "customer_key": take(dims["dim_customer"]["customer_key"], links["dim_customer"]),
+        "store_key": take(dims["dim_store"]["store_key"], links["dim_store"]),
+        "product_key": take(dims["dim_product"]["product_key"], links["dim_product"]),
+        "order_date": to_dates(orders["OrderDate"].array.take(links["order"])),
+        "quantity": quantity,
+        "sub_total": sub_total,
+        "discount_rate": rate,
+        "discount_amount": discount_amount,
+        "total_amount": sub_total - discount_amount,
+    })
+
+
+def fact_orders(fact_details, dims, links):
+    """
+    Order-grain aggregate of fact_order_details with item counts, amounts, category
+    flags and the product mix type.
+    """
+    codes = links["order_codes"]
+    # Keys and date are the same on every line of an order; take them from its first line
+    first_lines = links["order_rows"]
+    num_orders = len(first_lines)
+
+    product_categories = np.append(dims["dim_product"]["product_category"].to_numpy(object), None)
+    categories = product_categories[links["dim_product"]]
+    flags = {}
+    for category in PRODUCT_CATEGORIES:
+        flags[f"has_{category.lower()}"] = (
+            np.bincount(codes, weights=categories == category, minlength=num_orders) > 0).astype(np.int64)
+    mix_codes = flags["has_beverage"] * 4 + flags["has_pastry"] * 2 + flags["has_savory"]
+    mix_types = np.array([PRODUCT_MIX_TYPES.get((code >> 2 & 1, code >> 1 & 1, code & 1), "Other")
+                          for code in range(8)], dtype=object)
+
+    def total(column):
+        return np.bincount(codes, weights=fact_details[column].to_numpy(np.float64), minlength=num_orders)
+
+    return pd.DataFrame({
+        "order_key": fact_details["order_key"].array.take(first_lines),
+        "customer_key": fact_details["customer_key"].array.take(first_lines),
+        "store_key": fact_details["store_key"].array.take(first_lines),
+        "order_date": fact_details["order_date"].array.take(first_lines),
+        "item_count": np.bincount(codes, minlength=num_orders),
+        "quantity": total("quantity").astype(np.int64),
+        "sub_total": total("sub_total"),
+        "discount_amount": total("discount_amount"),
+        "total_amount": total("total_amount"),
+        **flags,
+        "product_mix_type": pd.array(mix_types[mix_codes], dtype="str"),
+    })
+
+
+# -----------------------------
+# DATA MARTS
+# -----------------------------
+def flat_order_details(fact_details, fact_orders_df, dims, links):
+    """
+    Reporting-friendly line items with customer, order, product and store attributes.
+    """
+    customer = dims["dim_customer"]
+    order = dims["dim_order"]
+    product = dims["dim_product"]
+    store = dims["dim_store"]
+
+    return pd.DataFrame({
+        "order_detail_id": fact_details["order_detail_id"].array,
+        "order_date": fact_details["order_date"].array,
+        "customer_id": pd.array(take(customer["customer_id"], links["dim_customer"]), dtype="Int64"),
+        "registration_date": take(customer["registration_date"], links["dim_customer"]),
+        "level_of_discount": take(customer["level_of_discount"], links["dim_customer"]),
+        "order_type": take(order["order_type"], links["dim_order"]),
+        "order_id": take(order["order_id"], links["dim_order"]),
+        "discount_applied": take(order["discount_applied"], links["dim_order"]),
+        "product_name": take(product["product_name"], links["dim_product"]),
+        "product_category": take(product["product_category"], links["dim_product"]),
+        "price": take(product["price"], links["dim_product"]),
+        "store_name": take(store["store_name"], links["dim_store"]),
+        "latitude": take(store["latitude"], links["dim_store"]),
+        "longitude": take(store["longitude"], links["dim_store"]),
+        "address": take(store["address"], links["dim_store"]),
+        "district": take(store["district"], links["dim_store"]),
+        "quantity": fact_details["quantity"].array,
+        "sub_total": fact_details["sub_total"].array,
+        "discount_rate": fact_details["discount_rate"].array,
+        "discount_amount": fact_details["discount_amount"].array,
+        "total_amount": bq_round(fact_details["total_amount"], 2),
+        "product_mix_type": fact_orders_df["product_mix_type"].array.take(links["order_codes"]),
+    })
+
+
+def rfm_segment(r_score, f_score, m_score):
+    """
+    RFM segment names, in the order of the CASE in flat_customer_metrics.sql.
+    """
+    return np.select(
+        [
+            (r_score > 4) & (f_score > 4) & (m_score > 4),
+            (r_score <= 3) & (f_score <= 3) & (m_score >= 4),
+            (r_score >= 3) & (f_score >= 4) & (m_score >= 3),
+            (r_score >= 4) & (f_score <= 3),
+            (r_score <= 2) & (f_score >= 4),
+            (r_score == 1) & (f_score == 1) & (m_score == 1),
+        ],
+        ["Champions", "Big Spenders", "Loyal", "New Customers", "At Risk", "Churned"],
+        default="Other",
+    )
+
+
+def flat_customer_metrics(fact_orders_df, dim_customer_df, links, today=None):
+    """
+    Per-customer order counts, activity, LTV and NTILE(5) RFM scores and segments from
+    fact_orders. today stands in for CURRENT_DATE() (default: today in UTC).
+    """
+    today = current_date() if today is None else pd.Timestamp(today)
+    # dim_customer row of each fact_orders row; orders without a customer are not grouped
+    order_customers = links["dim_customer"][links["order_rows"]]
+    with_customer = order_customers >= 0
+    codes, customer_positions = pd.factorize(order_customers[with_customer])
+    num_customers = len(customer_positions)
+
+    order_days = (pd.DatetimeIndex(fact_orders_df["order_date"].array[with_customer]) - today).days.to_numpy()
+    last_order_days = np.full(num_customers, np.iinfo(np.int64).min)
+    np.maximum.at(last_order_days, codes, order_days)
+    orders_all_time = np.bincount(codes, minlength=num_customers)
+    orders_past_180_days = np.bincount(codes, weights=order_days >= -ACTIVE_DAYS,
+                                       minlength=num_customers).astype(np.int64)
+    amounts = money_units(fact_orders_df["total_amount"].to_numpy(np.float64)[with_customer])
+    # bincount adds the units as floats, which is exact below 2 ** 53 (~9 billion in money)
+    monetary = np.bincount(codes, weights=amounts, minlength=num_customers).astype(np.int64)
+    recency = -last_order_days
+    ltv = round_money_units(monetary, 2)
+    registration_date = dim_customer_df["registration_date"].array.take(customer_positions)
+
+    r_score = ntile(recency, RFM_TILES, descending=True)
+    f_score = ntile(orders_all_time, RFM_TILES)
+    m_score = ntile(monetary, RFM_TILES)
+
+    return pd.DataFrame({
+        "customer_key": dim_customer_df["customer_key"].array.take(customer_positions),
+        "registration_date": registration_date,
+        "is_active_180d": (orders_past_180_days > 0).astype(np.int64),
+        "orders_all_time": orders_all_time,
+        "orders_past_180_days": orders_past_180_days,
+        "days_since_last_order": recency,
+        "ltv": ltv,
+        "customer_age_days": (today - pd.DatetimeIndex(registration_date)).days.to_numpy(),
+        "avg_order_value": bq_round(ltv / orders_all_time, 2),
+        "r_score": r_score,
+        "f_score": f_score,
+        "m_score": m_score,
+        "segment": pd.array(rfm_segment(r_score, f_score, m_score), dtype="str"),
+    })
+
+
+def run_models(raw, today=None):
+    """
+    Builds every model from the raw tables {"customers", "orders", "order_details",
+    "products", "stores"} and returns {model name: DataFrame} in dependency order.
+    """
+    dims = {
+        "dim_customer": dim_customer(raw["customers"]),
+        "dim_product": dim_product(raw["products"]),
+        "dim_store": dim_store(raw["stores"]),
+        "dim_order": dim_order(raw["orders"]),
+    }
+    links = order_detail_links(raw["orders"], raw["order_details"], dims)
+    fact_details = fact_order_details(raw["orders"], raw["order_details"], dims, links)
+    fact_orders_df = fact_orders(fact_details, dims, links)
+    return {
+        **dims,
+        "fact_order_details": fact_details,
+        "fact_orders": fact_orders_df,
+        "flat_order_details": flat_order_details(fact_details, fact_orders_df, dims, links),
+        "flat_customer_metrics": flat_customer_metrics(fact_orders_df, dims["dim_customer"], links, today),
+    }
@@ -0,0 +1,180 @@
+"""
+Runs the dbt transformations in-process with pandas/NumPy (see models.py) instead of
+in BigQuery, e.g. to check model changes or inspect marts on millions of generated rows
+without a warehouse round trip.
+
+Raw tables are read from a folder written by generate_data.py: Parquet (<Table>.parquet or
+the partitioned <Table>/ folder), CSV shards (shards/<Table>/) or <Table>.csv, whichever was
+written last (or the newest of the format given with --source-format). With --generate,
+the tables are generated in memory instead.
+
+Usage:
+    python run_models.py --input ../dataset_generation --output models_out
+    python run_models.py --generate --customers 100000 --lambda-high 3000 --format parquet --output models_out
+    python run_models.py --input data --models flat_customer_metrics --today 2025-06-30
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+
+import pandas as pd
+
+SHOWCASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(SHOWCASE_DIR)
+
+from coffee_shop_common.sharded_csv import SHARD_MANIFEST  # noqa: E402
+from local_engine.models import run_models  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Model input name -> raw table name
+RAW_TABLES = {
+    "customers": "Customers",
+    "orders": "Orders",
+    "order_details": "OrderDetails",
+    "products": "Products",
+    "stores": "Stores",
+}
+SHARD_FOLDER = "shards"
+DATE_COLUMNS = {"Customers": ["RegistrationDate"], "Orders": ["OrderDate"]}
+# Only empty fields are NULL, as in a BigQuery CSV load; pandas would also read "None" as NA
+CSV_OPTIONS = {"keep_default_na": False, "na_values": [""]}
+
+
+def raw_table_layouts(folder, name):
+    """
+    Returns (source format, path, modification time) for every layout of a raw table in
+    folder, newest first: "parquet" (<Table>.parquet or the partitioned <Table>/ folder) and
+    "csv" (<Table>.csv or the shards/<Table>/ shards, dated by their manifest, which is written last).
+    """
+    layouts = []
+    partition_files = glob.glob(os.path.join(folder, name, "OrderMonth=*", "*.parquet"))
+    if partition_files:
+        layouts.append(("parquet", os.path.join(folder, name), max(map(os.path.getmtime, partition_files))))
+    candidates = [("parquet", os.path.join(folder, f"{name}.parquet")),
+                  ("csv", os.path.join(folder, SHARD_FOLDER, name, SHARD_MANIFEST)),
+                  ("csv", os.path.join(folder, f"{name}.csv")),
+                  ("csv", os.path.join(folder, f"{name}.csv.gz"))]
+    layouts += [(source_format, path, os.path.getmtime(path))
+                for source_format, path in candidates if os.path.exists(path)]
+    return sorted(layouts, key=lambda layout: layout[2], reverse=True)
+
+
+def read_raw_table(folder, name, source_format="auto"):
+    """
+    Reads one raw table from folder. With source_format "auto" the most recently written
+    layout is read, so output left over from an earlier run with other OUTPUT_FORMATS
+    does not shadow newer files; "parquet" or "csv" reads the newest layout of that format.
+    """
+    layouts = raw_table_layouts(folder, name)
+    if source_format != "auto":
+        layouts = [layout for layout in layouts if layout[0] == source_format]
+    if not layouts:
+        kind = "Parquet or CSV" if source_format == "auto" else source_format
+        raise FileNotFoundError(f"No {kind} data for {name} in {folder}")
+    source_format, path, _ = layouts[0]
+    others = sorted({layout[0] for layout in layouts} - {source_format})
+    if others:
+        logging.warning("%s is also stored as %s in %s; reading the newest layout (%s). "
+                        "Use --source-format to choose.", name, ", ".join(others), folder, source_format)
+
+    if source_format == "parquet" and os.path.isdir(path):
+        # The hive partition column is not part of the table
+        df = pd.read_parquet(path).drop(columns="OrderMonth")
+    elif source_format == "parquet":
+        df = pd.read_parquet(path)
+    elif path.endswith(SHARD_MANIFEST):
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        shard_folder = os.path.dirname(path)
+        df = pd.concat([pd.read_csv(os.path.join(shard_folder, shard["name"]), **CSV_OPTIONS)
+                        for shard in manifest["shards"]], ignore_index=True)
+    else:
+        df = pd.read_csv(path, **CSV_OPTIONS)
+
+    for column in DATE_COLUMNS.get(name, []):
+        df[column] = pd.to_datetime(df[column])
+    if name == "Orders":
+        # Orders without a customer are empty in CSV, which pandas reads as float
+        df["CustomerId"] = df["CustomerId"].astype("Int64")
+    return df
+
+
+def read_raw_tables(folder, source_format="auto"):
+    return {key: read_raw_table(folder, name, source_format) for key, name in RAW_TABLES.items()}
+
+
+def generate_raw_tables(customers=None, lambda_high=None):
+    """
+    Generates the raw tables in memory with the shared generator (coffee_shop_common/generator.py),
+    optionally overriding num_customers and lambda_high.
+    """
+    from coffee_shop_common import generator
+
+    overrides = {"num_customers": customers, "lambda_high": lambda_high}
+    config = generator.GeneratorConfig(**{name: value for name, value in overrides.items() if value})
+    customers_df = generator.generate_customers(config)
+    products_df = generator.generate_products(config)
+    stores_df = generator.generate_stores(config)
+    orders_df, order_details_df = generator.generate_orders(config, customers_df, products_df)
+    return {"customers": customers_df, "orders": orders_df, "order_details": order_details_df,
+            "products": products_df, "stores": stores_df}
+
+
+def write_models(models, folder, output_format):
+    os.makedirs(folder, exist_ok=True)
+    for name, df in models.items():
+        if output_format == "parquet":
+            path = os.path.join(folder, f"{name}.parquet")
+            df.to_parquet(path, index=False)
+        else:
+            path = os.path.join(folder, f"{name}.csv")
+            df.to_csv(path, index=False)
+        logging.info("Saved %s (%d rows)", path, len(df))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the dbt models in-process with pandas/NumPy.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="folder with the raw tables written by generate_data.py")
+    source.add_argument("--generate", action="store_true", help="generate the raw tables in memory")
+    parser.add_argument("--source-format", choices=["auto", "parquet", "csv"], default="auto",
+                        help="raw table layout to read from --input (default: the most recently written)")
+    parser.add_argument("--customers", type=int, help="customer count for --generate (default: 500)")
+    parser.add_argument("--lambda-high", type=float, help="average orders per day for --generate (default: 10)")
+    parser.add_argument("--today", help="date used as CURRENT_DATE() (default: today in UTC)")
+    parser.add_argument("--models", nargs="+", help="models to write (default: all)")
+    parser.add_argument("--output", help="folder for the model outputs (default: no output)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="output format (default: csv)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.generate:
+        raw = generate_raw_tables(args.customers, args.lambda_high)
+    else:
+        raw = read_raw_tables(args.input, args.source_format)
+    read_seconds = time.perf_counter() - started
+    logging.info("Raw tables ready in %.2fs (%d orders, %d order details).",
+                 read_seconds, len(raw["orders"]), len(raw["order_details"]))
+
+    started = time.perf_counter()
+    models = run_models(raw, args.today)
+    logging.info("Models built in %.2fs.", time.perf_counter() - started)
+
+    if args.models:
+        unknown = set(args.models) - set(models)
+        if unknown:
+            parser.error(f"unknown models: {', '.join(sorted(unknown))}")
+        models = {name: models[name] for name in args.models}
+    for name, df in models.items():
+        logging.info("%s: %d rows", name, len(df))
+    if args.output:
+        write_models(models, args.output, args.format)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Mergeable histograms for maintaining NTILE boundaries without sorting.
+
+CountHistogram counts customers per integer value (e.g. order count or last order day)
+exactly. DDSketch counts them per logarithmic bucket of a positive value (e.g. monetary
+value): any value is represented within relative_accuracy of itself, with a few hundred
+buckets covering cents to millions. Both support removals (a customer's value changes
+from one bucket to another) and merging by adding bucket counts, and answer rank
+queries from their buckets alone, so tile boundaries cost O(buckets) instead of a sort
+over every customer.
+"""
+import math
+
+import numpy as np
+
+from local_engine.models import tile_of_rank
+
+
+class CountHistogram:
+    """
+    Exact counts per integer key.
+    """
+
+    def __init__(self):
+        self.counts = {}
+
+    def keys(self, values):
+        return np.asarray(values, dtype=np.int64)
+
+    def add(self, values, weight=1):
+        """
+        Adds (weight 1) or removes (weight -1) one occurrence of each value.
+        """
+        keys, counts = np.unique(self.keys(values), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            total = self.counts.get(key, 0) + weight * count
+            if total:
+                self.counts[key] = total
+            else:
+                del self.counts[key]
+
+    def remove(self, values):
+        self.add(values, -1)
+
+    def merge(self, other):
+        for key, count in other.counts.items():
+            total = self.counts.get(key, 0) + count
+            if total:
+                self.counts[key] = total
+            else:
+                self.counts.pop(key, None)
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def tiles(self, tiles):
+        """
+        Returns (sorted keys, tile per key) for NTILE(tiles) OVER (ORDER BY value) over the
+        counted values. Values sharing a key are one group and get the tile of the group's
+        middle rank (NTILE would split a group across a boundary in an unspecified order).
+        """
+        keys = np.array(sorted(self.counts), dtype=np.int64)
+        counts = np.array([self.counts[key] for key in keys.tolist()], dtype=np.int64)
+        ends = np.cumsum(counts)
+        middle_ranks = ends - counts + (counts - 1) // 2
+        return keys, tile_of_rank(middle_ranks, int(ends[-1]) if len(ends) else 0, tiles)
+
+    def score(self, values, tiles):
+        """
+        Tile of each value, from the current counts.
+        """
+        keys, key_tiles = self.tiles(tiles)
+        positions = np.searchsorted(keys, self.keys(values))
+        return key_tiles[np.minimum(positions, len(keys) - 1)] if len(keys) else np.ones(len(positions), np.int64)
+
+    def state(self):
+        keys = np.array(sorted(self.counts), dtype=np.int64)
+        return keys, np.array([self.counts[key] for key in keys.tolist()], dtype=np.int64)
+
+    def load_state(self, keys, counts):
+        self.counts = dict(zip(keys.tolist(), counts.tolist()))
+
+
+class DDSketch(CountHistogram):
+    """
+    Counts per logarithmic bucket: bucket k holds values in (gamma ** (k - 1), gamma ** k],
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy). Values at or below
+    min_value share one lowest bucket.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-2):
+        super().__init__()
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.min_key = math.floor(math.log(min_value, self.gamma))
+
+    def keys(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            keys = np.ceil(np.log(values) / math.log(self.gamma))
+        return np.maximum(np.nan_to_num(keys, nan=self.min_key, neginf=self.min_key), self.min_key).astype(np.int64)
+
+    def value(self, keys):
+        """
+        Representative value of each bucket, within relative_accuracy of every value in it.
+        """
+        return 2 * self.gamma ** np.asarray(keys, dtype=np.float64) / (self.gamma + 1)
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge DDSketches with different relative accuracy")
+        super().merge(other)
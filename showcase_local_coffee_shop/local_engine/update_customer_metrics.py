@@ -0,0 +1,95 @@
+"""
+Updates the running customer metrics state (see customer_metrics.py) with new orders
+and optionally writes flat_customer_metrics from it.
+
+The first run builds the state from all orders in the input; later runs only add orders
+dated after the last loaded day, so a daily run costs in proportion to that day's orders.
+Orders and order details can come from a separate folder, e.g. the delta/ folder written
+in incremental mode, while customers, products and stores are read from --input.
+
+Usage:
+    python update_customer_metrics.py --state customer_state.npz --input ../dataset_generation
+    python update_customer_metrics.py --state customer_state.npz --input data --orders data/delta \\
+        --today 2025-07-01 --output flat_customer_metrics.csv
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+import pandas as pd
+
+SHOWCASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(SHOWCASE_DIR)
+
+from local_engine import models  # noqa: E402
+from local_engine.customer_metrics import EPOCH, CustomerMetricsState  # noqa: E402
+from local_engine.run_models import read_raw_table  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+def new_fact_orders(input_folder, orders_folder, loaded_through, source_format="auto"):
+    """
+    Builds fact_orders for the orders dated after loaded_through (all orders when None),
+    together with dim_customer.
+    """
+    orders_df = read_raw_table(orders_folder, "Orders", source_format)
+    if loaded_through is not None:
+        orders_df = orders_df[orders_df["OrderDate"] > pd.Timestamp(EPOCH + loaded_through)]
+    order_details_df = read_raw_table(orders_folder, "OrderDetails", source_format)
+    order_details_df = order_details_df[order_details_df["OrderId"].isin(orders_df["OrderId"])]
+
+    dims = {
+        "dim_customer": models.dim_customer(read_raw_table(input_folder, "Customers", source_format)),
+        "dim_product": models.dim_product(read_raw_table(input_folder, "Products", source_format)),
+        "dim_store": models.dim_store(read_raw_table(input_folder, "Stores", source_format)),
+        "dim_order": models.dim_order(orders_df),
+    }
+    links = models.order_detail_links(orders_df, order_details_df, dims)
+    fact_details = models.fact_order_details(orders_df, order_details_df, dims, links)
+    return models.fact_orders(fact_details, dims, links), dims["dim_customer"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally update customer metrics and RFM scores.")
+    parser.add_argument("--state", required=True, help="state file (.npz); created on the first run")
+    parser.add_argument("--input", required=True, help="folder with the raw tables written by generate_data.py")
+    parser.add_argument("--orders", help="folder with the new Orders / OrderDetails (default: --input)")
+    parser.add_argument("--source-format", choices=["auto", "parquet", "csv"], default="auto",
+                        help="raw table layout to read (default: the most recently written)")
+    parser.add_argument("--today", help="date used as CURRENT_DATE() (default: today in UTC)")
+    parser.add_argument("--relative-accuracy", type=float, default=0.01,
+                        help="monetary sketch accuracy for a new state (default: 0.01)")
+    parser.add_argument("--output", help="optional CSV path for flat_customer_metrics")
+    args = parser.parse_args()
+
+    if os.path.exists(args.state):
+        state = CustomerMetricsState.load(args.state)
+        state.advance_to(args.today or models.current_date())
+        logging.info("Loaded state with %d customers, orders through %s.",
+                     len(state), EPOCH + state.loaded_through if state.loaded_through is not None else "-")
+    else:
+        state = CustomerMetricsState(args.today, args.relative_accuracy)
+        logging.info("Starting a new customer metrics state.")
+
+    started = time.perf_counter()
+    fact_orders_df, dim_customer_df = new_fact_orders(args.input, args.orders or args.input,
+                                                       state.loaded_through, args.source_format)
+    build_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    added = state.update(fact_orders_df)
+    logging.info("Added %d orders in %.3fs (fact_orders built in %.2fs); %d customers.",
+                 added, time.perf_counter() - started, build_seconds, len(state))
+    state.save(args.state)
+
+    if args.output:
+        started = time.perf_counter()
+        metrics_df = state.to_frame(dim_customer_df)
+        metrics_df.to_csv(args.output, index=False)
+        logging.info("Saved %s (%d rows, scored in %.3fs)", args.output, len(metrics_df), time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
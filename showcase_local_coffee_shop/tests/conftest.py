@@ -0,0 +1,48 @@
+"""
+Shared fixtures. Run the suite from showcase_local_coffee_shop with `python -m pytest -q`.
+"""
+import importlib.util
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+SHOWCASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# The packages (coffee_shop_common, local_engine, benchmarks) live next to this folder
+sys.path.insert(0, SHOWCASE_DIR)
+
+from coffee_shop_common import generator  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def config():
+    return generator.GeneratorConfig(num_customers=50, start=datetime(2024, 1, 1), end=datetime(2024, 2, 29))
+
+
+@pytest.fixture(scope="session")
+def tables(config):
+    """
+    A small generated dataset as {table name: DataFrame}.
+    """
+    customers_df = generator.generate_customers(config)
+    products_df = generator.generate_products(config)
+    stores_df = generator.generate_stores(config)
+    orders_df, order_details_df = generator.generate_orders(config, customers_df, products_df)
+    return {"Customers": customers_df, "Products": products_df, "Stores": stores_df,
+            "Orders": orders_df, "OrderDetails": order_details_df}
+
+
+@pytest.fixture(scope="session")
+def load_script():
+    """
+    Returns a function that imports a script outside the packages (e.g. a Cloud Run
+    main.py) from its path relative to showcase_local_coffee_shop, under the given name.
+    """
+    def load(name, relative_path):
+        spec = importlib.util.spec_from_file_location(name, os.path.join(SHOWCASE_DIR, *relative_path.split("/")))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    return load
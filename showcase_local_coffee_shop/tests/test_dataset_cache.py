@@ -0,0 +1,67 @@
+import pandas as pd
+
+from coffee_shop_common import generator
+from coffee_shop_common.dataset_cache import DatasetCache, config_key
+
+
+def test_put_get_round_trip(tmp_path, tables):
+    cache = DatasetCache(tmp_path)
+    key = config_key({"group": "reference", "seed": 42})
+    assert cache.get(key, ["Customers", "Products"]) is None
+
+    cache.put(key, {"Customers": tables["Customers"], "Products": tables["Products"]})
+    dfs = cache.get(key, ["Customers", "Products"])
+    pd.testing.assert_frame_equal(dfs["Customers"], tables["Customers"])
+    pd.testing.assert_frame_equal(dfs["Products"], tables["Products"])
+
+
+def test_windows_round_trip(tmp_path, tables):
+    cache = DatasetCache(tmp_path)
+    key = config_key({"group": "orders", "seed": 42})
+    orders_df, order_details_df = tables["Orders"], tables["OrderDetails"]
+    split_id = orders_df["OrderId"].iloc[len(orders_df) // 2]
+    first = order_details_df["OrderId"] < split_id
+    windows = [(orders_df[orders_df["OrderId"] < split_id], order_details_df[first]),
+               (orders_df[orders_df["OrderId"] >= split_id], order_details_df[~first])]
+    # Windows pass through unchanged while they are stored
+    assert len(list(cache.put_windows(key, ["Orders", "OrderDetails"], windows))) == 2
+
+    cached = list(cache.get_windows(key, ["Orders", "OrderDetails"]))
+    assert len(cached) == 2
+    for (orders, details), (cached_orders, cached_details) in zip(windows, cached):
+        pd.testing.assert_frame_equal(cached_orders, orders.reset_index(drop=True))
+        pd.testing.assert_frame_equal(cached_details, details.reset_index(drop=True))
+
+
+def test_unfinished_windows_leave_no_entry(tmp_path, tables):
+    cache = DatasetCache(tmp_path)
+    key = config_key({"group": "orders", "seed": 1})
+    stream = cache.put_windows(key, ["Orders"], [(tables["Orders"],), (tables["Orders"],)])
+    next(stream)
+    stream.close()
+    assert cache.get(key, ["Orders"]) is None
+
+
+def test_config_key_ignores_order():
+    assert config_key({"a": 1, "b": [2, 3]}) == config_key({"b": [2, 3], "a": 1})
+    assert config_key({"a": 1}) != config_key({"a": 2})
+
+
+def test_full_entry_is_served_in_stream_windows(tmp_path, monkeypatch, load_script, config, tables):
+    generate_data = load_script("generate_data", "dataset_generation/generate_data.py")
+    monkeypatch.setattr(generate_data, "GENERATOR_CONFIG", config)
+    cache = DatasetCache(tmp_path)
+    # A full-mode run stores the orders as one window
+    generate_data.cached_tables(cache, "orders", lambda: {"Orders": tables["Orders"],
+                                                          "OrderDetails": tables["OrderDetails"]})
+
+    def not_generated():
+        raise AssertionError("orders were generated despite a cache hit")
+        yield
+
+    windows = list(generate_data.cached_order_windows(cache, not_generated(), 7))
+    expected = list(generator.iter_order_windows(config, tables["Customers"], tables["Products"], 7))
+    assert len(windows) == len(expected) > 1
+    for (orders, details), (expected_orders, expected_details) in zip(windows, expected):
+        pd.testing.assert_frame_equal(orders, expected_orders)
+        pd.testing.assert_frame_equal(details, expected_details)
@@ -0,0 +1,119 @@
+import json
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from benchmarks.fakes import FakeStorageClient
+from coffee_shop_common import generator
+from coffee_shop_common.metrics import RunMetrics
+from coffee_shop_common.uploader import LocalBackend
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def job(tmp_path, monkeypatch, load_script):
+    """
+    The generate_and_store job with the bucket in tmp_path/bucket and local output in tmp_path.
+    """
+    main = load_script("generate_and_store_main", "google_cloud_run/generate_and_store/main.py")
+    monkeypatch.chdir(tmp_path)
+    bucket_root = str(tmp_path / "bucket")
+    monkeypatch.setattr("google.cloud.storage.Client", lambda *args, **kwargs: FakeStorageClient(bucket_root))
+    monkeypatch.setattr(main, "GCSBackend", lambda bucket_name: LocalBackend(str(tmp_path / "bucket" / bucket_name)))
+    return main
+
+
+def config_until(end):
+    return generator.GeneratorConfig(num_customers=50, start=START, end=end)
+
+
+def bucket_path(tmp_path, main, remote_path):
+    return tmp_path / "bucket" / main.BUCKET_NAME / remote_path
+
+
+def read_json(tmp_path, main, remote_path):
+    return json.loads(bucket_path(tmp_path, main, remote_path).read_text())
+
+
+def delta_order_ids(tmp_path, main):
+    orders_df = pd.read_csv(bucket_path(tmp_path, main, main.GCS_FOLDER + "delta/Orders.csv"))
+    return orders_df["OrderId"].tolist()
+
+
+def full_order_ids(config):
+    customers_df = generator.generate_customers(config)
+    orders_df, _ = generator.generate_orders(config, customers_df, generator.generate_products(config))
+    return orders_df["OrderId"].tolist()
+
+
+def test_pending_delta(job):
+    assert job.pending_delta(None) is None
+    assert job.pending_delta({"loaded": True, "last_date": "2024-01-31"}) is None
+    unloaded = {"loaded": False, "loaded_tables": [], "last_date": "2024-01-31", "base_watermark": None}
+    assert job.pending_delta(unloaded) == unloaded
+    with pytest.raises(RuntimeError):
+        job.pending_delta({**unloaded, "loaded_tables": ["orders"]})
+    with pytest.raises(RuntimeError):
+        # Written before base_watermark was recorded: its start is unknown
+        job.pending_delta({"loaded": False, "last_date": "2024-01-31"})
+
+
+def test_unloaded_delta_is_folded_into_the_next_one(tmp_path, job):
+    job.main_incremental(RunMetrics("test"), config_until(datetime(2024, 1, 31)))
+    load_spec = read_json(tmp_path, job, job.LOAD_SPEC_PATH)
+    assert load_spec["write_disposition"] == "WRITE_TRUNCATE"
+    assert load_spec["base_watermark"] is None
+    assert read_json(tmp_path, job, job.WATERMARK_PATH)["last_date"] == "2024-01-31"
+
+    # load_to_bq did not run: the next delta starts where the unloaded one did
+    february = config_until(datetime(2024, 2, 29))
+    job.main_incremental(RunMetrics("test"), february)
+    load_spec = read_json(tmp_path, job, job.LOAD_SPEC_PATH)
+    assert load_spec["write_disposition"] == "WRITE_TRUNCATE"
+    assert delta_order_ids(tmp_path, job) == full_order_ids(february)
+
+    # Once it is loaded, the next delta holds only the new days and is appended
+    bucket_path(tmp_path, job, job.LOAD_SPEC_PATH).write_text(json.dumps({**load_spec, "loaded": True}))
+    watermark = read_json(tmp_path, job, job.WATERMARK_PATH)
+    march = config_until(datetime(2024, 3, 15))
+    job.main_incremental(RunMetrics("test"), march)
+    load_spec = read_json(tmp_path, job, job.LOAD_SPEC_PATH)
+    assert load_spec["write_disposition"] == "WRITE_APPEND"
+    assert load_spec["base_watermark"] == watermark
+    assert delta_order_ids(tmp_path, job) == full_order_ids(march)[watermark["last_order_id"]:]
+
+
+def test_partly_loaded_delta_stops_the_run(tmp_path, job):
+    job.main_incremental(RunMetrics("test"), config_until(datetime(2024, 1, 31)))
+    load_spec = read_json(tmp_path, job, job.LOAD_SPEC_PATH)
+    bucket_path(tmp_path, job, job.LOAD_SPEC_PATH).write_text(json.dumps({**load_spec, "loaded_tables": ["orders"]}))
+    watermark = read_json(tmp_path, job, job.WATERMARK_PATH)
+
+    with pytest.raises(RuntimeError):
+        job.main_incremental(RunMetrics("test"), config_until(datetime(2024, 2, 29)))
+    assert read_json(tmp_path, job, job.WATERMARK_PATH) == watermark
+
+
+def test_direct_mode_publishes_nothing_when_the_orders_fail(tmp_path, job, monkeypatch):
+    config = config_until(datetime(2024, 1, 31))
+    monkeypatch.setattr(job, "STREAM_CHUNK_DAYS", 7)
+    job.main_direct(RunMetrics("test"), config)
+    folder = bucket_path(tmp_path, job, job.GCS_FOLDER)
+    published = {path.name: path.read_bytes() for path in folder.iterdir()}
+    assert set(published) == {"Customers.csv", "Products.csv", "Stores.csv", "Orders.csv", "OrderDetails.csv"}
+
+    iter_order_windows = generator.iter_order_windows
+
+    def failing_windows(*args):
+        windows = iter_order_windows(*args)
+        yield next(windows)
+        raise ValueError("generation failed")
+
+    monkeypatch.setattr(job.generator, "iter_order_windows", failing_windows)
+    with pytest.raises(ValueError):
+        job.main_direct(RunMetrics("test"), generator.GeneratorConfig(num_customers=60, start=START,
+                                                                      end=datetime(2024, 2, 29)))
+    # The previous run's tables are untouched and no staging objects are left behind
+    assert {path.name: path.read_bytes() for path in folder.iterdir()} == published
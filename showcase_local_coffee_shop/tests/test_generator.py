@@ -0,0 +1,33 @@
+from datetime import datetime
+
+import pandas as pd
+
+from coffee_shop_common import generator, storage
+
+
+def test_windows_match_full_generation(config, tables):
+    windows = list(generator.iter_order_windows(config, tables["Customers"], tables["Products"], 7))
+    assert len(windows) > 1
+    pd.testing.assert_frame_equal(pd.concat([orders for orders, _ in windows], ignore_index=True),
+                                  tables["Orders"])
+    pd.testing.assert_frame_equal(pd.concat([details for _, details in windows], ignore_index=True),
+                                  tables["OrderDetails"])
+
+
+def test_later_end_date_keeps_history(config, tables):
+    longer = generator.GeneratorConfig(num_customers=50, start=config.start, end=datetime(2024, 3, 31))
+    orders_df, _ = generator.generate_orders(longer, tables["Customers"], tables["Products"])
+    prefix = orders_df[pd.to_datetime(orders_df["OrderDate"]) <= config.end].reset_index(drop=True)
+    pd.testing.assert_frame_equal(prefix, tables["Orders"])
+
+
+def test_partitions_are_byte_identical_for_any_worker_count(tmp_path, config, tables):
+    contents = []
+    for workers, partition_days in [(1, 30), (2, 10), (3, 7)]:
+        folder = tmp_path / f"workers_{workers}"
+        windows = generator.iter_order_partitions(config, tables["Customers"], tables["Products"],
+                                                  workers=workers, partition_days=partition_days)
+        storage.write_order_windows(windows, str(folder))
+        contents.append({name: (folder / name).read_bytes() for name in ("Orders.csv", "OrderDetails.csv")})
+    assert contents[0] == contents[1] == contents[2]
+    assert contents[0]["Orders.csv"] == tables["Orders"].to_csv(index=False).encode()
@@ -0,0 +1,18 @@
+import hashlib
+
+import numpy as np
+
+from local_engine.hashing import md5_hex_ids
+
+
+def test_md5_hex_ids_match_hashlib():
+    ids = np.array([0, 1, 9, 10, 99, 12345, 10 ** 9, 2 ** 32 + 7, 10 ** 18, 2 ** 63 - 1], dtype=np.int64)
+    expected = [hashlib.md5(str(value).encode()).hexdigest().encode() for value in ids.tolist()]
+    assert md5_hex_ids(ids).tolist() == expected
+
+
+def test_md5_hex_ids_across_chunks():
+    ids = np.arange(70_000, dtype=np.int64) * 7919
+    digests = md5_hex_ids(ids)
+    for position in (0, 65_535, 65_536, 69_999):
+        assert digests[position] == hashlib.md5(str(ids[position]).encode()).hexdigest().encode()
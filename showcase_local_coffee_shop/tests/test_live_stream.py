@@ -0,0 +1,29 @@
+import asyncio
+import json
+import sys
+
+
+class ListSink:
+    def __init__(self):
+        self.payloads = []
+
+    async def write(self, data):
+        self.payloads.append(data)
+
+    async def close(self):
+        pass
+
+
+def test_stream_does_not_exceed_target_rate(load_script):
+    live_stream = load_script("live_stream", "dataset_generation/live_stream.py")
+    sink = ListSink()
+    report = asyncio.run(live_stream.run_stream(sink, rate=4000, batch_size=250, max_orders=1100, seed=1))
+
+    assert "generate_data" not in sys.modules
+    # 5 batches released at 1..5 * 250 / 4000 s
+    assert report["orders"] == 1100 and report["batches"] == 5
+    assert report["elapsed_seconds"] >= 5 * 250 / 4000
+    assert report["achieved_ratio"] <= 1.0
+    events = [json.loads(line) for payload in sink.payloads for line in payload.splitlines()]
+    assert [event["OrderId"] for event in events] == list(range(1, 1101))
+    assert sum(len(event["OrderDetails"]) for event in events) == report["order_details"]
@@ -0,0 +1,143 @@
+import json
+
+import pytest
+
+pytest.importorskip("google.cloud.bigquery")
+
+from benchmarks.fakes import FakeBigQueryClient, FakeStorageClient  # noqa: E402
+
+BUCKET = "test-bucket"
+PROJECT = "test-project"
+DATASET = "coffee_shop"
+CSV_FILES = {
+    "Customers.csv": "CustomerId,LevelOfDiscount,RegistrationDate\n1,5%,2024-01-01\n",
+    "Products.csv": "ProductId,ProductName,ProductCategory,Price\n1,Latte,Beverage,3.5\n",
+    "Stores.csv": "StoreId,StoreName,District,City,Address,Latitude,Longitude\n1,A,B,Kyiv,C,50.4,30.5\n",
+}
+DELTA_FILES = {
+    "Orders.csv": "OrderId,OrderDate\n1,2024-01-01\n2,2024-01-02\n",
+    "OrderDetails.csv": "OrderDetailId,OrderId\n1,1\n2,1\n3,2\n",
+}
+
+
+@pytest.fixture
+def loader(tmp_path, monkeypatch, load_script):
+    main = load_script("load_to_bq_main", "google_cloud_run/load_to_bq/main.py")
+    for name, value in {"PROJECT_ID": PROJECT, "DATASET": DATASET, "BUCKET": BUCKET,
+                        "GCS_PREFIX": "csv_sources/", "LOAD_MODE": "incremental"}.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setattr(main.storage, "Client", lambda *args, **kwargs: FakeStorageClient(str(tmp_path)))
+    return main
+
+
+def write_delta(root):
+    folder = root / BUCKET / "csv_sources"
+    (folder / "delta").mkdir(parents=True)
+    for name, text in CSV_FILES.items():
+        (folder / name).write_text(text)
+    for name, text in DELTA_FILES.items():
+        (folder / "delta" / name).write_text(text)
+    load_spec = {"write_disposition": "WRITE_APPEND", "last_date": "2024-01-02", "orders": 2, "order_details": 3,
+                 "loaded": False, "loaded_tables": [], "base_watermark": None}
+    (folder / "delta" / "_load.json").write_text(json.dumps(load_spec))
+    return folder / "delta" / "_load.json"
+
+
+def run_loads(main, monkeypatch, client):
+    monkeypatch.setattr(main.bigquery, "Client", lambda *args, **kwargs: client)
+    body, status, _ = main.load_csvs(None)
+    return json.loads(body), status
+
+
+def test_failed_submission_still_records_appended_delta(tmp_path, monkeypatch, loader):
+    load_spec_path = write_delta(tmp_path)
+    order_details_id = f"{PROJECT}.{DATASET}.order_details"
+    client = FakeBigQueryClient(str(tmp_path), submit_errors={order_details_id: RuntimeError("quota exceeded")})
+
+    body, status = run_loads(loader, monkeypatch, client)
+    assert status == 500
+    assert body["tables"]["orders"]["status"] == "loaded"
+    assert body["tables"]["orders"]["rows"] == 2
+    assert body["tables"]["order_details"]["status"] == "failed"
+    assert body["tables"]["order_details"]["error"] == "quota exceeded"
+    load_spec = json.loads(load_spec_path.read_text())
+    assert load_spec["loaded_tables"] == ["orders"]
+    assert not load_spec["loaded"]
+
+    # The retry appends only the table that failed
+    body, status = run_loads(loader, monkeypatch, FakeBigQueryClient(str(tmp_path)))
+    assert status == 200
+    assert body["skipped"] == ["orders"]
+    assert body["tables"]["order_details"]["rows"] == 3
+    load_spec = json.loads(load_spec_path.read_text())
+    assert load_spec["loaded_tables"] == ["order_details", "orders"]
+    assert load_spec["loaded"]
+
+
+def test_partition_uris_come_from_the_manifest(tmp_path, loader):
+    table_folder = tmp_path / BUCKET / "csv_sources" / "Orders"
+    for path in ("OrderMonth=2024-01/part-00000.parquet", "OrderMonth=2024-01/part-00001.parquet",
+                 "OrderMonth=2023-12/part-00007.parquet"):
+        (table_folder / path).parent.mkdir(parents=True, exist_ok=True)
+        (table_folder / path).write_bytes(b"")
+    # part-00007 was left by an earlier run and is not in the manifest
+    listed = ["OrderMonth=2024-01/part-00000.parquet", "OrderMonth=2024-01/part-00001.parquet"]
+    (table_folder / "_parquet.json").write_text(json.dumps({"files": listed}))
+
+    uris = loader.source_uri(BUCKET, "csv_sources/", "Orders.csv", "parquet", True)
+    assert uris == [f"gs://{BUCKET}/csv_sources/Orders/{path}" for path in listed]
+    assert loader.source_uri(BUCKET, "csv_sources/", "Stores.csv", "parquet", False) == \
+        f"gs://{BUCKET}/csv_sources/Stores.parquet"
+
+
+def test_loads_wait_in_parallel(tmp_path, loader):
+    write_delta(tmp_path)
+    table_ids = [f"{PROJECT}.{DATASET}.{table}" for table in ("customers", "products", "stores")]
+    client = FakeBigQueryClient(str(tmp_path), latencies={table_id: 0.2 for table_id in table_ids})
+    loads = [{"table": table_id.rsplit(".", 1)[1], "uri": f"gs://{BUCKET}/csv_sources/{name}",
+              "table_id": table_id, "job_config": loader.build_job_config(table_id.rsplit(".", 1)[1], "csv", None)}
+             for table_id, name in zip(table_ids, CSV_FILES)]
+
+    results, total_seconds = loader.run_load_jobs(client, loads)
+    assert list(results) == ["customers", "products", "stores"]
+    assert all(result["status"] == "loaded" and result["rows"] == 1 for result in results.values())
+    # Three 0.2 s jobs take about as long as one
+    assert total_seconds < 0.5
+
+
+def test_incremental_load_follows_the_load_spec(tmp_path, monkeypatch, loader):
+    load_spec_path = write_delta(tmp_path)
+    client = FakeBigQueryClient(str(tmp_path))
+
+    body, status = run_loads(loader, monkeypatch, client)
+    assert status == 200
+    jobs = {table_id.rsplit(".", 1)[1]: (uri, job_config) for uri, table_id, job_config in client.jobs}
+    assert jobs["orders"][0] == f"gs://{BUCKET}/csv_sources/delta/Orders.csv"
+    assert jobs["orders"][1].write_disposition == "WRITE_APPEND"
+    assert jobs["customers"][1].write_disposition == loader.bigquery.WriteDisposition.WRITE_TRUNCATE
+    for table, (_, job_config) in jobs.items():
+        assert job_config.schema == loader.SCHEMAS[table]
+        assert job_config.skip_leading_rows == 1
+    assert json.loads(load_spec_path.read_text())["loaded"]
+
+    # A loaded delta is never appended again
+    client = FakeBigQueryClient(str(tmp_path))
+    body, status = run_loads(loader, monkeypatch, client)
+    assert sorted(body["skipped"]) == ["order_details", "orders"]
+    assert sorted(table_id.rsplit(".", 1)[1] for _, table_id, _ in client.jobs) == ["customers", "products", "stores"]
+
+
+def test_full_parquet_load_reads_the_listed_parts(tmp_path, monkeypatch, loader, tables):
+    from coffee_shop_common.storage import store_data
+
+    store_data({f"{name}.csv": df for name, df in tables.items()}, str(tmp_path / BUCKET / "csv_sources"),
+               formats=("parquet",))
+    monkeypatch.setenv("LOAD_MODE", "full")
+    monkeypatch.setenv("SOURCE_FORMAT", "parquet")
+
+    body, status = run_loads(loader, monkeypatch, FakeBigQueryClient(str(tmp_path)))
+    assert status == 200
+    assert body["tables"]["orders"]["rows"] == len(tables["Orders"])
+    assert body["tables"]["order_details"]["rows"] == len(tables["OrderDetails"])
+    assert body["tables"]["orders"]["uri"].endswith("parts listed in _parquet.json")
+    assert body["tables"]["customers"]["rows"] == len(tables["Customers"])
@@ -0,0 +1,26 @@
+import json
+
+import pandas as pd
+
+from coffee_shop_common.sharded_csv import SHARD_MANIFEST, write_csv_shards
+
+
+def test_shards_hold_every_row_once(tmp_path, tables):
+    orders_df = tables["Orders"]
+    manifest = write_csv_shards(orders_df, str(tmp_path), 3, workers=1)
+    assert manifest["num_shards"] == 3
+    assert sum(shard["rows"] for shard in manifest["shards"]) == len(orders_df)
+    parts = [pd.read_csv(tmp_path / shard["name"]) for shard in manifest["shards"]]
+    assert pd.concat(parts, ignore_index=True)["OrderId"].tolist() == orders_df["OrderId"].tolist()
+    assert json.loads((tmp_path / SHARD_MANIFEST).read_text()) == manifest
+
+
+def test_shards_are_reproducible_and_replace_other_layouts(tmp_path, tables):
+    orders_df = tables["Orders"]
+    write_csv_shards(orders_df, str(tmp_path), 4, workers=1)
+    first = write_csv_shards(orders_df, str(tmp_path), 2, workers=2)
+    first_bytes = {shard["name"]: (tmp_path / shard["name"]).read_bytes() for shard in first["shards"]}
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([*first_bytes, SHARD_MANIFEST])
+
+    write_csv_shards(orders_df, str(tmp_path), 2, workers=1)
+    assert {name: (tmp_path / name).read_bytes() for name in first_bytes} == first_bytes
@@ -0,0 +1,37 @@
+import numpy as np
+
+from local_engine.models import ntile
+from local_engine.sketches import CountHistogram, DDSketch
+
+
+def test_count_histogram_matches_ntile_on_distinct_values():
+    values = np.random.default_rng(0).permutation(1000)
+    histogram = CountHistogram()
+    histogram.add(values)
+    assert np.array_equal(histogram.score(values, 5), ntile(values, 5))
+
+
+def test_count_histogram_remove_and_merge():
+    histogram, other = CountHistogram(), CountHistogram()
+    histogram.add([1, 2, 2, 3])
+    other.add([3, 4])
+    histogram.remove([2])
+    histogram.merge(other)
+    assert histogram.counts == {1: 1, 2: 1, 3: 2, 4: 1}
+    assert histogram.total == 5
+
+
+def test_ddsketch_buckets_within_relative_accuracy():
+    sketch = DDSketch(relative_accuracy=0.01)
+    values = np.geomspace(0.05, 1e6, 2000)
+    representatives = sketch.value(sketch.keys(values))
+    assert np.all(np.abs(representatives - values) <= 0.01 * values + 1e-12)
+
+
+def test_ddsketch_state_round_trip():
+    sketch = DDSketch()
+    sketch.add([0.0, 3.5, 120.25, 120.3, 9999.0])
+    restored = DDSketch()
+    restored.load_state(*sketch.state())
+    assert restored.counts == sketch.counts
+    assert np.array_equal(restored.score([3.5, 9999.0], 5), sketch.score([3.5, 9999.0], 5))
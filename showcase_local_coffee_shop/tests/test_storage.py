@@ -0,0 +1,35 @@
+import json
+
+import pandas as pd
+
+from coffee_shop_common import generator, storage
+
+
+def test_parquet_manifest_lists_only_the_current_parts(tmp_path, config, tables):
+    # A run with 7-day windows, then one with 30-day windows into the same folder
+    for chunk_days in (7, 30):
+        windows = generator.iter_order_windows(config, tables["Customers"], tables["Products"], chunk_days)
+        storage.write_order_windows(windows, str(tmp_path), formats=("parquet",))
+
+    for name in ("Orders", "OrderDetails"):
+        table_folder = tmp_path / name
+        manifest = json.loads((table_folder / storage.PARQUET_MANIFEST).read_text())
+        on_disk = sorted(path.relative_to(table_folder).as_posix() for path in table_folder.rglob("*.parquet"))
+        assert manifest["files"] == on_disk
+        assert {path.split("/")[0] for path in manifest["files"]} == {"OrderMonth=2024-01", "OrderMonth=2024-02"}
+
+    parts = [pd.read_parquet(tmp_path / "Orders" / path) for path in
+             json.loads((tmp_path / "Orders" / storage.PARQUET_MANIFEST).read_text())["files"]]
+    assert sorted(pd.concat(parts)["OrderId"].tolist()) == tables["Orders"]["OrderId"].tolist()
+
+
+def test_parquet_tables_use_explicit_types(tmp_path, tables):
+    storage.store_data({"Orders.csv": tables["Orders"], "Stores.csv": tables["Stores"]}, str(tmp_path),
+                       formats=("parquet",))
+    import pyarrow.parquet as pq
+
+    stores_schema = pq.read_schema(tmp_path / "Stores.parquet")
+    assert {field.name: str(field.type) for field in stores_schema} == storage.PARQUET_SCHEMAS["Stores"]
+    orders_schema = pq.read_schema(next((tmp_path / "Orders").rglob("*.parquet")))
+    assert str(orders_schema.field("OrderDate").type) == "date32[day]"
+    assert str(orders_schema.field("TotalAmount").type) == "double"
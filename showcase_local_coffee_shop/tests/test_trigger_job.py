@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+URL = "http://run.test/apis/run.googleapis.com/v1/namespaces/p/jobs/j:run"
+FOLLOWERS = 4
+
+
+class CountingDict(dict):
+    """
+    Sets arrived once get() has been called `expected` times, i.e. every caller has looked
+    up the in-flight request.
+    """
+
+    def __init__(self, expected):
+        super().__init__()
+        self.expected = expected
+        self.calls = 0
+        self.arrived = threading.Event()
+
+    def get(self, key, default=None):
+        self.calls += 1
+        if self.calls >= self.expected:
+            self.arrived.set()
+        return super().get(key, default)
+
+
+@pytest.fixture
+def trigger(load_script, monkeypatch):
+    main = load_script("trigger_cloud_run_job_main", "google_cloud_run/trigger_cloud_run_job/main.py")
+    inflight = CountingDict(1 + FOLLOWERS)
+    monkeypatch.setattr(main, "_inflight", inflight)
+    return main, inflight
+
+
+def run_concurrently(main, inflight, run_job):
+    """
+    Calls run_job_coalesced from a leader and FOLLOWERS threads while the leader's request
+    is in flight, and returns each call's result or exception.
+    """
+    started = threading.Event()
+
+    def blocking_run_job(url):
+        started.set()
+        assert inflight.arrived.wait(5)
+        return run_job(url)
+
+    main.run_job = blocking_run_job
+    results = [None] * (1 + FOLLOWERS)
+
+    def call(i):
+        try:
+            results[i] = main.run_job_coalesced(URL)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(0,))]
+    threads[0].start()
+    assert started.wait(5)
+    threads += [threading.Thread(target=call, args=(i,)) for i in range(1, 1 + FOLLOWERS)]
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_concurrent_triggers_share_one_run(trigger):
+    main, inflight = trigger
+    runs = []
+
+    def run_job(url):
+        runs.append(url)
+        return 200, "started"
+
+    results = run_concurrently(main, inflight, run_job)
+
+    assert runs == [URL]
+    assert results[0] == (200, "started", False)
+    assert results[1:] == [(200, "started", True)] * FOLLOWERS
+    assert URL not in inflight
+    # Once the request has finished, the next trigger starts a new run
+    main.run_job = run_job
+    assert main.run_job_coalesced(URL) == (200, "started", False)
+    assert runs == [URL, URL]
+
+
+def test_failed_request_is_raised_to_every_waiter(trigger):
+    main, inflight = trigger
+    error = main.requests.ConnectionError("refused")
+
+    def run_job(url):
+        raise error
+
+    results = run_concurrently(main, inflight, run_job)
+
+    assert results == [error] * (1 + FOLLOWERS)
+    assert URL not in inflight
@@ -0,0 +1,37 @@
+import pandas as pd
+
+from coffee_shop_common.uploader import LocalBackend, upload_folder, write_frames
+
+
+def test_unchanged_files_are_skipped(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "Products.csv").write_text("ProductId\n1\n")
+    (data / "Orders.csv").write_text("OrderId\n1\n")
+    backend = LocalBackend(str(tmp_path / "bucket"))
+
+    first = upload_folder(backend, str(data), "csv_sources/")
+    assert first["uploaded"] == ["csv_sources/Orders.csv", "csv_sources/Products.csv"]
+    assert (tmp_path / "bucket" / "csv_sources" / "Orders.csv").read_text() == "OrderId\n1\n"
+
+    (data / "Orders.csv").write_text("OrderId\n1\n2\n")
+    second = upload_folder(backend, str(data), "csv_sources/")
+    assert second["uploaded"] == ["csv_sources/Orders.csv"]
+    assert second["skipped"] == ["csv_sources/Products.csv"]
+    assert (tmp_path / "bucket" / "csv_sources" / "Orders.csv").read_text() == "OrderId\n1\n2\n"
+
+
+def test_streamed_object_is_uploaded_again(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "Orders.csv").write_text("OrderId\n1\n")
+    backend = LocalBackend(str(tmp_path / "bucket"))
+    upload_folder(backend, str(data), "csv_sources/")
+
+    # A direct-mode run replaces the object with other content
+    write_frames(backend, "csv_sources/Orders.csv", [pd.DataFrame({"OrderId": [1, 2, 3]})])
+    assert (tmp_path / "bucket" / "csv_sources" / "Orders.csv").read_text() == "OrderId\n1\n2\n3\n"
+
+    result = upload_folder(backend, str(data), "csv_sources/")
+    assert result["uploaded"] == ["csv_sources/Orders.csv"]
+    assert (tmp_path / "bucket" / "csv_sources" / "Orders.csv").read_text() == "OrderId\n1\n"
@@ -0,0 +1,25 @@
+import pytest
+
+from coffee_shop_common.validation import DataValidationError, check_tables, validate_tables
+
+
+def test_generated_tables_pass(config, tables):
+    assert validate_tables(tables, config.start, config.end) == []
+
+
+def test_missing_foreign_key_is_rejected(tables):
+    orders_df = tables["Orders"].copy()
+    orders_df.loc[orders_df.index[0], "StoreId"] = tables["Stores"]["StoreId"].max() + 1
+    with pytest.raises(DataValidationError) as raised:
+        check_tables({**tables, "Orders": orders_df})
+    [violation] = raised.value.violations
+    assert violation["check"] == "foreign_key"
+    assert violation["table"] == "Orders.StoreId -> Stores"
+    assert violation["rows"] == 1
+
+
+def test_wrong_total_is_rejected(tables):
+    orders_df = tables["Orders"].copy()
+    orders_df.loc[orders_df.index[:3], "TotalAmount"] += 1
+    checks = {violation["check"] for violation in validate_tables({**tables, "Orders": orders_df})}
+    assert checks == {"total_amount"}